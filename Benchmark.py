@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Benchmark.py
+
+Times the hot paths of Graph.py and Seperate.py on synthetic scope captures and
+compares the results against a stored baseline.
+
+#! Run in terminal:
+
+#! python Benchmark.py
+#! python Benchmark.py --sizes 1e3,1e5,1e6 --repeat 5
+#! python Benchmark.py --save-baseline
+
+Generated captures look like the files in "Seperated":
+  Sample,Time(S),CH1(V),CH2(V)
+with variants for unit-suffixed values ("0.0334074V"), percentages ("12.5%"),
+semicolon delimiters, and a mixed space/tab dump for Seperate.py.
+
+Features:
+- Data files are cached in Benchmarks/data and reused between runs
+- Interactive prompts are answered by a script, plots are rendered with Agg
+- Results are written to Benchmarks/results.json
+- Any case slower than the baseline by more than --threshold is flagged (exit code 1)
+- The streamed low-pass and the vectorized column parsers are checked against plain references
+  before timing (exit code 1 on mismatch)
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+BENCH_DIR = SCRIPT_DIR / "Benchmarks"
+DATA_DIR = BENCH_DIR / "data"
+
+# ADC step of the scope channels in "Unity gain follower.csv"
+ADC_STEP = 0.0334074
+HEADER = ["Sample", "Time(S)", "CH1(V)", "CH2(V)"]
+GRAPH_VARIANTS = ["plain", "units", "percent", "semicolon"]
+SEPERATE_VARIANTS = ["mixed"]
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Benchmark Graph.py and Seperate.py on synthetic captures.")
+    p.add_argument("--sizes", default="1e3,1e4,1e5",
+                   help="Comma-separated row counts to generate (1e3 up to 1e8)")
+    p.add_argument("--variants", default=",".join(GRAPH_VARIANTS + SEPERATE_VARIANTS),
+                   help="Comma-separated variants: " + ", ".join(GRAPH_VARIANTS + SEPERATE_VARIANTS))
+    p.add_argument("--only", default="", help="Only run cases whose name contains this text")
+    p.add_argument("--repeat", type=int, default=3, help="Timed runs per case (median is reported)")
+    p.add_argument("--output", default=str(BENCH_DIR / "results.json"), help="Where to write results JSON")
+    p.add_argument("--baseline", default=str(BENCH_DIR / "baseline.json"), help="Baseline JSON to compare against")
+    p.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    p.add_argument("--threshold", type=float, default=0.25,
+                   help="Relative slowdown that counts as a regression (0.25 = 25%%)")
+    p.add_argument("--min-delta", type=float, default=0.005,
+                   help="Ignore slowdowns smaller than this many seconds (timer noise)")
+    return p.parse_args()
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+def generate_capture(path: Path, rows: int, variant: str, chunk_rows: int = 200_000):
+    """
+    Write a scope capture with `rows` data rows. CH1 is a quantized sine, CH2 a
+    lagging, noisy copy of it, both exact multiples of ADC_STEP.
+    Files are written in chunks so 1e8 rows never sit in memory at once.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(1234)
+    # Strings for every ADC code the signal can reach, formatted once
+    codes = np.arange(-160, 161)
+    if variant == "units":
+        table = np.array([f"{c * ADC_STEP:.6g}V" for c in codes], dtype=object)
+    elif variant == "percent":
+        table = np.array([f"{c * ADC_STEP * 10:.6g}%" for c in codes], dtype=object)
+    else:
+        table = np.array([f"{c * ADC_STEP:.6g}" for c in codes], dtype=object)
+
+    if variant == "semicolon":
+        sep, header = ";", ";".join(HEADER)
+    elif variant == "mixed":
+        # Header with commas, data separated by runs of spaces/tabs (like BackUps/Data.nonseparated.csv.bak)
+        sep, header = None, ", ".join(HEADER)
+    else:
+        sep, header = ",", ",".join(HEADER)
+
+    tmp = path.with_suffix(path.suffix + ".part")
+    with tmp.open("w", encoding="utf-8", newline="\n") as fh:
+        fh.write(header + "\n")
+        for start in range(0, rows, chunk_rows):
+            n = np.arange(start, min(rows, start + chunk_rows))
+            t = -0.00798 + n * 1e-5
+            phase = 2 * np.pi * 1000.0 * t
+            ch1 = np.rint(3.0 * np.sin(phase) / ADC_STEP).astype(int)
+            ch2 = np.rint((3.0 * np.sin(phase - 0.2) + rng.normal(0, 0.03, len(n))) / ADC_STEP).astype(int)
+            ch1_s = table[np.clip(ch1, -160, 160) + 160]
+            ch2_s = table[np.clip(ch2, -160, 160) + 160]
+            t_s = [f"{v:.8g}" for v in t.tolist()]
+            if variant == "units":
+                t_s = [v + "s" for v in t_s]
+            if sep is None:
+                # Alternate single spaces, double spaces and tabs between fields
+                lines = [f"{a} {b}\t{c}  {d}" for a, b, c, d in zip(n.tolist(), t_s, ch1_s, ch2_s)]
+            else:
+                lines = [f"{a}{sep}{b}{sep}{c}{sep}{d}" for a, b, c, d in zip(n.tolist(), t_s, ch1_s, ch2_s)]
+            fh.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)
+
+
+def capture_path(rows: int, variant: str) -> Path:
+    """Return the cached capture for (rows, variant), generating it if missing."""
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    path = DATA_DIR / f"capture_{variant}_{rows}.csv"
+    if not path.exists():
+        print(f"Generating {path.name} ...")
+        start = time.perf_counter()
+        generate_capture(path, rows, variant)
+        print(f"  done in {time.perf_counter() - start:.2f}s ({path.stat().st_size / 1e6:.1f} MB)")
+    return path
+
+
+def compressed_capture(path: Path, kind: str) -> Path:
+    """Return `path` compressed as .gz or .zst (Seperate.py --compress layout), generating it if missing."""
+    import Seperate
+
+    out = path.with_name(path.name + "." + kind)
+    if not out.exists():
+        tmp = out.with_name("tmp_" + out.name)
+        Seperate.write_compressed(tmp, path.read_bytes())
+        os.replace(tmp, out)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Harness
+# ---------------------------------------------------------------------------
+
+def scripted_input(answers: dict):
+    """
+    Build a replacement for input(): the first key found in the prompt decides the answer,
+    anything else gets "" (which every Graph.py prompt treats as its default).
+    """
+    def _input(prompt=""):
+        for key, answer in answers.items():
+            if key in prompt:
+                return answer
+        return ""
+    return _input
+
+
+def time_case(fn, repeat: int) -> dict:
+    """Run fn `repeat` times with stdout silenced and return timing statistics in seconds."""
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+    return {
+        "median": statistics.median(timings),
+        "min": min(timings),
+        "max": max(timings),
+        "runs": len(timings),
+    }
+
+
+def graph_cases(Graph, path: Path, tmp_dir: Path):
+    """Yield (name, callable) pairs for the Graph.py stages on one capture file."""
+    import matplotlib.pyplot as plt
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        raw_df = Graph.load_csv(str(path))
+    # Later stages see the indexed frame, exactly as main() hands it to them
+    df, numeric_cols = Graph.index_numeric_columns(raw_df)
+    x_col, y_cols = df.columns[1], list(df.columns[2:])
+
+    def parse_columns():
+        Graph.index_numeric_columns(raw_df)
+
+    def parse_columns_quantized():
+        Graph.QUANTIZE = True
+        try:
+            return Graph.index_numeric_columns(raw_df)[0]
+        finally:
+            Graph.QUANTIZE = False
+
+    quantized_df = parse_columns_quantized()
+
+    def summary_stats(frame=df):
+        Graph.input = scripted_input({"Enter your choice": "6,7", "X for slope": "1", "for Y": "2,3"})
+        Graph.show_summary_stats(frame, numeric_cols)
+
+    def filter_rows():
+        Graph.input = scripted_input({"Filter Points": "Y", "filter on": "1", "operator": "1", "compare": "0"})
+        Graph.filter_data(df, x_col, y_cols)
+
+    def condition_rows():
+        Graph.input = scripted_input({"Condition signals": "Y", "operation(s)": "1,2,4,5", "Window": "50",
+                                      "Time constant": "20"})
+        Graph.condition_signals(df, x_col, y_cols)
+
+    def sample_rows():
+        Graph.input = scripted_input({"Nth point": "Y", "step size": "10"})
+        Graph.sample_data_points(df)
+
+    def plot_line():
+        Graph.input = scripted_input({"Save plot": "0", "dual Y-axis": "N"})
+        plt.close("all")
+        Graph.plot_data(df, x_col, y_cols)
+        # plt.show() is a no-op under Agg, so force the actual rendering here
+        plt.gcf().canvas.draw()
+        plt.close("all")
+
+    yield "graph.load_csv", lambda: Graph.load_csv(str(path))
+    for kind in ("gz", "zst"):
+        try:
+            packed = compressed_capture(path, kind)
+        except RuntimeError:
+            continue  # zstandard not installed
+        yield f"graph.load_csv_{kind}", lambda packed=packed: Graph.load_csv(str(packed))
+    yield "graph.parse_columns", parse_columns
+    yield "graph.parse_columns_quantized", parse_columns_quantized
+    yield "graph.show_summary_stats", summary_stats
+    yield "graph.show_summary_stats_quantized", lambda: summary_stats(quantized_df)
+    yield "graph.filter_data", filter_rows
+    yield "graph.condition_signals", condition_rows
+    yield "graph.sample_data_points", sample_rows
+    yield "graph.plot_data", plot_line
+    for fmt in ("csv", "npz"):
+        out = str(tmp_dir / f"{path.stem}_export.{fmt}")
+        yield f"graph.export_{fmt}", lambda out=out: Graph.export_data(df, [x_col] + y_cols, out)
+
+
+def check_lowpass(Graph) -> list:
+    """
+    Compare the block-wise low-pass of Graph.RollingFilter with a plain sample-by-sample
+    recursion (NaN until the first valid sample, then y += alpha * (x - y), holding the last
+    valid input over NaNs), for several alphas, NaN prefixes and chunkings.
+    Returns a list of failure messages (empty when everything matches).
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(1)
+    failures = []
+    for alpha in (1.0, 0.5, 0.05, 0.001):
+        for nan_prefix in (0, 1, 7, 5000):
+            x = 5.0 + rng.normal(size=12_000)
+            x[:nan_prefix] = np.nan
+            x[9000:9010] = np.nan
+            ref = np.full(len(x), np.nan)
+            y = held = np.nan
+            for i, v in enumerate(x):
+                held = held if np.isnan(v) else v
+                if not np.isnan(held):
+                    y = held if np.isnan(y) else y + alpha * (held - y)
+                    ref[i] = y
+            for chunk in (len(x), 1000, 333):
+                filt = Graph.RollingFilter("lowpass", alpha=alpha)
+                out = np.concatenate([filt.process(x[i:i + chunk]) for i in range(0, len(x), chunk)])
+                if not np.allclose(out, ref, rtol=1e-9, atol=1e-9, equal_nan=True):
+                    err = np.nanmax(np.abs(out - ref))
+                    failures.append(f"lowpass alpha={alpha} NaN prefix={nan_prefix} chunk={chunk}: max error {err:.3g}")
+    return failures
+
+
+PARSE_CHECKS = {  # column values -> kind they should be read as; whole numbers on purpose
+    "percent": ["12%", "50%", "7%", "-"],
+    "percent_fraction": ["12.5%", "50%", "0.7 %"],
+    "currency": ["$12", "$50", "€7", "-"],
+    "unit": ["12V", "50 V", "7mV"],
+    "x10": ["3 x 10^2", "4x10^1", "5×10^-1"],
+    "float": ["1", "inf", "-inf", "nan", "2"],
+    "special": ["inf", "nan", "-Infinity"],
+}
+
+
+def check_parsing(Graph) -> list:
+    """
+    Parse small text columns of every kind with the vectorized Graph.parse_column and compare
+    with Graph.parse_numeric_string applied value by value. Returns failure messages.
+    """
+    import numpy as np
+    import pandas as pd
+
+    failures = []
+    for name, values in PARSE_CHECKS.items():
+        series = pd.Series(values, dtype="string")
+        kind = Graph.infer_column_kind(series)
+        ref = np.array([np.nan if v is None else v for v in map(Graph.parse_numeric_string, values)], dtype=float)
+        try:
+            out = Graph.parse_column(series, kind).to_numpy(dtype=float)
+        except Exception as e:
+            failures.append(f"parse {name} ({kind}): {type(e).__name__}: {e}")
+            continue
+        if not np.array_equal(out, ref, equal_nan=True):
+            failures.append(f"parse {name} ({kind}): {out.tolist()} != {ref.tolist()}")
+    return failures
+
+
+def seperate_cases(Seperate, path: Path, tmp_dir: Path):
+    """Yield (name, callable) pairs for each Seperate.py conversion method on one dump."""
+    raw = path.read_text(encoding="utf-8")
+    out = tmp_dir / (path.stem + "_out.csv")
+
+    def cli(*extra):
+        cmd = [sys.executable, str(SCRIPT_DIR / "Seperate.py"), str(path), "-o", str(out), "--no-backup", *extra]
+        return lambda: subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+
+    yield "seperate.convert_regex", lambda: Seperate.convert_regex(raw)
+    if Seperate.load_pandas() is not None:
+        yield "seperate.convert_pandas", lambda: Seperate.convert_pandas(raw)
+    yield "seperate.cli_regex", cli("--method", "regex")
+    yield "seperate.cli_group_by_header", cli("--group-by-header")
+    if Seperate.load_pandas() is not None:
+        yield "seperate.cli_pandas", cli("--method", "pandas")
+
+
+def startup_cases():
+    """Yield cold-start cases: a fresh interpreter importing each tool (measured with -X importtime)."""
+    for module in ("Graph", "Seperate"):
+        cmd = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+        yield f"startup.import_{module.lower()}", lambda cmd=cmd: subprocess.run(
+            cmd, check=True, cwd=SCRIPT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def import_cost_us(module: str) -> int:
+    """Cumulative import time of `module` in microseconds, as reported by python -X importtime."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=SCRIPT_DIR, capture_output=True, text=True, check=True)
+    for line in reversed(proc.stderr.splitlines()):
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    return -1
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta: float) -> list:
+    """Return [(case, old, new, ratio)] for every case that regressed against the baseline."""
+    regressions = []
+    for case, res in results.items():
+        old = baseline.get(case)
+        if not old:
+            continue
+        new_t, old_t = res["median"], old["median"]
+        if new_t > old_t * (1 + threshold) and new_t - old_t > min_delta:
+            regressions.append((case, old_t, new_t, new_t / old_t if old_t else float("inf")))
+    return regressions
+
+
+def main():
+    args = parse_args()
+    sizes = [int(float(s)) for s in args.sizes.split(",") if s.strip()]
+    variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+    unknown = [v for v in variants if v not in GRAPH_VARIANTS + SEPERATE_VARIANTS]
+    if unknown:
+        print(f"Unknown variant(s): {unknown}")
+        sys.exit(2)
+
+    # Headless rendering; must happen before Graph imports pyplot
+    import matplotlib
+    matplotlib.use("Agg")
+    sys.path.insert(0, str(SCRIPT_DIR))
+    import Graph
+    import Seperate
+
+    # A fast wrong answer is no speedup: check the fast paths against plain references first
+    failures = check_lowpass(Graph) + check_parsing(Graph)
+    if failures:
+        print("CORRECTNESS CHECK FAILED")
+        for msg in failures:
+            print(f"  {msg}")
+        sys.exit(1)
+
+    tmp_dir = BENCH_DIR / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    results = {}
+    for name, fn in startup_cases():
+        if args.only and args.only not in name:
+            continue
+        res = time_case(fn, args.repeat)
+        module = name.rsplit("_", 1)[1].capitalize()
+        res["import_us"] = import_cost_us(module)
+        results[name] = res
+        print(f"{name:<50} {res['median'] * 1000:10.2f} ms  (import {res['import_us'] / 1000:.2f} ms)")
+
+    try:
+        for rows in sizes:
+            for variant in variants:
+                path = capture_path(rows, variant)
+                if variant in GRAPH_VARIANTS:
+                    cases = graph_cases(Graph, path, tmp_dir)
+                else:
+                    cases = seperate_cases(Seperate, path, tmp_dir)
+                for name, fn in cases:
+                    if args.only and args.only not in name:
+                        continue
+                    key = f"{name}|{variant}|{rows}"
+                    try:
+                        res = time_case(fn, args.repeat)
+                    except Exception as e:
+                        print(f"{key:<50} FAILED ({e})")
+                        continue
+                    results[key] = res
+                    print(f"{key:<50} {res['median'] * 1000:10.2f} ms  (min {res['min'] * 1000:.2f} ms)")
+    finally:
+        # Restore the real input() for anyone importing Graph after us
+        Graph.__dict__.pop("input", None)
+
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    out_path = Path(args.output)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nResults written to: {out_path}")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Baseline saved to: {baseline_path}")
+        return
+
+    if not baseline_path.exists():
+        print("No baseline found. Run with --save-baseline to create one.")
+        return
+
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8")).get("results", {})
+    regressions = compare(results, baseline, args.threshold, args.min_delta)
+    if not regressions:
+        print(f"No regressions against baseline ({len(baseline)} cases, threshold {args.threshold:.0%}).")
+        return
+
+    print("\n" + "=" * 70 + "\nREGRESSIONS")
+    for case, old_t, new_t, ratio in regressions:
+        print(f"  {case:<50} {old_t * 1000:.2f} -> {new_t * 1000:.2f} ms  (x{ratio:.2f})")
+    print("=" * 70)
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
-import pandas as pd            # data manipulation, CSV loading, and table operations
+from __future__ import annotations  # keeps pd.DataFrame hints from importing pandas
 import os                     # filesystem path handling and directory operations
+import io                     # stream classes for decompressing compressed captures
 import sys                    # access to Python executable/path and system args
 import re                     # regular expressions for parsing and detection
-import matplotlib.pyplot as plt  # plotting library for charts
-import numpy as np            # numerical routines, arrays, and polynomial fits
+import argparse               # command line options (headless mode)
+from contextlib import contextmanager  # data_source(): path or decompressing stream for pandas
 from datetime import datetime # timestamp filenames and parse/format dates
 
+# pandas, numpy and matplotlib are imported inside the functions that need them,
+# so the folder prompt and file list appear before the heavy libraries load.
+
 #! Run this in terminal to open folder path (This is the file path, different for everyone):
 
 # cd "c:\Users\augus\Desktop\Python\Augustinas_Mockevicius" 
@@ -18,6 +22,66 @@ from datetime import datetime # timestamp filenames and parse/format dates
 
 # python Graph.py
 
+#! Save-only runs without opening plot windows:
+
+# python Graph.py --headless
+
+
+HEADLESS = False       # set by --headless: render with Agg, save plots, never open a window
+PREFETCH = True        # --no-prefetch: load files in the foreground
+PREFETCH_NEXT = False  # --prefetch-next: also load the next file in the list in the background
+USE_CATALOG = True     # --no-catalog: list bare file names in the picker
+RENDER_CACHE_MB = 256  # --render-cache-mb: size cap of Cache/renders (0 disables the render cache)
+SPECTRUM_CACHE_MB = 64  # --spectrum-cache-mb: size cap of Cache/spectra (0 keeps spectra in memory only)
+EXPORT_FORMAT = None   # --export csv|parquet|npz: write the plotted data after every plot without asking
+QUANTIZE = False       # --quantize: keep columns sampled on a fixed step (ADC levels) as int8/int16 codes
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Graphinator 3000 - interactive CSV graphing.")
+    p.add_argument("--headless", action="store_true",
+                   help="Render with the non-interactive Agg backend and don't open plot windows (save-only)")
+    p.add_argument("--no-prefetch", dest="prefetch", action="store_false",
+                   help="Load the chosen CSV in the foreground instead of in the background")
+    p.add_argument("--prefetch-next", action="store_true",
+                   help="Also load the next file in the list in the background")
+    p.add_argument("--no-catalog", dest="catalog", action="store_false",
+                   help="Don't keep a metadata catalog (" + CATALOG_NAME + ") of the CSV folder")
+    p.add_argument("--spectrum", metavar="FILE",
+                   help="Welch spectrum of a capture too large to load, streamed in chunks")
+    p.add_argument("--envelope", metavar="FILE",
+                   help="Line plot of a capture too large to load, streamed into per-pixel envelopes")
+    p.add_argument("--watch", metavar="FILE",
+                   help="Live plot of a CSV that is still being written (only new rows are parsed)")
+    p.add_argument("--refresh", type=float, default=4.0,
+                   help="Updates per second in --watch mode (default 4)")
+    p.add_argument("--overlay", action="store_true",
+                   help="Start by overlaying the same column(s) from several files")
+    p.add_argument("--bode", action="store_true",
+                   help="Start with the frequency-response summary of several sweep files")
+    p.add_argument("--render-cache-mb", type=float, default=RENDER_CACHE_MB,
+                   help=f"Size cap of the saved-plot render cache in MB (default {RENDER_CACHE_MB}, 0 disables)")
+    p.add_argument("--spectrum-cache-mb", type=float, default=SPECTRUM_CACHE_MB,
+                   help=f"Size cap of the on-disk spectrum cache in MB (default {SPECTRUM_CACHE_MB}, 0 disables)")
+    p.add_argument("--export", choices=sorted(set(EXPORT_FORMATS.values())),
+                   help="Write the plotted (range/filter/sampled) data in this format after every plot")
+    p.add_argument("--quantize", action="store_true",
+                   help="Store columns whose values sit on a fixed step as int8/int16 codes (lossless, 4-8x less memory)")
+    return p.parse_args()
+
+
+def load_pyplot():
+    """
+    Import matplotlib.pyplot on first use.
+    Picks the Agg backend for headless runs (or when no display is available) so no GUI toolkit is imported.
+    """
+    import matplotlib
+    no_display = (sys.platform.startswith("linux") and not os.environ.get("DISPLAY")
+                  and not os.environ.get("WAYLAND_DISPLAY") and not os.environ.get("MPLBACKEND"))
+    if HEADLESS or no_display:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
 
 
 def parse_numeric_string(value):
@@ -26,7 +90,7 @@ def parse_numeric_string(value):
     Supports: percentages ('95%'), thousands separators ('1,000.5'), scientific notation ('1e-5'), currency.
     Returns float if parseable, otherwise returns None.
     """
-    if pd.isna(value):
+    if value is None or (isinstance(value, float) and value != value):  # None / NaN
         return None
     
     if isinstance(value, (int, float)):
@@ -98,516 +162,2048 @@ def parse_numeric_string(value):
         return None
 
 
-def load_csv(filepath: str) -> pd.DataFrame:
+DELIMITERS = [',', ';', ':', '\t', '|']
+DELIMITER_NAMES = {',': 'comma', ';': 'semicolon', ':': 'colon', '\t': 'tab', '|': 'pipe',
+                   'parquet': 'parquet', 'feather': 'feather'}
+COLUMNAR_EXTS = (".parquet", ".feather")  # typed files written by Seperate.py --columnar
+COMPRESSED_EXTS = (".gz", ".xz", ".zst")   # archived captures, decompressed while they are parsed
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def is_compressed(filepath: str) -> bool:
+    return filepath.lower().endswith(COMPRESSED_EXTS)
+
+
+def strip_compression(name: str) -> str:
+    """'capture.csv.zst' -> 'capture.csv'; other names are returned unchanged."""
+    return os.path.splitext(name)[0] if is_compressed(name) else name
+
+
+def zstd_frames(fh) -> list:
+    """
+    (offset, length) of every zstd frame in the open file, found by walking the frame and block
+    headers (nothing is decompressed). Skippable frames are left out. ValueError if it isn't zstd.
+    """
+    fh.seek(0, os.SEEK_END)
+    end = fh.tell()
+    frames = []
+    pos = 0
+    while pos < end:
+        fh.seek(pos)
+        head = fh.read(8)
+        magic = int.from_bytes(head[:4], "little")
+        if 0x184D2A50 <= magic <= 0x184D2A5F:  # skippable frame: magic, size, payload
+            pos += 8 + int.from_bytes(head[4:8], "little")
+            continue
+        if head[:4] != ZSTD_MAGIC or len(head) < 5:
+            raise ValueError("Not a zstd file (bad frame header).")
+        fhd = head[4]
+        single_segment = fhd >> 5 & 1
+        start = pos
+        # magic + descriptor, window descriptor, dictionary ID, frame content size
+        pos += 5 + (not single_segment) + (0, 1, 2, 4)[fhd & 3] + (single_segment, 2, 4, 8)[fhd >> 6]
+        while True:
+            fh.seek(pos)
+            block = fh.read(3)
+            if len(block) < 3:
+                raise ValueError("Truncated zstd file.")
+            header = int.from_bytes(block, "little")
+            pos += 3 + (1 if header >> 1 & 3 == 1 else header >> 3)  # RLE blocks store one byte
+            if header & 1:  # last block of the frame
+                break
+        pos += 4 * (fhd >> 2 & 1)  # content checksum
+        frames.append((start, pos - start))
+    return frames
+
+
+def _decompress_zstd_frame(data: bytes) -> bytes:
+    import zstandard
+    return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+class ZstdFrameReader(io.RawIOBase):
+    """
+    Readable stream over a zstd file made of several frames (pzstd, Seperate.py --compress zst,
+    concatenated archives). Frames are decompressed on worker threads ahead of the reader and
+    handed out in order; at most `ahead` decompressed frames are held in memory. The read-ahead
+    starts at one frame, so reading just the head of a file decompresses little.
+    """
+
+    def __init__(self, filepath: str, frames: list, workers: int = None):
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+
+        workers = workers or min(8, os.cpu_count() or 1)
+        self._fh = open(filepath, "rb")
+        self._frames = iter(frames)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="zstd")
+        self._ahead = 2 * workers
+        self._pending = deque()
+        self._taken = 0
+        self._buf = memoryview(b"")
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def _submit(self):
+        want = min(self._ahead, self._taken + 1)
+        while len(self._pending) < want:
+            frame = next(self._frames, None)
+            if frame is None:
+                break
+            self._fh.seek(frame[0])
+            self._pending.append(self._pool.submit(_decompress_zstd_frame, self._fh.read(frame[1])))
+
+    def readinto(self, b):
+        while self._pos >= len(self._buf):
+            self._submit()
+            if not self._pending:
+                return 0
+            future = self._pending.popleft()
+            self._taken += 1
+            self._submit()  # keep the workers busy while this frame is consumed
+            self._buf, self._pos = memoryview(future.result()), 0
+        n = min(len(b), len(self._buf) - self._pos)
+        b[:n] = self._buf[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._fh.close()
+        super().close()
+
+
+def open_compressed(filepath: str, workers: int = None):
+    """
+    Binary stream of the decompressed contents of a .gz/.xz/.zst file, decompressed in chunks as
+    it is read. zstd files with several frames are decompressed on `workers` threads in parallel
+    (a single frame can only be decoded in sequence). ValueError if zstandard isn't installed.
+    """
+    lower = filepath.lower()
+    if lower.endswith(".gz"):
+        import gzip
+        return gzip.open(filepath, "rb")
+    if lower.endswith(".xz"):
+        import lzma
+        return lzma.open(filepath, "rb")
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ValueError(f"Reading .zst files needs zstandard (pip install zstandard): {e}")
+    with open(filepath, "rb") as fh:
+        frames = zstd_frames(fh)
+    if len(frames) > 1 and (workers or os.cpu_count() or 1) > 1:
+        return io.BufferedReader(ZstdFrameReader(filepath, frames, workers), buffer_size=1 << 20)
+    reader = zstandard.ZstdDecompressor().stream_reader(open(filepath, "rb"), read_across_frames=True)
+    return io.BufferedReader(reader, buffer_size=1 << 20)
+
+
+@contextmanager
+def data_source(filepath: str):
+    """What pd.read_csv should read: the path itself, or a decompressing stream closed afterwards."""
+    if not is_compressed(filepath):
+        yield filepath
+        return
+    with open_compressed(filepath) as stream:
+        yield stream
+
+
+def sniff_delimiter(filepath: str, sample_rows: int = 200) -> str:
+    """
+    Pick the delimiter that gives the most columns on the first `sample_rows` rows.
+    Only reads the head of the file, so it is instant even for very large captures.
+    """
+    import pandas as pd
+
+    best_delim = ','
+    best_cols = 1
+    for delim in DELIMITERS:
+        with data_source(filepath) as src:
+            try:
+                test_df = pd.read_csv(src, sep=delim, nrows=sample_rows)
+            except Exception:
+                continue
+        if len(test_df.columns) > best_cols:
+            best_cols = len(test_df.columns)
+            best_delim = delim
+    return best_delim
+
+
+def is_columnar(filepath: str) -> bool:
+    return filepath.lower().endswith(COLUMNAR_EXTS)
+
+
+def read_columnar(filepath: str, columns: list = None, rows: int = None) -> pd.DataFrame:
+    """
+    Typed Parquet/Feather file as a DataFrame, no text parsing involved.
+    With `rows`, only the first rows are read. Needs pyarrow; ValueError if it is missing.
+    """
+    import pandas as pd
+
+    try:
+        if filepath.lower().endswith(".parquet"):
+            if rows is None:
+                return pd.read_parquet(filepath, columns=columns)
+            import pyarrow.parquet as pq
+            batch = next(pq.ParquetFile(filepath).iter_batches(batch_size=rows, columns=columns), None)
+            return batch.to_pandas() if batch is not None else pd.DataFrame()
+        df = pd.read_feather(filepath, columns=columns)
+        return df if rows is None else df.head(rows)
+    except ImportError as e:
+        raise ValueError(f"Reading {os.path.splitext(filepath)[1]} files needs pyarrow (pip install pyarrow): {e}")
+
+
+def file_format(filepath: str) -> str:
+    """'parquet' / 'feather' for columnar files, otherwise the sniffed CSV delimiter."""
+    return os.path.splitext(filepath)[1][1:].lower() if is_columnar(filepath) else sniff_delimiter(filepath)
+
+
+def read_chunks(filepath: str, columns: list = None, chunksize: int = 200_000, fmt: str = None):
+    """
+    Yield the file as DataFrames of up to `chunksize` rows (constant memory for CSV and Parquet).
+    `fmt` is file_format(filepath), sniffed if not given.
+    """
+    import pandas as pd
+
+    fmt = fmt or file_format(filepath)
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ValueError(f"Reading .parquet files needs pyarrow (pip install pyarrow): {e}")
+        for batch in pq.ParquetFile(filepath).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    elif fmt == "feather":
+        df = read_columnar(filepath, columns=columns)
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+    else:
+        with data_source(filepath) as src:
+            yield from pd.read_csv(src, sep=fmt, usecols=columns, chunksize=chunksize)
+
+
+def load_csv(filepath: str, verbose: bool = True) -> pd.DataFrame:
     """
     Load a CSV file into a pandas DataFrame.
     Auto-detects delimiter from common options: comma, semicolon, colon, tab, pipe.
-    Uses the delimiter.
+    The delimiter is chosen on a sample of the first rows, then the file is read once.
+    Parquet/Feather files (Seperate.py --columnar) are read directly with their stored types.
+    .gz/.xz/.zst files are decompressed while pandas parses them (no copy on disk).
     FileNotFoundError if file doesn't exist, or ValueError if read/parse fails / file is empty.
     """
+    import pandas as pd
+
     if not os.path.isfile(filepath):
         raise FileNotFoundError(f"File not found: {filepath}")
 
-    # Try common delimiters
-    delimiters = [',', ';', ':', '\t', '|']
-    best_df = None
-    best_delim = ','
-    best_cols = 1
-    
-    for delim in delimiters:
+    if is_columnar(filepath):
+        df = read_columnar(filepath)
+        if df.empty:
+            raise ValueError("File is empty.")
+        if verbose:
+            print("="*40 + f"\nTyped {file_format(filepath)} file (no text parsing)")
+            print(f"Detected {len(df.columns)} columns and {len(df)} rows." + "\n" + "="*40)
+        return df
+
+    best_delim = sniff_delimiter(filepath)
+    with data_source(filepath) as src:
         try:
-            test_df = pd.read_csv(filepath, sep=delim)
+            df = pd.read_csv(src, sep=best_delim)
+        except Exception:
+            df = None
+
+    # Sample looked fine but the full read failed: fall back to trying every delimiter on the whole file
+    if df is None:
+        best_cols = 0
+        for delim in DELIMITERS:
+            with data_source(filepath) as src:
+                try:
+                    test_df = pd.read_csv(src, sep=delim)
+                except Exception:
+                    continue
             if len(test_df.columns) > best_cols:
                 best_cols = len(test_df.columns)
                 best_delim = delim
-                best_df = test_df
-        except Exception:
-            continue
-    
-    # If no delimiter worked, try with ,
-    if best_df is None:
-        try:
-            best_df = pd.read_csv(filepath, sep=',')
-        except Exception as e:
-            raise ValueError(f"Could not read CSV file with any common delimiter: {e}")
-    
-    df = best_df
-    
+                df = test_df
+        if df is None:
+            raise ValueError("Could not read CSV file with any common delimiter.")
+
     if df.empty:
         raise ValueError("CSV file is empty.")
-    
+
     # Show what delimiter was detected
-    delim_names = {',': 'comma', ';': 'semicolon', ':': 'colon', '\t': 'tab', '|': 'pipe'}
-    delim_name = delim_names.get(best_delim, repr(best_delim))
-    print("="*40 + f"\nAuto-detected delimiter: {delim_name}")
-    print(f"Detected {len(df.columns)} columns and {len(df)} rows." + "\n" + "="*40)
+    if verbose:
+        delim_name = DELIMITER_NAMES.get(best_delim, repr(best_delim))
+        print("="*40 + f"\nAuto-detected delimiter: {delim_name}")
+        print(f"Detected {len(df.columns)} columns and {len(df)} rows." + "\n" + "="*40)
     return df
 
 
-# choosing the CSV file
-def choose_csv_file(folder_path: str) -> str:
+def peek_csv(filepath: str, rows: int = 5) -> pd.DataFrame:
     """
-    Interactive file picker: list all .csv files in folder and let user select by number.
-    Returns full path to chosen file. User can enter 'cancel' or 'q' to exit.
+    Read only the header and first `rows` rows (for the preview and column prompts).
+    Raises like load_csv if the file is missing, unreadable or has no data rows.
     """
-    if not os.path.isdir(folder_path):
-        raise NotADirectoryError(f"Not a valid folder: {folder_path}")
+    import pandas as pd
 
-    print(f"" + "="*50 + f"\nLooking for CSV files in: {folder_path}")
+    if not os.path.isfile(filepath):
+        raise FileNotFoundError(f"File not found: {filepath}")
+    if is_columnar(filepath):
+        head = read_columnar(filepath, rows=rows)
+        if head.empty:
+            raise ValueError("File is empty.")
+        print("="*40 + f"\nTyped {file_format(filepath)} file")
+        print(f"Detected {len(head.columns)} columns." + "\n" + "="*40)
+        return head
+    delim = sniff_delimiter(filepath)
+    with data_source(filepath) as src:
+        try:
+            head = pd.read_csv(src, sep=delim, nrows=rows)
+        except Exception as e:
+            raise ValueError(f"Could not read CSV file: {e}")
+    if head.empty:
+        raise ValueError("CSV file is empty.")
+    delim_name = DELIMITER_NAMES.get(delim, repr(delim))
+    print("="*40 + f"\nAuto-detected delimiter: {delim_name}")
+    print(f"Detected {len(head.columns)} columns." + "\n" + "="*40)
+    return head
 
-    # List all .csv files in the folder
-    csv_files = [f for f in os.listdir(folder_path) if f.lower().endswith(".csv")]
 
-    if not csv_files:
-        raise FileNotFoundError("No CSV files found in this folder.")
+# Column kinds found by infer_column_kind(); each numeric kind has a vectorized transform
+VALUE_PATTERNS = [
+    ("float", re.compile(r"^[+-]?(?:\d[\d,]*\.?\d*|\.\d+)(?:[eE][+-]?\d+)?$")),
+    ("percent", re.compile(r"^[+-]?(?:\d+\.?\d*|\.\d+)\s*%$")),
+    ("currency", re.compile(r"^[+-]?[\$€£¥₹]\s*[+-]?\d[\d,]*\.?\d*$|^[+-]?\d[\d,]*\.?\d*\s*[\$€£¥₹]$")),
+    ("x10", re.compile(r"^[+-]?\d[\d\.,]*\s*(?:\*|×|x)\s*10\^?[+-]?\d+$", re.IGNORECASE)),
+    ("unit", re.compile(r"^[+-]?\d[\d\.,]*\s*[a-zA-Z°µ]+$")),
+    ("datetime", re.compile(r"^\d{4}-\d{2}-\d{2}(?:[T ]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?$"
+                            r"|^\d{1,2}[./]\d{1,2}[./]\d{4}(?: \d{1,2}:\d{2}(?::\d{2}(?:[.,]\d+)?)?)?$")),
+]
+MISSING_MARKERS = {"", "-", "–", "—", "na", "n/a"}
+SPECIAL_FLOATS = {"nan": "missing", "inf": "float", "+inf": "float", "-inf": "float",
+                  "infinity": "float", "+infinity": "float", "-infinity": "float"}  # as float() reads them
+SCHEMA_SAMPLE = 256  # values looked at per column (half from the head, half spread over the column)
 
-    print("\nCSV files found:")
-    for i, fname in enumerate(csv_files):
-        print(f"{i}: {fname}")
 
-    while True:
-        choice = input("\nNumber of file to use ('q' to Quit): ").strip().lower()
+def value_kind(value) -> str:
+    """Kind of a single cell: one of the VALUE_PATTERNS kinds, 'missing' or 'categorical'."""
+    if value is None or (isinstance(value, float) and value != value):
+        return "missing"
+    if isinstance(value, (int, float)):
+        return "float"
+    text = str(value).replace("\u00A0", " ").strip()
+    if text in MISSING_MARKERS:
+        return "missing"
+    if text.lower() in SPECIAL_FLOATS:
+        return SPECIAL_FLOATS[text.lower()]
+    for kind, pattern in VALUE_PATTERNS:
+        if pattern.match(text):
+            return kind
+    return "categorical"
 
-        if choice in ["cancel", "q", "quit"]:
-            print("\nProcess cancelled. Exiting...")
-            exit()
 
-        try:
-            idx = int(choice)
-            if 0 <= idx < len(csv_files):
-                chosen_file = csv_files[idx]
-                break
-            else:
-                print(f"Enter a number between 0 and {len(csv_files) - 1}.")
-        except ValueError:
-            print("That is not a valid number. Try again.")
+def sample_values(series: pd.Series, sample: int = SCHEMA_SAMPLE) -> list:
+    """Up to `sample` values of a column: half from the head, half spread over the rest."""
+    n = len(series)
+    if n <= sample:
+        return series.tolist()
+    half = sample // 2
+    positions = list(range(half)) + list(range(half, n, max(1, (n - half) // half)))[:half]
+    return series.iloc[positions].tolist()
 
-    full_path = os.path.join(folder_path, chosen_file)
-    return full_path
 
+def infer_column_kind(series: pd.Series, sample: int = SCHEMA_SAMPLE) -> str:
+    """
+    Column kind from a bounded sample: 'float', 'percent', 'currency', 'x10', 'unit', 'datetime',
+    'categorical', or 'mixed' when the sample holds more than one kind (stops at the first
+    conflicting value) or only missing markers. Only 'mixed' columns are parsed value by
+    value over the whole column.
+    A column whose sampled values are all text is taken as categorical without a full scan.
+    """
+    import pandas as pd
 
-def choose_axes(df: pd.DataFrame):
+    if pd.api.types.is_numeric_dtype(series):
+        return "float"
+    found = None
+    for value in sample_values(series, sample):
+        kind = value_kind(value)
+        if kind == "missing" or kind == found:
+            continue
+        if found is not None:
+            return "mixed"
+        found = kind
+    return found or "mixed"  # nothing but missing markers in the sample: scan it all
+
+
+def parse_column(series: pd.Series, kind: str) -> pd.Series:
     """
-    Prompt user to select X column (single) and Y column(s) (comma-separated, multiple allowed).
-    Returns tuple: (x_col_name, [y_col_names]).
+    Column as floats using the transform for its kind (NaN where a value is not numeric).
+    Values the fast transform can't handle are passed to parse_numeric_string, so the result
+    is the same as parsing every value one by one. Categorical and datetime columns are not
+    parsed as numbers (datetime X values are handled separately).
     """
-    print("\n\nColumns Found:")
-    for i, col in enumerate(df.columns):
-        print(f"{i}: {col}")
+    import numpy as np
+    import pandas as pd
 
-    print("=" * 30)
-    # User selects X axis column
-    while True:
-        x_choice = input("Enter the column number for the X axis: ").strip()
-        try:
-            x_idx = int(x_choice)
-            if 0 <= x_idx < len(df.columns):
-                x_col = df.columns[x_idx]
-                break
-            else:
-                print(f"Enter a number between 0 and {len(df.columns) - 1}.")
-        except ValueError:
-            print("That is not a valid number. Try again.")
+    if kind in ("categorical", "datetime"):
+        return pd.Series(np.nan, index=series.index)
+    if kind == "mixed":
+        return series.apply(parse_numeric_string).astype(float)
 
-    # User selects Y axis column(s); comma-separated list for multiple columns
-    while True:
-        y_choice = input("Enter column number(s) for Y axis data: ").strip()
-        try:
-            indices = [int(x.strip()) for x in y_choice.split(",")]
-            if not indices:
-                print("You must choose at least one Y column.")
-                continue
+    text = series.astype("string").str.replace("\u00A0", " ", regex=False).str.strip()
+    if kind == "percent":
+        pct = text.str.endswith("%").fillna(False).to_numpy(dtype=bool)
+        # float before where(): whole percents would otherwise come back as nullable Int64
+        result = pd.to_numeric(text.str.rstrip("%").str.strip(), errors="coerce").astype(float)
+        result = result.where(~pct, result / 100)
+    elif kind == "x10":
+        parts = text.str.replace(" ", "", regex=False).str.extract(
+            r"^([+-]?\d[\d\.,]*)(?:\*|×|x)10\^?([+-]?\d+)$", flags=re.IGNORECASE)
+        mant = pd.to_numeric(parts[0].str.replace(",", "", regex=False), errors="coerce").astype(float)
+        result = mant * 10.0 ** pd.to_numeric(parts[1], errors="coerce").astype(float)
+    else:
+        if kind == "currency":
+            text = text.str.replace(r"[\$€£¥₹]", "", regex=True)
+        elif kind == "unit":
+            text = text.str.replace(r"^([+-]?\d[\d\.,]*)\s*[a-zA-Z°µ]+$", r"\1", regex=True)
+        result = pd.to_numeric(text.str.replace(",", "", regex=False), errors="coerce").astype(float)
 
-            invalid = [i for i in indices if i < 0 or i >= len(df.columns)]
-            if invalid:
-                print(f"Invalid indices: {invalid}. Try again.")
-                continue
+    # Leftovers (other spellings in a mostly uniform column) go through the general parser
+    leftover = result.isna().to_numpy() & series.notna().to_numpy()
+    if leftover.any():
+        result[leftover] = series[leftover].apply(parse_numeric_string).astype(float)
+    return result
 
-            # Remove duplicates, keep order
-            y_indices = []
-            for i in indices:
-                if i not in y_indices:
-                    y_indices.append(i)
 
+# Timestamp formats tried (in order) on a sample of a 'datetime' column; the first one that
+# reads every sampled value is used for the whole column
+DATETIME_FORMATS = ["ISO8601"] + [date + time for date in ("%d.%m.%Y", "%d/%m/%Y", "%m/%d/%Y")
+                                  for time in (" %H:%M:%S.%f", " %H:%M:%S,%f", " %H:%M:%S", " %H:%M", "")]
+EPOCH_HINTS = ("epoch", "unix", "timestamp")  # numeric columns with these names may be epoch times
+_DATETIME_FORMATS = {}  # (path, size, mtime_ns, column) -> format found by infer_datetime_format
 
-            y_cols = [df.columns[i] for i in y_indices]
-            break
-        except ValueError:
-            print("Could not get that. Use numbers separated by commas.") # Try again if miss clicked
 
-    return x_col, y_cols
+def infer_datetime_format(series: pd.Series, name: str = "") -> str:
+    """
+    Timestamp format of a column from a bounded sample: one of DATETIME_FORMATS, 'epoch-s' /
+    'epoch-ms' for numeric columns named like a timestamp (values between 2001 and 2286),
+    or None when the column doesn't hold timestamps. Text columns are only tried when every
+    sampled value looks like a date (plain numbers such as 2048 are not years) and the dates
+    fit datetime64[ns].
+    """
+    import pandas as pd
+
+    if pd.api.types.is_numeric_dtype(series):
+        if not any(hint in str(name).lower() for hint in EPOCH_HINTS):
+            return None
+        values = pd.Series(sample_values(series), dtype=float).dropna()
+        for unit, low in (("s", 1e9), ("ms", 1e12)):
+            if len(values) and values.between(low, low * 10).all():
+                return f"epoch-{unit}"
+        return None
+
+    values = [str(v).strip() for v in sample_values(series) if value_kind(v) != "missing"]
+    if not values or any(value_kind(v) != "datetime" for v in values):
+        return None
+    for fmt in DATETIME_FORMATS:
+        try:
+            pd.to_datetime(pd.Series(values), format=fmt, utc=(fmt == "ISO8601")).dt.as_unit("ns")
+        except (ValueError, TypeError, OverflowError, pd.errors.OutOfBoundsDatetime):
+            continue
+        return fmt
+    return None
 
 
-def show_summary_stats(df: pd.DataFrame, numeric_cols: list):
+def datetime_column(series: pd.Series, fmt: str) -> pd.Series:
     """
-    Display summary statistics (min, max, mean, median, std) for all columns.
-    User chooses which statistics to display via comma-separated selection (e.g., 1,3,5).
-    Optionally compute linear slope(s) (y = m*x + b) between a chosen X column and one or more Y columns.
+    Whole column converted to datetime64[ns] in one call with a known format (NaT where a
+    value doesn't fit). ISO times with a UTC offset are converted to UTC.
     """
-    print("\n" + "=" * 20)
-    print("SUMMARY STATISTICS")
-    print("1: Minimum")
-    print("2: Maximum")
-    print("3: Mean")
-    print("4: Median")
-    print("5: Standard deviation")
-    print("6: All statistics")
-    print("7: Compute slope(s) for chosen X and Y columns")
-    print("\nEnter choice(s), comma-separated.")
-    print("Or press Enter to skip statistics")
-    print("=" * 20)
-    choice = input("Enter your choice: ").strip()
-    if choice == "":
-        return
+    import pandas as pd
 
-    stats_list = ["min", "max", "mean", "median", "std"]
-    selected = []
-    slope_requested = False
+    if fmt.startswith("epoch-"):
+        return pd.to_datetime(series, unit=fmt[6:], errors="coerce").astype("datetime64[ns]")
+    text = series.astype("string").str.strip()
+    iso = text
+    if fmt != "ISO8601":
+        # pandas' ISO parser is several times faster than strptime-style formats, so the date
+        # part is reordered to yyyy-mm-dd first; rows this doesn't fit use the exact format
+        day, month = (2, 1) if fmt.startswith("%m") else (1, 2)
+        iso = text.str.replace(r"^(\d{2})[./](\d{2})[./](\d{4})", rf"\3-\{month}-\{day}", regex=True)
+        if ",%f" in fmt:
+            iso = iso.str.replace(",", ".", regex=False)
+    parsed = pd.to_datetime(iso, format="ISO8601", errors="coerce", utc=True).dt.tz_localize(None)
+    parsed = parsed.astype("datetime64[ns]")
+    if fmt != "ISO8601":
+        leftover = parsed.isna().to_numpy() & text.notna().to_numpy()
+        if leftover.any():
+            parsed[leftover] = pd.to_datetime(text[leftover], format=fmt, errors="coerce")
+    return parsed
 
-    # Parse comma-separated numbers
-    try:
-        indices = [int(x.strip()) for x in choice.split(",")]
-    except ValueError:
-        print("Invalid input. Could not parse numbers.")
-        return
 
-    if 6 in indices:
-        selected = stats_list.copy()
+def is_datetime(series: pd.Series) -> bool:
+    import pandas as pd
 
-    for idx in indices:
-        if idx == 6:
-            continue
-        if idx == 7:
-            slope_requested = True
-            continue
-        if 1 <= idx <= 5:
-            stat_name = stats_list[idx - 1]
-            if stat_name not in selected:
-                selected.append(stat_name)
-        else:
-            print(f"Warning: {idx} is not a valid choice (1-7). Skipping.")
+    return pd.api.types.is_datetime64_any_dtype(series)
 
-    if not selected and not slope_requested:
-        print("No valid statistics selected.")
-        return
 
-    # Calculate requested statistics (min/max/mean/median/std) for each numeric column
-    stats_results = {}
-    for col in numeric_cols:
+def parse_timestamp(text: str, fmt: str = None):
+    """
+    One typed-in timestamp (filter bounds), read day-first when the column's format is, so
+    '01.05.2024 08:10' means 1 May (ISO dates are always year-month-day). Partial times are
+    allowed. Raises ValueError if unreadable.
+    """
+    import pandas as pd
+
+    text = text.strip()
+    if fmt and fmt.startswith("epoch-"):
         try:
-            # Convert to numeric using smart parsing (handles percentages, currency, etc.)
-            data = df[col].apply(parse_numeric_string).dropna()
-            if len(data) == 0:
-                print(f"\n{col}: (no numeric data)")
-                continue
-            col_stats = {}
-            if "min" in selected:
-                col_stats['min'] = data.min()
-            if "max" in selected:
-                col_stats['max'] = data.max()
-            if "mean" in selected:
-                col_stats['mean'] = data.mean()
-            if "median" in selected:
-                col_stats['median'] = data.median()
-            if "std" in selected:
-                col_stats['std'] = data.std()
+            return pd.to_datetime(float(text), unit=fmt[6:])
+        except ValueError:
+            pass
+    dayfirst = bool(fmt) and fmt.startswith("%d") and not re.match(r"\d{4}-", text)
+    stamp = pd.to_datetime(text, dayfirst=dayfirst) if text else pd.NaT
+    if pd.isna(stamp):
+        raise ValueError(f"Could not read timestamp: {text!r}")
+    return stamp.tz_convert(None) if stamp.tzinfo else stamp
 
-            # Print to console as before
-            print(f"\n{col}:" + "\n" + "-" * 30)
-            for k, v in col_stats.items():
-                label = k.capitalize()
-                print(f"  {label}: {v:.6g}")
-            print("-"*30)
-            stats_results[col] = col_stats
-        except Exception as e:
-            print(f"\n{col}: Could not compute statistics ({e})")
 
-    # If slope computation requested, prompt for X and Y columns and compute
-    if slope_requested:
-        print("\nSLOPE COMPUTATION")
-        print("Available columns:")
-        for i, col in enumerate(df.columns):
-            print(f"{i}: {col}")
+# Scope captures hold few distinct levels: every value is offset + k * step (the ADC resolution),
+# written with a fixed number of digits or decimals. With --quantize such columns are kept as
+# int8/int16 codes and decoded through a table of the printed values, so the round trip is exact.
+QUANTIZE_MIN_ROWS = 64  # shorter columns are left as floats (nothing to gain)
+_CODE_TABLES = {}       # (scale, offset, format, dtype, fixed) -> value of every code (index 0 = missing)
 
-        # Choose X axis
-        while True:
-            x_choice = input("\nEnter the column number to use as X for slope calculation ('c' to cancel): ").strip()
-            if x_choice.lower() in ["c", "cancel"]:
-                print("Slope computation cancelled.")
-                return
-            try:
-                x_idx = int(x_choice)
-                if 0 <= x_idx < len(df.columns):
-                    x_col = df.columns[x_idx]
-                    break
-                else:
-                    print(f"Enter a number between 0 and {len(df.columns) - 1}.")
-            except ValueError:
-                print("That is not a valid number. 'c' to cancel.")
 
-        # Choose Y axes
-        while True:
-            y_choice = input("Enter column number(s) for Y. 'c' to cancel: ").strip()
-            if y_choice.lower() in ["c", "cancel"]:
-                print("Slope computation cancelled.")
-                return
-            try:
-                y_indices = [int(x.strip()) for x in y_choice.split(",")]
-                # Validate indices
-                invalid = [i for i in y_indices if i < 0 or i >= len(df.columns)]
-                if invalid:
-                    print(f"Invalid indices: {invalid}. Try again.")
-                    continue
-                # Remove X if present in Y list
-                y_indices = [i for i in y_indices if i != x_idx]
-                if not y_indices:
-                    print("Y columns cannot be the same as X. Choose different column(s).")
-                    continue
-                y_cols = [df.columns[i] for i in y_indices]
+def text_formats(values) -> list:
+    """
+    Format specs that print every value so it reads back exactly: the fewest significant
+    digits (".6g") and the fewest decimals (".6f"), whichever exist within 17.
+    """
+    values = [float(v) for v in values]
+    sample = values[::max(1, len(values) // SCHEMA_SAMPLE)]
+    formats = []
+    for kind in "gf":
+        for digits in range(1 if kind == "g" else 0, 18):
+            spec = f".{digits}{kind}"
+            if all(float(format(v, spec)) == v for v in sample) and all(float(format(v, spec)) == v for v in values):
+                formats.append(spec)
                 break
-            except ValueError:
-                print("Could not parse that. Use numbers separated by commas.")
+    return formats
 
-        # Compute linear slope (m) and intercept (b) for fitted line y = m*x + b, plus R² quality
-        for ycol in y_cols:
-            try:
-                # Align X and Y: drop rows where either column has NaN or non-numeric value
-                x_vals = df[x_col].apply(parse_numeric_string)
-                y_vals = df[ycol].apply(parse_numeric_string)
-                valid = pd.concat([x_vals, y_vals], axis=1).dropna()
-                if valid.empty:
-                    print(f"\n{ycol}: (no numeric data after alignment with X)")
-                    continue
-                x = valid[x_col].values
-                y = valid[ycol].values
-                # Fit linear polynomial: np.polyfit returns [slope, intercept] for degree=1
-                slope, intercept = np.polyfit(x, y, 1)
-                # Compute R² (coefficient of determination): 0=poor fit, 1=perfect fit
-                y_pred = slope * x + intercept  # Predicted y values from fitted line
-                ss_res = ((y - y_pred) ** 2).sum()  # Sum of squared residuals (prediction errors)
-                ss_tot = ((y - y.mean()) ** 2).sum()  # Total sum of squares (data variance)
-                r2 = 1.0 - ss_res / ss_tot if ss_tot != 0 else float('nan')  # R² = 1 - (residual/total)
-                print(f"\n{ycol} vs {x_col}:")
-                print(f"  Slope:     {slope:.6g}")
-                print(f"  Intercept: {intercept:.6g}")
-                if not (r2 != r2):  # check for NaN
-                    print(f"  R^2:       {r2:.6g}")
-            except Exception as e:
-                print(f"\n{ycol}: Could not compute slope ({e})")
 
-    # Return selected stat keys and numeric results so the caller can annotate plots
-    return selected, stats_results
+def code_table(q: dict):
+    """
+    Float value of every code of a quantized column (q from df.attrs["quantized"]), indexed by
+    code - lowest code of the dtype. Index 0 is the missing-value code and holds NaN.
+    """
+    import numpy as np
+
+    fixed = q.get("fixed", {})
+    key = (q["scale"], q["offset"], q["format"], q["dtype"], tuple(sorted(fixed.items())))
+    table = _CODE_TABLES.get(key)
+    if table is None:
+        info = np.iinfo(q["dtype"])
+        raw = q["offset"] + np.arange(info.min + 1, info.max + 1, dtype=float) * q["scale"]
+        table = np.array([np.nan] + [float(format(v, q["format"])) for v in raw.tolist()])
+        for code, value in fixed.items():
+            table[code - info.min] = value
+        if len(_CODE_TABLES) >= 64:
+            _CODE_TABLES.clear()
+        _CODE_TABLES[key] = table
+    return table
 
 
-def pick_row_range(df: pd.DataFrame) -> pd.DataFrame:
+def decode_codes(codes, q: dict):
+    """Float64 values of an array of codes of a quantized column."""
+    import numpy as np
+
+    return code_table(q)[codes.astype(np.intp) - np.iinfo(q["dtype"]).min]
+
+
+def quantize_column(values):
     """
-    Selecting range to use for analysis/plotting.
+    Codes for a float column whose values all lie on one step: value = offset + code * scale,
+    printed with `format` (".6g", ".4f": as in the CSV text). Missing values get the lowest
+    code of the dtype. Every distinct value is checked against the decoded table, so decoding
+    gives back exactly the parsed numbers; the few levels where the fitted step rounds to the
+    neighbouring last digit are kept in q["fixed"] ({code: value}).
+    Returns (codes, {"scale", "offset", "format", "dtype"[, "fixed"]}), or None when the column
+    has no such structure or needs more than 65535 levels.
     """
-    total = len(df)
-    if total == 0:
-        print("No rows available in the dataset.")
-        return df
-    print("=" * 50)
-    print(f"Rows available: 1 - {total}")
-    choice = input("Would you like to graph a part of rows? (Y/N): ").strip().upper()
-    if choice != "Y":
-        return df
+    import numpy as np
 
-    while True:
-        start_str = input("Enter start row number: ").strip() # row start
-        end_str = input("Enter end row number: ").strip() # row end
-        try:
-            start = int(start_str)
-            end = int(end_str)
-        except ValueError:
-            print("Invalid input. Enter integer row numbers.") # if not integer
-            continue
+    values = np.asarray(values, dtype=float)
+    missing = np.isnan(values)
+    levels, inverse = np.unique(values[~missing], return_inverse=True)
+    if values.size - missing.sum() < QUANTIZE_MIN_ROWS or levels.size > 65535 or np.isinf(levels).any():
+        return None
+    formats = text_formats(levels)
+    if not formats:
+        return None
+    steps, scale, offset = np.zeros(levels.size), 1.0, float(levels[0])
+    if levels.size > 1:
+        gaps = np.diff(levels)
+        step = float(np.median(gaps[gaps < 1.5 * gaps.min()]))  # printed values are rounded: average the gaps
+        steps = np.rint((levels - levels[0]) / step)
+        upto = 64
+        while True:  # refit on 8x more levels each round, before the step error adds up to half a step
+            scale, offset = (float(v) for v in np.polyfit(steps[:upto], levels[:upto], 1))
+            steps = np.rint((levels - offset) / scale)
+            if upto >= levels.size:
+                break
+            upto *= 8
+    span = steps.max() - steps.min() + 1
+    dtype = "int8" if span <= 255 else "int16" if span <= 65535 else None
+    if dtype is None:
+        return None
+    lowest = np.iinfo(dtype).min + 1
+    level_codes = (steps - steps.min() + lowest).astype(dtype)
+    offset = float(offset + (steps.min() - lowest) * scale)
+    candidates = [{"scale": scale, "offset": offset, "format": spec, "dtype": dtype} for spec in formats]
+    misses = [decode_codes(level_codes, q) != levels for q in candidates]
+    best = min(range(len(candidates)), key=lambda i: misses[i].sum())
+    q, wrong = candidates[best], misses[best]
+    if wrong.sum() > max(16, levels.size // 4):
+        return None
+    if wrong.any():
+        q["fixed"] = {int(c): float(v) for c, v in zip(level_codes[wrong], levels[wrong])}
+    if not np.array_equal(decode_codes(level_codes, q), levels):
+        return None  # two values on one code: not a fixed step after all
+    codes = np.full(values.size, lowest - 1, dtype=dtype)
+    codes[~missing] = level_codes[inverse]
+    return codes, q
 
-        if start < 1 or end < 1 or start > end or end > total: # checks if range is valid
-            print(f"Invalid range. Please enter values between 1 and {total}, and start <= end.")
-            continue
 
-        # Slice using iloc (end is inclusive for users, iloc end is exclusive)
-        sliced = df.iloc[start - 1:end].reset_index(drop=True) # reset_index to renumber rows
-        print(f"Selected rows: {start} to {end} ({len(sliced)} rows)")
-        return sliced
+def quantized_summary(df: pd.DataFrame, col: str) -> dict:
+    """
+    count/min/max/mean/median/std of a quantized column, from a histogram of its codes
+    (no float copy of the column). None when the column is not quantized.
+    """
+    import numpy as np
+
+    q = df.attrs.get("quantized", {}).get(col)
+    if q is None:
+        return None
+    table = code_table(q)
+    codes = df[col].to_numpy()
+    counts = np.zeros(table.size, dtype=np.int64)
+    for start in range(0, codes.size, CONDITION_CHUNK):
+        counts += np.bincount(codes[start:start + CONDITION_CHUNK].astype(np.intp) - np.iinfo(q["dtype"]).min,
+                              minlength=table.size)
+    counts[0] = 0  # missing values
+    n = int(counts.sum())
+    if n == 0:
+        return {"count": 0}
+    used = np.flatnonzero(counts)
+    values, weights = table[used], counts[used]
+    mean = float((values * weights).sum() / n)
+    ranks = np.cumsum(weights)
+    middle = values[np.searchsorted(ranks, [(n - 1) // 2, n // 2], side="right")]
+    return {"count": n, "min": float(values[0]), "max": float(values[-1]), "mean": mean,
+            "median": float(middle.mean()),
+            "std": float(np.sqrt((weights * (values - mean) ** 2).sum() / (n - 1))) if n > 1 else float("nan")}
 
 
-def filter_data(df: pd.DataFrame, x_col: str, y_cols: list) -> pd.DataFrame:
+def numeric_column(df: pd.DataFrame, col: str) -> pd.Series:
     """
-    Filter data rows by a user-specified condition (e.g., column > value).
-    Returns filtered DataFrame; if no filter chosen, returns full DataFrame unchanged.
+    Column as floats parsed with parse_numeric_string (NaN where a value is not numeric).
+    Columns pandas already read as numbers are converted directly, without per-value parsing;
+    text columns use the transform for their kind (from df.attrs["schema"] or a sample).
+    Datetime columns give seconds since 1970-01-01 (so sample rates and spectra still work).
+    Quantized columns (df.attrs["quantized"]) are decoded from their codes.
     """
-    print("=" * 50)
-    filter_choice = input("Filter Points of Interest? (Y/N): ").strip().upper()
-    if filter_choice != "Y":
-        return df
-    
-    all_cols = [x_col] + y_cols
-    print("\nAvailable columns:")
-    for i, col in enumerate(all_cols):
-        print(f"{i}: {col}")
-    
-    col_idx = input("\nEnter column number to filter on: ").strip()
-    try:
-        col_idx = int(col_idx)
-        if col_idx < 0 or col_idx >= len(all_cols):
-            print("Invalid column index.")
-            return df
-        filter_col = all_cols[col_idx]
-    except ValueError:
-        print("Invalid input.")
-        return df
-    print("\n" + "=" * 30)
-    print("\nFilter operators:")
-    print("1: > (greater than)")
-    print("2: < (less than)")
-    print("3: >= (greater or equal)")
-    print("4: <= (less or equal)")
-    print("5: == (equal to)")
-    print("6: != (not equal to)")
-    print("7: Between (Value range)")
-    print("\n" + "=" * 30)
-    
-    op_choice = input("Enter operator (1-7): ").strip()
-    op_map = {"1": ">", "2": "<", "3": ">=", "4": "<=", "5": "==", "6": "!=", "7": "between"}
-    op = op_map.get(op_choice)
-    if not op:
-        print("Invalid operator.")
-        return df
-    
-    # Prepare numeric column for comparison
-    col_data = df[filter_col].apply(parse_numeric_string)
+    import pandas as pd
 
-    # Handle 'between' operator specially (two inputs)
-    if op == "between":
-        print("\nBetween operator: include bounds or exclude?")
-        print("1: Exclusive (> low AND < high)")
-        print("2: Inclusive (>= low AND <= high)")
-        inclusive_choice = input("Enter choice (1-2): ").strip() or "1"
-        inclusive = (inclusive_choice == "2")
-        
-        low_str = input(f"Enter lower bound for {filter_col}: ").strip()
-        high_str = input(f"Enter upper bound for {filter_col}: ").strip()
-        try:
-            low = float(low_str)
-            high = float(high_str)
-        except ValueError:
-            print("Invalid bound values.")
-            return df
-        
-        if inclusive:
-            mask = (col_data >= low) & (col_data <= high)
-            bound_desc = f"between {low} and {high} (inclusive)"
-        else:
-            mask = (col_data > low) & (col_data < high)
-            bound_desc = f"between {low} and {high} (exclusive)"
-    else:
-        value_str = input(f"Enter value to compare {filter_col} {op} : ").strip()
-        try:
-            value = float(value_str)
-        except ValueError:
-            print("Invalid value.")
-            return df
-        # Apply the chosen comparison operator to create a boolean mask (True = rows to keep)
-        if op == ">":
-            mask = col_data > value
-        elif op == "<":
-            mask = col_data < value
-        elif op == ">=":
-            mask = col_data >= value
-        elif op == "<=":
-            mask = col_data <= value
-        elif op == "==":
-            mask = col_data == value
-        elif op == "!=":
-            mask = col_data != value
-    
-    # Filter DataFrame using mask; reset_index renumbers rows starting at 0
-    filtered_df = df[mask].reset_index(drop=True)
-    # Print an informative message depending on operator used
-    if op == "between":
-        print(f"\nFiltered: {len(filtered_df)} of {len(df)} rows match {filter_col} {bound_desc}")
-    else:
-        print(f"\nFiltered: {len(filtered_df)} of {len(df)} rows match {filter_col} {op} {value}")
-    return filtered_df
+    series = df[col]
+    q = df.attrs.get("quantized", {}).get(col)
+    if q is not None:
+        return pd.Series(decode_codes(series.to_numpy(), q), index=df.index, name=col)
+    if is_datetime(series):
+        return (series - pd.Timestamp(0)).dt.total_seconds()
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+    kind = df.attrs.get("schema", {}).get(col) or infer_column_kind(series)
+    return parse_column(series, kind)
 
 
-def sample_data_points(df: pd.DataFrame) -> pd.DataFrame:
+def index_numeric_columns(df: pd.DataFrame, source: str = None):
     """
-    Sample data by plotting every Nth point (useful for large datasets).
-    Returns sampled DataFrame or full DataFrame if sampling skipped.
+    Parse every column once. Columns with at least one numeric value are replaced by their
+    float version, so later stages (stats, filter, plot) don't parse the text again.
+    Timestamp columns are replaced by datetime64 (not listed in numeric_cols); their format
+    is cached per file version and column when `source` (the file path) is given.
+    The kind of every column is kept in indexed.attrs["schema"], timestamp formats in
+    indexed.attrs["datetime_formats"]. With --quantize, numeric columns on a fixed step are
+    stored as int codes, their scale/offset in indexed.attrs["quantized"] (see quantize_column).
+    Returns (indexed_df, numeric_cols); the input DataFrame is not modified.
     """
-    total = len(df)
-    if total == 0:
-        return df
-    
-    print("\n" + "=" * 50)
-    print("DATA POINT SAMPLING (for large datasets)")
-    print("=" * 50)
-    print(f"Total data points: {total}")
-    
-    # Only prompt if dataset is reasonably large
-    if total < 100:
-        print("Dataset is small enough to plot all points.")
-        return df
-    
-    choice = input("\nPlot every Nth point to reduce density? (Y/N): ").strip().upper()
-    if choice != "Y":
-        return df
-    
-    while True:
-        step_str = input(f"Enter step size: ").strip()
+    import pandas as pd
+
+    indexed = df.copy(deep=False)
+    schema = {}
+    quantized = {}
+    numeric_cols = []
+    formats = {}
+    identity = file_identity(source) if source else None
+    for col in df.columns:
+        schema[col] = infer_column_kind(df[col])
+        if schema[col] in ("datetime", "float"):
+            key = identity + (col,) if identity else None
+            fmt = _DATETIME_FORMATS.get(key) if key else None
+            fmt = fmt or infer_datetime_format(df[col], col)
+            if fmt:
+                if key:
+                    _DATETIME_FORMATS[key] = fmt
+                try:
+                    stamps = datetime_column(df[col], fmt)
+                except (OverflowError, pd.errors.OutOfBoundsDatetime):
+                    stamps = None  # dates outside 1677-2262 further down: read the column as numbers
+                if stamps is not None and stamps.notna().any():
+                    indexed[col] = stamps
+                    schema[col] = "datetime"
+                    formats[col] = fmt
+                    continue
+            if schema[col] == "datetime":
+                schema[col] = "mixed"  # looked like dates, but no known format fits
+        parsed = parse_column(df[col], schema[col]) if schema[col] != "float" else numeric_column(df, col)
+        if parsed.notna().any():
+            found = quantize_column(parsed.to_numpy()) if QUANTIZE else None
+            if found:
+                indexed[col] = pd.Series(found[0], index=df.index, name=col)
+                quantized[col] = found[1]
+            else:
+                indexed[col] = parsed
+            numeric_cols.append(col)
+    indexed.attrs["schema"] = schema
+    indexed.attrs["datetime_formats"] = formats
+    indexed.attrs["quantized"] = quantized
+    return indexed, numeric_cols
+
+
+# Background loading: the chosen file (and optionally the next one in the list) is loaded
+# and indexed on a worker thread while the user is still answering prompts.
+_PREFETCH_POOL = None
+_PREFETCHED = {}       # (path, size, mtime) -> Future of (indexed_df, numeric_cols)
+_PREFETCH_KEEP = 3     # number of prefetched files kept in memory
+
+
+def file_identity(filepath: str) -> tuple:
+    """(absolute path, size, mtime_ns): changes whenever the file is edited or replaced."""
+    st = os.stat(filepath)
+    return (os.path.abspath(filepath), st.st_size, st.st_mtime_ns)
+
+
+def _load_and_index(filepath: str):
+    return index_numeric_columns(load_csv(filepath, verbose=False), source=filepath)
+
+
+def prefetch_csv(filepath: str):
+    """
+    Start loading and indexing `filepath` in the background (no-op if already started for the
+    same file version). Returns a Future; .result() gives (indexed_df, numeric_cols) or raises
+    the load error.
+    """
+    global _PREFETCH_POOL
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+    if not PREFETCH:
+        future = Future()
         try:
-            step = int(step_str)
-            if step < 1:
-                print("Step must be at least 1.")
-                continue
-            if step >= total:
-                print(f"Step too large. Must be less than {total}.")
-                continue
-            break
-        except ValueError:
-            print("Invalid input. Enter an integer.")
-    
-    # Sample every Nth row using iloc with step
-    sampled = df.iloc[::step].reset_index(drop=True)
-    print(f"Sampled {len(sampled)} points (every {step} point(s)) from {total} total.")
-    return sampled
+            future.set_result(_load_and_index(filepath))
+        except Exception as e:
+            future.set_exception(e)
+        return future
 
+    key = file_identity(filepath)
+    if key in _PREFETCHED:
+        return _PREFETCHED[key]
 
-def plot_data(df: pd.DataFrame, x_col: str, y_cols: list):
+    if _PREFETCH_POOL is None:
+        _PREFETCH_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch")
+    future = _PREFETCH_POOL.submit(_load_and_index, filepath)
+    _PREFETCHED[key] = future
+    # Forget the oldest files so memory stays bounded
+    while len(_PREFETCHED) > _PREFETCH_KEEP:
+        _PREFETCHED.pop(next(iter(_PREFETCHED)))
+    return future
+
+
+def list_csv_files(folder_path: str) -> list:
     """
-    Plot selected X and Y columns with multiple plot types (line/scatter/bar/histogram).
-    Supports trend lines (linear/polynomial), dual Y-axis, and plot saving (PNG/PDF).
+    All .csv (also .csv.gz/.csv.xz/.csv.zst, and typed .parquet/.feather) file names in the
+    folder, in the order the picker shows them.
     """
-    print("=" * 30 + "\n" + f"Plotting X: {x_col}")
-    print(f"Plotting Y columns: {', '.join(y_cols)}" + "\n" + "=" * 30)
+    return [f for f in os.listdir(folder_path)
+            if strip_compression(f).lower().endswith(".csv") or f.lower().endswith(COLUMNAR_EXTS)]
 
-    # User chooses plot visualization type
-    print("Plot types:")
-    print("1: Line plot")
-    print("2: Scatter plot")
-    print("3: Bar chart")
-    print("4: Histogram")
-    
-    plot_choice = input("\nEnter plot type (1-4): ").strip() or "1"
-    plot_type = {"1": "line", "2": "scatter", "3": "bar", "4": "histogram"}.get(plot_choice, "line")
 
-    # Ask about axis scaling (logarithmic, semi-log, etc.)
-    print("\nAxis scaling:")
-    print("1: Linear (default)")
-    print("2: Log-log (both axes logarithmic)")
-    print("3: Semi-log X (X logarithmic, Y linear)")
-    print("4: Semi-log Y (X linear, Y logarithmic)")
-    scale_choice = input("Enter scale type (1-4): ").strip() or "1"
-    scale_type = {"1": "linear", "2": "loglog", "3": "semilogx", "4": "semilogy"}.get(scale_choice, "linear")
+def next_csv_file(filepath: str):
+    """The file listed after `filepath` in the picker (the most likely next choice), or None."""
+    folder, name = os.path.split(filepath)
+    csv_files = list_csv_files(folder or ".")
+    if name in csv_files:
+        idx = csv_files.index(name)
+        if idx + 1 < len(csv_files):
+            return os.path.join(folder, csv_files[idx + 1])
+    return None
+
+
+# Per-folder metadata catalog: size, mtime, delimiter, header, row count and per-column
+# min/max/mean of every CSV, so the picker can describe files without loading them.
+CATALOG_NAME = ".graph_catalog.sqlite"
+
+
+def scan_csv_file(filepath: str) -> dict:
+    """
+    Read a CSV in chunks (constant memory) and collect its catalog entry:
+    delimiter, header, row count and min/max/mean of every numeric column.
+    Never raises; unreadable files get an 'error' entry instead.
+    """
+    st = os.stat(filepath)
+    entry = {"name": os.path.basename(filepath), "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+             "delimiter": None, "header": [], "rows": None, "columns": {}, "error": None}
+    try:
+        delim = file_format(filepath)
+        rows = 0
+        acc = {}  # col -> [min, max, sum, count]
+        for chunk in read_chunks(filepath, chunksize=200_000, fmt=delim):
+            if not entry["header"]:
+                entry["header"] = [str(c) for c in chunk.columns]
+            rows += len(chunk)
+            for col in chunk.columns:
+                data = numeric_column(chunk, col).dropna()
+                if data.empty:
+                    continue
+                a = acc.setdefault(str(col), [float("inf"), float("-inf"), 0.0, 0])
+                a[0] = min(a[0], float(data.min()))
+                a[1] = max(a[1], float(data.max()))
+                a[2] += float(data.sum())
+                a[3] += len(data)
+        entry["delimiter"] = delim
+        entry["rows"] = rows
+        entry["columns"] = {col: {"min": a[0], "max": a[1], "mean": a[2] / a[3]} for col, a in acc.items()}
+    except Exception as e:
+        entry["error"] = str(e)
+    return entry
+
+
+def refresh_catalog(folder_path: str, csv_files: list) -> dict:
+    """
+    Bring the folder's catalog up to date and return {file name: entry}.
+    Only new or changed files (size/mtime differ) are scanned, in parallel worker processes;
+    entries for deleted files are dropped. Returns {} if the catalog can't be used.
+    """
+    import json
+    import sqlite3
+
+    db_path = os.path.join(folder_path, CATALOG_NAME)
+    try:
+        con = sqlite3.connect(db_path)
+        con.execute("CREATE TABLE IF NOT EXISTS files (name TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+                    "delimiter TEXT, header TEXT, rows INTEGER, columns TEXT, error TEXT)")
+        known = {row[0]: row for row in con.execute("SELECT * FROM files")}
+    except Exception as e:
+        print(f"(Catalog unavailable: {e})")
+        return {}
+
+    stale = []
+    for fname in csv_files:
+        st = os.stat(os.path.join(folder_path, fname))
+        row = known.get(fname)
+        if row is None or row[1] != st.st_size or row[2] != st.st_mtime_ns:
+            stale.append(os.path.join(folder_path, fname))
+
+    if stale:
+        print(f"Cataloguing {len(stale)} new/changed file(s)...")
+        entries = []
+        if len(stale) > 1:
+            try:
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=min(len(stale), os.cpu_count() or 1)) as pool:
+                    entries = list(pool.map(scan_csv_file, stale))
+            except Exception:
+                entries = []  # no worker processes available here; scan in this process
+        if not entries:
+            entries = [scan_csv_file(path) for path in stale]
+        with con:
+            con.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [
+                (e["name"], e["size"], e["mtime_ns"], e["delimiter"], json.dumps(e["header"]),
+                 e["rows"], json.dumps(e["columns"]), e["error"]) for e in entries])
+
+    removed = [name for name in known if name not in csv_files]
+    if removed:
+        with con:
+            con.executemany("DELETE FROM files WHERE name = ?", [(name,) for name in removed])
+
+    catalog = {}
+    for row in con.execute("SELECT * FROM files"):
+        catalog[row[0]] = {"size": row[1], "mtime_ns": row[2], "delimiter": row[3], "header": json.loads(row[4]),
+                           "rows": row[5], "columns": json.loads(row[6]), "error": row[7]}
+    con.close()
+    return catalog
+
+
+def describe_catalog_entry(entry: dict) -> str:
+    """Two-line summary of a catalog entry for the file picker."""
+    if entry.get("error"):
+        return f"   (unreadable: {entry['error']})"
+    size = entry["size"]
+    size_txt = f"{size / 1e6:.1f} MB" if size >= 1e6 else f"{size / 1e3:.1f} KB"
+    delim_name = DELIMITER_NAMES.get(entry["delimiter"], repr(entry["delimiter"]))
+    cols = []
+    for col in entry["header"]:
+        st = entry["columns"].get(col)
+        cols.append(f"{col} [{st['min']:.4g} .. {st['max']:.4g}, mean {st['mean']:.4g}]" if st else col)
+    return (f"   {entry['rows']} rows, {len(entry['header'])} cols, {size_txt}, {delim_name}\n"
+            f"   " + " | ".join(cols))
+
+
+# choosing the CSV file
+def choose_csv_file(folder_path: str, multiple: bool = False, purpose: str = "overlay", min_files: int = 2):
+    """
+    Interactive file picker: list all .csv files in folder and let user select by number.
+    With the catalog enabled, each file is shown with its row count, columns and ranges,
+    and '/text' lists only files having a column whose name contains 'text'.
+    Returns full path to chosen file (a list of at least `min_files` paths with multiple=True,
+    entered as comma-separated numbers, ranges like 3-40, or 'all').
+    User can enter 'cancel' or 'q' to exit.
+    """
+    if not os.path.isdir(folder_path):
+        raise NotADirectoryError(f"Not a valid folder: {folder_path}")
+
+    print(f"" + "="*50 + f"\nLooking for CSV files in: {folder_path}")
+
+    # List all .csv files in the folder
+    csv_files = list_csv_files(folder_path)
+
+    if not csv_files:
+        raise FileNotFoundError("No CSV files found in this folder.")
+
+    catalog = refresh_catalog(folder_path, csv_files) if USE_CATALOG else {}
+
+    def show_files(search: str = ""):
+        shown = 0
+        for i, fname in enumerate(csv_files):
+            entry = catalog.get(fname)
+            if search:
+                header = entry["header"] if entry else []
+                if not any(search in str(col).lower() for col in header):
+                    continue
+            print(f"{i}: {fname}")
+            if entry:
+                print(describe_catalog_entry(entry))
+            shown += 1
+        if search:
+            print(f"({shown} file(s) with a column matching '{search}'; '/' shows all)")
+
+    print("\nCSV files found:")
+    show_files()
+
+    what = f"Numbers of files to {purpose} (e.g. 0,2,5-9 or all)" if multiple else "Number of file to use"
+    prompt = f"\n{what} ('q' to Quit): "
+    if catalog:
+        prompt = f"\n{what} ('/name' to search columns, 'q' to Quit): "
+    while True:
+        choice = input(prompt).strip().lower()
+
+        if choice in ["cancel", "q", "quit"]:
+            print("\nProcess cancelled. Exiting...")
+            exit()
+
+        if choice.startswith("/") and catalog:
+            show_files(choice[1:].strip())
+            continue
+
+        if multiple:
+            try:
+                indices = []
+                for part in ("0-" + str(len(csv_files) - 1) if choice == "all" else choice).split(","):
+                    low, _, high = part.strip().partition("-")
+                    indices.extend(range(int(low), int(high) + 1) if high else [int(low)])
+            except ValueError:
+                print("Could not get that. Use numbers separated by commas.")
+                continue
+            invalid = [i for i in indices if i < 0 or i >= len(csv_files)]
+            if invalid:
+                print(f"Invalid indices: {invalid}. Try again.")
+                continue
+            # Remove duplicates, keep order
+            chosen = [csv_files[i] for i in dict.fromkeys(indices)]
+            if len(chosen) < min_files:
+                print(f"Choose at least {min_files} files to {purpose}.")
+                continue
+            return [os.path.join(folder_path, f) for f in chosen]
+
+        try:
+            idx = int(choice)
+            if 0 <= idx < len(csv_files):
+                chosen_file = csv_files[idx]
+                break
+            else:
+                print(f"Enter a number between 0 and {len(csv_files) - 1}.")
+        except ValueError:
+            print("That is not a valid number. Try again.")
+
+    full_path = os.path.join(folder_path, chosen_file)
+    return full_path
+
+
+def choose_axes(df: pd.DataFrame):
+    """
+    Prompt user to select X column (single) and Y column(s) (comma-separated, multiple allowed).
+    Returns tuple: (x_col_name, [y_col_names]).
+    """
+    print("\n\nColumns Found:")
+    for i, col in enumerate(df.columns):
+        print(f"{i}: {col}")
+
+    print("=" * 30)
+    # User selects X axis column
+    while True:
+        x_choice = input("Enter the column number for the X axis: ").strip()
+        try:
+            x_idx = int(x_choice)
+            if 0 <= x_idx < len(df.columns):
+                x_col = df.columns[x_idx]
+                break
+            else:
+                print(f"Enter a number between 0 and {len(df.columns) - 1}.")
+        except ValueError:
+            print("That is not a valid number. Try again.")
+
+    # User selects Y axis column(s); comma-separated list for multiple columns
+    while True:
+        y_choice = input("Enter column number(s) for Y axis data: ").strip()
+        try:
+            indices = [int(x.strip()) for x in y_choice.split(",")]
+            if not indices:
+                print("You must choose at least one Y column.")
+                continue
+
+            invalid = [i for i in indices if i < 0 or i >= len(df.columns)]
+            if invalid:
+                print(f"Invalid indices: {invalid}. Try again.")
+                continue
+
+            # Remove duplicates, keep order
+            y_indices = []
+            for i in indices:
+                if i not in y_indices:
+                    y_indices.append(i)
+
+
+            y_cols = [df.columns[i] for i in y_indices]
+            break
+        except ValueError:
+            print("Could not get that. Use numbers separated by commas.") # Try again if miss clicked
+
+    return x_col, y_cols
+
+
+# Delay / phase between channels (FFT cross-correlation)
+
+def _parabolic_peak(y_left, y_mid, y_right):
+    """Sub-sample offset (-0.5 .. 0.5) of a peak from its two neighbours (works on arrays)."""
+    import numpy as np
+
+    denom = y_left - 2 * y_mid + y_right
+    with np.errstate(divide="ignore", invalid="ignore"):
+        offset = np.where(denom != 0, 0.5 * (y_left - y_right) / denom, 0.0)
+    return np.clip(offset, -0.5, 0.5)
+
+
+def xcorr_delays(ref, sig, max_lag: int = None):
+    """
+    Cross-correlate rows of `sig` against rows of `ref` (both windows x samples, same shape)
+    with one batched rfft/irfft, O(n log n) per row instead of O(n^2) direct correlation.
+    Returns (lags, coefficients): lag in samples (fractional, parabolic peak refinement;
+    positive = sig lags behind ref) and the normalized correlation at the peak.
+    """
+    import numpy as np
+
+    ref = np.atleast_2d(np.asarray(ref, dtype=float))
+    sig = np.atleast_2d(np.asarray(sig, dtype=float))
+    ref = ref - ref.mean(axis=-1, keepdims=True)
+    sig = sig - sig.mean(axis=-1, keepdims=True)
+    n = ref.shape[-1]
+    nfft = 1 << int(2 * n - 1).bit_length()  # zero padding: circular correlation == linear correlation
+    corr = np.fft.irfft(np.fft.rfft(sig, nfft) * np.conj(np.fft.rfft(ref, nfft)), nfft)
+    max_lag = n - 1 if max_lag is None else min(max_lag, n - 1)
+    # Reorder to lags -max_lag .. +max_lag
+    corr = np.concatenate([corr[:, nfft - max_lag:], corr[:, :max_lag + 1]], axis=-1)
+    peak = np.argmax(corr, axis=-1)
+    rows = np.arange(corr.shape[0])
+    inner = (peak > 0) & (peak < corr.shape[-1] - 1)
+    left = corr[rows, np.maximum(peak - 1, 0)]
+    right = corr[rows, np.minimum(peak + 1, corr.shape[-1] - 1)]
+    offset = np.where(inner, _parabolic_peak(left, corr[rows, peak], right), 0.0)
+    norm = np.sqrt((ref ** 2).sum(axis=-1) * (sig ** 2).sum(axis=-1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coeff = np.where(norm > 0, corr[rows, peak] / norm, np.nan)
+    return peak - max_lag + offset, coeff
+
+
+def dominant_frequency(y, fs: float) -> float:
+    """Frequency (Hz) of the largest non-DC peak of a Hann-windowed FFT."""
+    import numpy as np
+
+    freqs, spec = compute_spectrum(np.asarray(y, dtype=float), fs, method="fft")
+    return float(freqs[int(np.argmax(spec[0, 1:])) + 1]) if len(freqs) > 1 else float("nan")
+
+
+def show_channel_delays(df: pd.DataFrame):
+    """
+    Prompt for a time column, a reference column and other column(s); print delay, correlation
+    and phase shift of each against the reference. Optionally compute the delay per window
+    over the capture and plot delay versus time.
+    """
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    print("\nDELAY / PHASE (cross-correlation)")
+    print("Available columns:")
+    for i, col in enumerate(df.columns):
+        print(f"{i}: {col}")
+    try:
+        t_col = df.columns[int(input("\nEnter the column number of the time axis (seconds): ").strip())]
+        ref_col = df.columns[int(input("Enter the reference column number (e.g. input CH1): ").strip())]
+        others = [df.columns[int(x.strip())] for x in input("Enter column number(s) to compare: ").split(",")]
+    except (ValueError, IndexError):
+        print("Invalid column number(s). Delay computation cancelled.")
+        return
+    others = [c for c in others if c != ref_col]
+    if not others:
+        print("Nothing to compare against the reference.")
+        return
+
+    t = numeric_column(df, t_col).to_numpy()
+    try:
+        fs = infer_sample_rate(t)
+    except ValueError as e:
+        print(e)
+        return
+    ref = _fill_gaps(numeric_column(df, ref_col).to_numpy())
+    f0 = dominant_frequency(ref, fs)
+    print(f"\nSample rate: {fs:.6g} Hz, dominant frequency of {ref_col}: {f0:.6g} Hz")
+
+    sigs = {col: _fill_gaps(numeric_column(df, col).to_numpy()) for col in others}
+    for col, sig in sigs.items():
+        lag, coeff = xcorr_delays(ref, sig)
+        delay = lag[0] / fs
+        phase = (-360.0 * f0 * delay + 180.0) % 360.0 - 180.0
+        print(f"\n{col} vs {ref_col}:")
+        print(f"  Delay:       {delay:.6g} s ({lag[0]:.3f} samples, positive = lags {ref_col})")
+        print(f"  Correlation: {coeff[0]:.4g}")
+        print(f"  Phase shift: {phase:.4g} deg at {f0:.6g} Hz")
+
+    win_str = input("\nWindow length in samples for a delay-versus-time trace (blank to skip): ").strip()
+    if not win_str:
+        return
+    try:
+        win = int(win_str)
+        if win < 8 or win > len(ref):
+            raise ValueError
+    except ValueError:
+        print(f"Window must be an integer between 8 and {len(ref)}.")
+        return
+    hop = max(win // 2, 1)
+    starts = np.arange(0, len(ref) - win + 1, hop)
+    centers = t[starts + win // 2]
+    ref_w = sliding_window_view(ref, win)[::hop]
+
+    plt = load_pyplot()
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for col, sig in sigs.items():
+        lags, _ = xcorr_delays(ref_w, sliding_window_view(sig, win)[::hop], max_lag=win // 2)
+        delays = lags / fs
+        print(f"{col}: {len(delays)} windows, delay min {delays.min():.6g} s, max {delays.max():.6g} s, "
+              f"mean {delays.mean():.6g} s")
+        ax.plot(centers, delays, marker="o", markersize=3, linewidth=1.5, label=f"{col} vs {ref_col}")
+    ax.set_xlabel(t_col, fontsize=12, fontweight='bold')
+    ax.set_ylabel("Delay (s)", fontsize=12, fontweight='bold')
+    title = f"Delay versus time (window {win} samples)"
+    ax.set_title(title, fontsize=14, fontweight='bold', pad=20)
+    ax.grid(True, alpha=0.4, linestyle='--', linewidth=0.7)
+    ax.legend(loc="upper left", fontsize=10, framealpha=0.95, edgecolor='black', fancybox=True, shadow=True)
+    plt.tight_layout()
+    save_and_show(plt, fig, title, "delay")
+
+
+# Waveform measurements (threshold crossings, edges, periods), all vectorized
+
+def _entries(mask):
+    """Indices where mask becomes True (index 0 included if mask starts True)."""
+    import numpy as np
+
+    idx = np.flatnonzero(mask[1:] & ~mask[:-1]) + 1
+    return np.concatenate([[0], idx]) if mask[0] else idx
+
+
+def _last_before(candidates, positions):
+    """For each position, the largest candidate index strictly below it (candidates sorted)."""
+    import numpy as np
+
+    return candidates[np.maximum(np.searchsorted(candidates, positions, side="left") - 1, 0)]
+
+
+def _hysteresis_edges(y, lo: float, hi: float):
+    """
+    Indices of rising edges (first sample >= hi after having been <= lo) and falling edges
+    (first sample <= lo after having been >= hi). Noise between lo and hi never makes an edge.
+    Works on the sparse threshold entries only, so it is a few boolean passes over y.
+    """
+    import numpy as np
+
+    ent_hi = _entries(y >= hi)
+    ent_lo = _entries(y <= lo)
+    idx = np.concatenate([ent_hi, ent_lo])
+    kind = np.concatenate([np.ones(ent_hi.size, np.int8), np.zeros(ent_lo.size, np.int8)])
+    order = np.argsort(idx, kind="stable")
+    idx, kind = idx[order], kind[order]
+    change = np.flatnonzero(kind[1:] != kind[:-1]) + 1  # the first decision has no previous state
+    return idx[change[kind[change] == 1]], idx[change[kind[change] == 0]]
+
+
+def _crossing_x(x, y, i, level):
+    """X where y crosses `level` between samples i and i+1 (linear interpolation; arrays of i)."""
+    import numpy as np
+
+    y0, y1 = y[i], y[i + 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frac = np.where(y1 != y0, (level - y0) / (y1 - y0), 0.0)
+    return x[i] + np.clip(frac, 0, 1) * (x[i + 1] - x[i])
+
+
+def waveform_levels(y):
+    """Base and top levels of a waveform: histogram modes of the lower and upper halves of its range."""
+    import numpy as np
+
+    lo, hi = float(y.min()), float(y.max())
+    if hi <= lo:
+        return lo, hi
+    bins = 256
+    codes = ((y - lo) * (bins / (hi - lo))).astype(np.int32)
+    np.minimum(codes, bins - 1, out=codes)
+    counts = np.bincount(codes, minlength=bins)
+    half = bins // 2
+    base = lo + (np.argmax(counts[:half]) + 0.5) / bins * (hi - lo)
+    top = lo + (half + np.argmax(counts[half:]) + 0.5) / bins * (hi - lo)
+    return base, top
+
+
+def measure_waveform(x, y) -> dict:
+    """
+    Frequency, period, duty cycle, 10-90 % rise/fall time, max dV/dt, overshoot/undershoot and
+    peak-to-peak of one channel. Edges are found with hysteresis on sign-change masks and
+    np.flatnonzero (no Python loop over samples). Times are in X units (seconds for scope captures).
+    Values that can't be measured (e.g. no complete period) are NaN.
+    """
+    import numpy as np
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    ok = ~(np.isnan(x) | np.isnan(y))
+    if not ok.all():
+        x, y = x[ok], y[ok]
+    nan = float("nan")
+    res = {"pk_pk": nan, "frequency": nan, "period": nan, "duty": nan, "rise": nan, "fall": nan,
+           "max_slew": nan, "overshoot": nan, "undershoot": nan, "base": nan, "top": nan,
+           "_rising": np.empty(0)}
+    if y.size < 3:
+        return res
+    res["pk_pk"] = float(y.max() - y.min())
+    dx = np.diff(x)
+    good = dx > 0
+    if good.any():
+        slope = np.diff(y) / dx if good.all() else np.diff(y)[good] / dx[good]
+        res["max_slew"] = float(max(slope.max(), -slope.min()))
+
+    base, top = waveform_levels(y)
+    amp = top - base
+    res["base"], res["top"] = base, top
+    if amp <= 0:
+        return res
+    res["overshoot"] = float((y.max() - top) / amp * 100)
+    res["undershoot"] = float((base - y.min()) / amp * 100)
+    l10, l50, l90 = base + 0.1 * amp, base + 0.5 * amp, base + 0.9 * amp
+
+    # Mid-level crossings (hysteresis 40/60 %) -> period, frequency, duty cycle
+    rise_i, fall_i = _hysteresis_edges(y, base + 0.4 * amp, base + 0.6 * amp)
+    above50 = y >= l50
+    up50 = np.flatnonzero(~above50[:-1] & above50[1:])    # y[k] < 50 % <= y[k+1]
+    down50 = np.flatnonzero(above50[:-1] & ~above50[1:])  # y[k] >= 50 % > y[k+1]
+    rising = _crossing_x(x, y, _last_before(up50, rise_i), l50) if rise_i.size else np.empty(0)
+    falling = _crossing_x(x, y, _last_before(down50, fall_i), l50) if fall_i.size else np.empty(0)
+    res["_rising"] = rising
+    if rising.size >= 2:
+        period = float(np.median(np.diff(rising)))
+        res["period"], res["frequency"] = period, 1.0 / period if period > 0 else nan
+        nxt = np.searchsorted(falling, rising[:-1], side="right")
+        valid = nxt < falling.size
+        if valid.any():
+            high = falling[nxt[valid]] - rising[:-1][valid]
+            span = np.diff(rising)[valid]
+            keep = high < span
+            if keep.any():
+                res["duty"] = float(np.mean(high[keep] / span[keep]) * 100)
+
+    # 10-90 % transitions -> rise/fall time
+    up_i, down_i = _hysteresis_edges(y, l10, l90)
+    if up_i.size:
+        low = y <= l10
+        start = _last_before(np.flatnonzero(low[:-1] & ~low[1:]), up_i)  # last sample <= 10 %
+        t10 = _crossing_x(x, y, start, l10)
+        t90 = _crossing_x(x, y, up_i - 1, l90)
+        res["rise"] = float(np.median(t90 - t10))
+    if down_i.size:
+        high = y >= l90
+        start = _last_before(np.flatnonzero(high[:-1] & ~high[1:]), down_i)  # last sample >= 90 %
+        t90 = _crossing_x(x, y, start, l90)
+        t10 = _crossing_x(x, y, down_i - 1, l10)
+        res["fall"] = float(np.median(t10 - t90))
+    return res
+
+
+def format_measurements(m: dict) -> list:
+    """Measurement dict -> printable lines."""
+    return [
+        f"Frequency:   {m['frequency']:.6g} Hz (period {m['period']:.6g} s)",
+        f"Duty cycle:  {m['duty']:.4g} %",
+        f"Rise 10-90%: {m['rise']:.6g} s",
+        f"Fall 90-10%: {m['fall']:.6g} s",
+        f"Max dV/dt:   {m['max_slew']:.6g} /s",
+        f"Overshoot:   {m['overshoot']:.4g} % (undershoot {m['undershoot']:.4g} %)",
+        f"Peak-peak:   {m['pk_pk']:.6g}",
+    ]
+
+
+def show_waveform_measurements(df: pd.DataFrame):
+    """Prompt for a time column and channel(s), then print the waveform measurements of each channel."""
+    print("\nWAVEFORM MEASUREMENTS")
+    print("Available columns:")
+    for i, col in enumerate(df.columns):
+        print(f"{i}: {col}")
+    try:
+        t_col = df.columns[int(input("\nEnter the column number of the time axis (seconds): ").strip())]
+        chans = [df.columns[int(x.strip())] for x in input("Enter channel column number(s): ").split(",")]
+    except (ValueError, IndexError):
+        print("Invalid column number(s). Measurements cancelled.")
+        return
+    t = numeric_column(df, t_col).to_numpy()
+    for col in chans:
+        if col == t_col:
+            continue
+        m = measure_waveform(t, numeric_column(df, col).to_numpy())
+        print(f"\n{col}:" + "\n" + "-" * 30)
+        for line in format_measurements(m):
+            print("  " + line)
+        print("-" * 30)
+
+
+def annotate_waveform(ax, x, y, color, idx: int):
+    """Mark rising mid-level crossings and add a measurement box for one plotted series."""
+    import numpy as np
+
+    m = measure_waveform(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    rising = m["_rising"]
+    if rising.size:
+        ax.plot(rising, np.full(rising.size, (m["base"] + m["top"]) / 2), linestyle="none", marker="|",
+                markersize=14, markeredgewidth=2, color=color)
+    txt = "\n".join(line.split(" (")[0] for line in format_measurements(m))
+    ax.text(0.98, 0.95 - idx * 0.3, txt, transform=ax.transAxes, ha="right", va="top",
+            color=color, fontsize=8, family="monospace",
+            bbox=dict(facecolor='white', alpha=0.8, edgecolor=color, linewidth=1.2))
+
+
+def ask_stats_choice() -> str:
+    """
+    Show the statistics menu and return the user's raw choice ("" = skip).
+    Needs no data, so it can be answered while the file is still loading.
+    """
+    print("\n" + "=" * 20)
+    print("SUMMARY STATISTICS")
+    print("1: Minimum")
+    print("2: Maximum")
+    print("3: Mean")
+    print("4: Median")
+    print("5: Standard deviation")
+    print("6: All statistics")
+    print("7: Compute slope(s) for chosen X and Y columns")
+    print("8: Delay / phase between columns (cross-correlation)")
+    print("9: Waveform measurements (frequency, duty, rise/fall, slew rate, overshoot)")
+    print("\nEnter choice(s), comma-separated.")
+    print("Or press Enter to skip statistics")
+    print("=" * 20)
+    return input("Enter your choice: ").strip()
+
+
+def show_summary_stats(df: pd.DataFrame, numeric_cols: list, choice: str = None):
+    """
+    Display summary statistics (min, max, mean, median, std) for all columns.
+    User chooses which statistics to display via comma-separated selection (e.g., 1,3,5).
+    Optionally compute linear slope(s) (y = m*x + b) between a chosen X column and one or more Y columns.
+    `choice` is an answer already given to ask_stats_choice(); if None, the menu is shown here.
+    """
+    import pandas as pd
+    import numpy as np
+
+    if choice is None:
+        choice = ask_stats_choice()
+    if choice == "":
+        return
+
+    stats_list = ["min", "max", "mean", "median", "std"]
+    selected = []
+    slope_requested = False
+    delay_requested = False
+    waveform_requested = False
+
+    # Parse comma-separated numbers
+    try:
+        indices = [int(x.strip()) for x in choice.split(",")]
+    except ValueError:
+        print("Invalid input. Could not parse numbers.")
+        return
+
+    if 6 in indices:
+        selected = stats_list.copy()
+
+    for idx in indices:
+        if idx == 6:
+            continue
+        if idx == 7:
+            slope_requested = True
+            continue
+        if idx == 8:
+            delay_requested = True
+            continue
+        if idx == 9:
+            waveform_requested = True
+            continue
+        if 1 <= idx <= 5:
+            stat_name = stats_list[idx - 1]
+            if stat_name not in selected:
+                selected.append(stat_name)
+        else:
+            print(f"Warning: {idx} is not a valid choice (1-9). Skipping.")
+
+    if not selected and not slope_requested and not delay_requested and not waveform_requested:
+        print("No valid statistics selected.")
+        return
+
+    # Calculate requested statistics (min/max/mean/median/std) for each numeric column
+    stats_results = {}
+    for col in numeric_cols:
+        try:
+            summary = quantized_summary(df, col)  # quantized columns: straight from the code histogram
+            if summary is not None:
+                if summary["count"] == 0:
+                    print(f"\n{col}: (no numeric data)")
+                    continue
+                col_stats = {k: summary[k] for k in stats_list if k in selected}
+            else:
+                # Convert to numeric using smart parsing (handles percentages, currency, etc.)
+                data = numeric_column(df, col).dropna()
+                if len(data) == 0:
+                    print(f"\n{col}: (no numeric data)")
+                    continue
+                col_stats = {}
+                if "min" in selected:
+                    col_stats['min'] = data.min()
+                if "max" in selected:
+                    col_stats['max'] = data.max()
+                if "mean" in selected:
+                    col_stats['mean'] = data.mean()
+                if "median" in selected:
+                    col_stats['median'] = data.median()
+                if "std" in selected:
+                    col_stats['std'] = data.std()
+
+            # Print to console as before
+            print(f"\n{col}:" + "\n" + "-" * 30)
+            for k, v in col_stats.items():
+                label = k.capitalize()
+                print(f"  {label}: {v:.6g}")
+            print("-"*30)
+            stats_results[col] = col_stats
+        except Exception as e:
+            print(f"\n{col}: Could not compute statistics ({e})")
+
+    # If slope computation requested, prompt for X and Y columns and compute
+    if slope_requested:
+        print("\nSLOPE COMPUTATION")
+        print("Available columns:")
+        for i, col in enumerate(df.columns):
+            print(f"{i}: {col}")
+
+        # Choose X axis
+        while True:
+            x_choice = input("\nEnter the column number to use as X for slope calculation ('c' to cancel): ").strip()
+            if x_choice.lower() in ["c", "cancel"]:
+                print("Slope computation cancelled.")
+                return
+            try:
+                x_idx = int(x_choice)
+                if 0 <= x_idx < len(df.columns):
+                    x_col = df.columns[x_idx]
+                    break
+                else:
+                    print(f"Enter a number between 0 and {len(df.columns) - 1}.")
+            except ValueError:
+                print("That is not a valid number. 'c' to cancel.")
+
+        # Choose Y axes
+        while True:
+            y_choice = input("Enter column number(s) for Y. 'c' to cancel: ").strip()
+            if y_choice.lower() in ["c", "cancel"]:
+                print("Slope computation cancelled.")
+                return
+            try:
+                y_indices = [int(x.strip()) for x in y_choice.split(",")]
+                # Validate indices
+                invalid = [i for i in y_indices if i < 0 or i >= len(df.columns)]
+                if invalid:
+                    print(f"Invalid indices: {invalid}. Try again.")
+                    continue
+                # Remove X if present in Y list
+                y_indices = [i for i in y_indices if i != x_idx]
+                if not y_indices:
+                    print("Y columns cannot be the same as X. Choose different column(s).")
+                    continue
+                y_cols = [df.columns[i] for i in y_indices]
+                break
+            except ValueError:
+                print("Could not parse that. Use numbers separated by commas.")
+
+        # Compute linear slope (m) and intercept (b) for fitted line y = m*x + b, plus R² quality
+        for ycol in y_cols:
+            try:
+                # Align X and Y: drop rows where either column has NaN or non-numeric value
+                x_vals = numeric_column(df, x_col)
+                y_vals = numeric_column(df, ycol)
+                valid = pd.concat([x_vals, y_vals], axis=1).dropna()
+                if valid.empty:
+                    print(f"\n{ycol}: (no numeric data after alignment with X)")
+                    continue
+                x = valid[x_col].values
+                y = valid[ycol].values
+                # Fit linear polynomial: np.polyfit returns [slope, intercept] for degree=1
+                slope, intercept = np.polyfit(x, y, 1)
+                # Compute R² (coefficient of determination): 0=poor fit, 1=perfect fit
+                y_pred = slope * x + intercept  # Predicted y values from fitted line
+                ss_res = ((y - y_pred) ** 2).sum()  # Sum of squared residuals (prediction errors)
+                ss_tot = ((y - y.mean()) ** 2).sum()  # Total sum of squares (data variance)
+                r2 = 1.0 - ss_res / ss_tot if ss_tot != 0 else float('nan')  # R² = 1 - (residual/total)
+                print(f"\n{ycol} vs {x_col}:")
+                print(f"  Slope:     {slope:.6g}")
+                print(f"  Intercept: {intercept:.6g}")
+                if not (r2 != r2):  # check for NaN
+                    print(f"  R^2:       {r2:.6g}")
+            except Exception as e:
+                print(f"\n{ycol}: Could not compute slope ({e})")
+
+    # Delay / phase between channels via FFT cross-correlation
+    if delay_requested:
+        try:
+            show_channel_delays(df)
+        except Exception as e:
+            print(f"\nCould not compute delay ({e})")
+
+    # Frequency, duty cycle, rise/fall, slew rate, overshoot per channel
+    if waveform_requested:
+        try:
+            show_waveform_measurements(df)
+        except Exception as e:
+            print(f"\nCould not measure waveforms ({e})")
+
+    # Return selected stat keys and numeric results so the caller can annotate plots
+    return selected, stats_results
+
+
+def pick_row_range(df: pd.DataFrame, spec: dict = None) -> pd.DataFrame:
+    """
+    Selecting range to use for analysis/plotting.
+    The chosen range is recorded in `spec` (plot specification for the render cache) if given.
+    """
+    total = len(df)
+    if total == 0:
+        print("No rows available in the dataset.")
+        return df
+    print("=" * 50)
+    print(f"Rows available: 1 - {total}")
+    choice = input("Would you like to graph a part of rows? (Y/N): ").strip().upper()
+    if choice != "Y":
+        return df
+
+    while True:
+        start_str = input("Enter start row number: ").strip() # row start
+        end_str = input("Enter end row number: ").strip() # row end
+        try:
+            start = int(start_str)
+            end = int(end_str)
+        except ValueError:
+            print("Invalid input. Enter integer row numbers.") # if not integer
+            continue
+
+        if start < 1 or end < 1 or start > end or end > total: # checks if range is valid
+            print(f"Invalid range. Please enter values between 1 and {total}, and start <= end.")
+            continue
+
+        # Slice using iloc (end is inclusive for users, iloc end is exclusive)
+        sliced = df.iloc[start - 1:end].reset_index(drop=True) # reset_index to renumber rows
+        print(f"Selected rows: {start} to {end} ({len(sliced)} rows)")
+        if spec is not None:
+            spec["rows"] = [start, end]
+        return sliced
+
+
+def filter_data(df: pd.DataFrame, x_col: str, y_cols: list, spec: dict = None) -> pd.DataFrame:
+    """
+    Filter data rows by a user-specified condition (e.g., column > value).
+    Returns filtered DataFrame; if no filter chosen, returns full DataFrame unchanged.
+    The applied condition is recorded in `spec` if given.
+    """
+    print("=" * 50)
+    filter_choice = input("Filter Points of Interest? (Y/N): ").strip().upper()
+    if filter_choice != "Y":
+        return df
+    
+    all_cols = [x_col] + y_cols
+    print("\nAvailable columns:")
+    for i, col in enumerate(all_cols):
+        print(f"{i}: {col}")
+    
+    col_idx = input("\nEnter column number to filter on: ").strip()
+    try:
+        col_idx = int(col_idx)
+        if col_idx < 0 or col_idx >= len(all_cols):
+            print("Invalid column index.")
+            return df
+        filter_col = all_cols[col_idx]
+    except ValueError:
+        print("Invalid input.")
+        return df
+    print("\n" + "=" * 30)
+    print("\nFilter operators:")
+    print("1: > (greater than)")
+    print("2: < (less than)")
+    print("3: >= (greater or equal)")
+    print("4: <= (less or equal)")
+    print("5: == (equal to)")
+    print("6: != (not equal to)")
+    print("7: Between (Value range)")
+    print("\n" + "=" * 30)
+    
+    op_choice = input("Enter operator (1-7): ").strip()
+    op_map = {"1": ">", "2": "<", "3": ">=", "4": "<=", "5": "==", "6": "!=", "7": "between"}
+    op = op_map.get(op_choice)
+    if not op:
+        print("Invalid operator.")
+        return df
+    
+    # Prepare numeric column for comparison; timestamp columns are compared as datetime64,
+    # with bounds typed as dates (e.g. 2024-05-01 12:30:00)
+    if is_datetime(df[filter_col]):
+        col_data = df[filter_col]
+        fmt = df.attrs.get("datetime_formats", {}).get(filter_col)
+
+        def read_bound(text):
+            return parse_timestamp(text, fmt)
+    else:
+        col_data = numeric_column(df, filter_col)
+        read_bound = float
+
+    # Handle 'between' operator specially (two inputs)
+    if op == "between":
+        print("\nBetween operator: include bounds or exclude?")
+        print("1: Exclusive (> low AND < high)")
+        print("2: Inclusive (>= low AND <= high)")
+        inclusive_choice = input("Enter choice (1-2): ").strip() or "1"
+        inclusive = (inclusive_choice == "2")
+        
+        low_str = input(f"Enter lower bound for {filter_col}: ").strip()
+        high_str = input(f"Enter upper bound for {filter_col}: ").strip()
+        try:
+            low = read_bound(low_str)
+            high = read_bound(high_str)
+        except ValueError:
+            print("Invalid bound values.")
+            return df
+        
+        if inclusive:
+            mask = (col_data >= low) & (col_data <= high)
+            bound_desc = f"between {low} and {high} (inclusive)"
+        else:
+            mask = (col_data > low) & (col_data < high)
+            bound_desc = f"between {low} and {high} (exclusive)"
+    else:
+        value_str = input(f"Enter value to compare {filter_col} {op} : ").strip()
+        try:
+            value = read_bound(value_str)
+        except ValueError:
+            print("Invalid value.")
+            return df
+        # Apply the chosen comparison operator to create a boolean mask (True = rows to keep)
+        if op == ">":
+            mask = col_data > value
+        elif op == "<":
+            mask = col_data < value
+        elif op == ">=":
+            mask = col_data >= value
+        elif op == "<=":
+            mask = col_data <= value
+        elif op == "==":
+            mask = col_data == value
+        elif op == "!=":
+            mask = col_data != value
+    
+    # Filter DataFrame using mask; reset_index renumbers rows starting at 0
+    filtered_df = df[mask].reset_index(drop=True)
+    # Print an informative message depending on operator used
+    if op == "between":
+        print(f"\nFiltered: {len(filtered_df)} of {len(df)} rows match {filter_col} {bound_desc}")
+    else:
+        print(f"\nFiltered: {len(filtered_df)} of {len(df)} rows match {filter_col} {op} {value}")
+    if spec is not None:
+        spec["filter"] = [filter_col, op] + ([low, high, inclusive] if op == "between" else [value])
+    return filtered_df
+
+
+CONDITION_CHUNK = 1 << 20  # samples per block when conditioning columns (bounds temporary memory)
+CONDITIONS = {"1": "mean", "2": "rms", "3": "min", "4": "max", "5": "lowpass"}
+
+
+class RollingFilter:
+    """
+    Trailing moving mean / RMS / min / max over `window` samples, or a one-pole IIR low-pass with
+    smoothing factor `alpha`, fed chunk by chunk with process(). All work is done per fixed
+    block aligned to the absolute sample index, so any chunking gives bit-identical output:
+    - windows: prefix/suffix sums (or fmax/fmin accumulations) inside blocks of `window` samples
+      (van Herk / Gil-Werman), O(n) and independent of the window length
+    - low-pass: closed-form recursion over blocks of up to 4096 samples
+    Windows at the start use the samples available so far; NaNs are skipped (the low-pass holds
+    the last valid input).
+    """
+
+    def __init__(self, kind: str, window: int = 1, alpha: float = 1.0):
+        import numpy as np
+
+        self.kind = kind
+        self.window = max(int(window), 1)
+        self.alpha = alpha
+        if kind == "lowpass":
+            decay = 1.0 - alpha
+            # Block length keeps decay**-k below ~1e12 (no overflow, negligible rounding)
+            self.block = max(1, min(4096, int(27.0 / -np.log(decay)))) if 0 < decay < 1 else 4096
+            self.pending = np.empty(0)   # inputs of the current, incomplete block
+            self.y_start = np.nan        # output just before the current block
+            self.last_valid = np.nan
+        else:
+            # Stream is preceded by window-1 NaNs, so early windows are partial windows
+            self.buf = np.full(self.window - 1, np.nan)
+            self.buf_start = 0           # absolute index of buf[0] in the padded stream (block aligned)
+            self.next_start = 0          # absolute start of the next output window
+
+    def process(self, chunk):
+        import numpy as np
+
+        chunk = np.asarray(chunk, dtype=float)
+        if chunk.size == 0:
+            return chunk.copy()
+        return self._lowpass(chunk) if self.kind == "lowpass" else self._windowed(chunk)
+
+    def _windowed(self, chunk):
+        import numpy as np
+
+        w = self.window
+        buf = np.concatenate([self.buf, chunk])
+        blocks = -(-len(buf) // w)
+        padded = np.full(blocks * w, np.nan)
+        padded[:len(buf)] = buf
+        padded = padded.reshape(blocks, w)
+
+        starts = np.arange(self.next_start, self.next_start + len(chunk)) - self.buf_start
+        ends = starts + w - 1
+        if self.kind in ("min", "max"):
+            acc = np.fmax if self.kind == "max" else np.fmin
+            prefix = acc.accumulate(padded, axis=1).ravel()
+            suffix = acc.accumulate(padded[:, ::-1], axis=1)[:, ::-1].ravel()
+            out = acc(suffix[starts], prefix[ends])  # stays NaN only if the whole window is NaN
+        else:
+            valid = ~np.isnan(padded)
+            vals = np.where(valid, padded, 0.0)
+            if self.kind == "rms":
+                vals = vals * vals
+            sums, counts = vals.cumsum(axis=1), valid.cumsum(axis=1)
+            rsums, rcounts = vals[:, ::-1].cumsum(axis=1)[:, ::-1].ravel(), valid[:, ::-1].cumsum(axis=1)[:, ::-1].ravel()
+            sums, counts = sums.ravel(), counts.ravel()
+            # A window that starts on a block boundary is exactly that block's suffix
+            split = starts % w != 0
+            total = rsums[starts] + np.where(split, sums[ends], 0.0)
+            n = rcounts[starts] + np.where(split, counts[ends], 0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out = np.where(n > 0, total / n, np.nan)
+            if self.kind == "rms":
+                out = np.sqrt(out)
+
+        self.next_start += len(chunk)
+        keep_from = (self.next_start // w) * w
+        self.buf = buf[keep_from - self.buf_start:]
+        self.buf_start = keep_from
+        return out
+
+    def _lowpass(self, chunk):
+        import numpy as np
+
+        # Hold the last valid input over NaNs
+        idx = np.where(np.isnan(chunk), -1, np.arange(len(chunk)))
+        idx = np.maximum.accumulate(idx)
+        filled = np.where(idx >= 0, chunk[np.maximum(idx, 0)], self.last_valid)
+        if not np.isnan(filled[-1]):
+            self.last_valid = filled[-1]
+
+        # The pending partial block is recomputed from its start together with the new samples
+        data = np.concatenate([self.pending, filled])
+        out = np.empty(len(data))
+        a, decay, L = self.alpha, 1.0 - self.alpha, self.block
+        k = np.arange(L)
+        grow = decay ** -k if decay > 0 else None
+        y_prev = self.y_start
+        pos = 0
+        while pos < len(data):
+            x = data[pos:pos + L]
+            if np.isnan(y_prev):
+                first = np.flatnonzero(~np.isnan(x))
+                if first.size == 0:
+                    out[pos:pos + len(x)] = np.nan
+                    if len(x) == L:
+                        pos += L
+                        continue
+                    break
+                # Filter starts at the first valid sample instead of ramping up from zero
+                start = first[0]
+                y_prev = x[start]
+            else:
+                start = 0
+            n = len(x)
+            if decay > 0:
+                # NaN before the first valid sample; the recursion restarts there (k from 0)
+                m = n - start
+                y = np.full(n, np.nan)
+                y[start:] = decay ** (k[:m] + 1) * y_prev + a * decay ** k[:m] * np.cumsum(x[start:] * grow[:m])
+            else:
+                y = x.copy()
+            out[pos:pos + n] = y
+            if n == L:
+                y_prev = y[-1]
+                pos += L
+            else:
+                break
+        full = (len(data) // L) * L
+        if full:
+            self.y_start = out[full - 1] if not np.isnan(out[full - 1]) else y_prev
+        self.pending = data[full:]
+        return out[len(data) - len(chunk):]
+
+
+def condition_series(values, kind: str, window: int = 1, alpha: float = 1.0):
+    """Run a whole column through a RollingFilter in CONDITION_CHUNK blocks. Returns a float array."""
+    import numpy as np
+
+    values = np.asarray(values, dtype=float)
+    filt = RollingFilter(kind, window, alpha)
+    if len(values) == 0:
+        return values.copy()
+    return np.concatenate([filt.process(values[i:i + CONDITION_CHUNK])
+                           for i in range(0, len(values), CONDITION_CHUNK)])
+
+
+def condition_signals(df: pd.DataFrame, x_col: str, y_cols: list, spec: dict = None):
+    """
+    Optional conditioning stage: moving average, rolling RMS, rolling min/max or IIR low-pass
+    of the Y columns. Derived series are added as new columns (e.g. "CH1(V) mean[50]").
+    Returns (df, y_cols) with the derived columns appended; the input df is not modified.
+    """
+    print("=" * 50)
+    choice = input("Condition signals (moving average / RMS / min / max / low-pass)? (Y/N): ").strip().upper()
+    if choice != "Y":
+        return df, y_cols
+
+    print("\nConditioning:")
+    print("1: Moving average")
+    print("2: Rolling RMS")
+    print("3: Rolling minimum")
+    print("4: Rolling maximum")
+    print("5: IIR low-pass (first order)")
+    ops = [CONDITIONS[c.strip()] for c in input("Enter operation(s) (1-5, comma-separated): ").split(",")
+           if c.strip() in CONDITIONS]
+    if not ops:
+        print("No valid operation selected.")
+        return df, y_cols
+
+    print("\nColumns:")
+    for i, col in enumerate(y_cols):
+        print(f"{i}: {col}")
+    picked = input("Enter column number(s) to condition (blank for all): ").strip()
+    try:
+        cols = [y_cols[int(i)] for i in picked.split(",")] if picked else list(y_cols)
+    except (ValueError, IndexError):
+        print("Invalid column selection.")
+        return df, y_cols
+
+    window = 1
+    if any(op != "lowpass" for op in ops):
+        try:
+            window = int(input("Window length in samples: ").strip())
+            if window < 1:
+                raise ValueError
+        except ValueError:
+            print("Invalid window length.")
+            return df, y_cols
+
+    alpha, lp_name = 1.0, ""
+    if "lowpass" in ops:
+        import numpy as np
+
+        cutoff = input("Low-pass cutoff frequency in Hz (blank to give a time constant in samples): ").strip()
+        try:
+            if cutoff:
+                fs = infer_sample_rate(numeric_column(df, x_col).to_numpy())
+                alpha = 1.0 - np.exp(-2.0 * np.pi * float(cutoff) / fs)
+                lp_name = f"LP {float(cutoff):g}Hz"
+            else:
+                tau = float(input("Time constant in samples: ").strip())
+                alpha = 1.0 - np.exp(-1.0 / tau)
+                lp_name = f"LP tau={tau:g}"
+        except ValueError as e:
+            print(f"Invalid low-pass setting: {e}")
+            return df, y_cols
+
+    derived = {}
+    for col in cols:
+        values = numeric_column(df, col).to_numpy()
+        for op in ops:
+            name = f"{col} {lp_name}" if op == "lowpass" else f"{col} {op}[{window}]"
+            derived[name] = condition_series(values, op, window, alpha)
+    print(f"Added {len(derived)} conditioned series: {', '.join(derived)}")
+    if spec is not None:
+        spec["condition"] = [ops, cols, window, alpha]
+    return df.assign(**derived), list(y_cols) + [c for c in derived if c not in y_cols]
+
+
+def sample_data_points(df: pd.DataFrame, spec: dict = None) -> pd.DataFrame:
+    """
+    Sample data by plotting every Nth point (useful for large datasets).
+    Returns sampled DataFrame or full DataFrame if sampling skipped.
+    The step is recorded in `spec` if given.
+    """
+    total = len(df)
+    if total == 0:
+        return df
+    
+    print("\n" + "=" * 50)
+    print("DATA POINT SAMPLING (for large datasets)")
+    print("=" * 50)
+    print(f"Total data points: {total}")
+    
+    # Only prompt if dataset is reasonably large
+    if total < 100:
+        print("Dataset is small enough to plot all points.")
+        return df
+    
+    choice = input("\nPlot every Nth point to reduce density? (Y/N): ").strip().upper()
+    if choice != "Y":
+        return df
+    
+    while True:
+        step_str = input(f"Enter step size: ").strip()
+        try:
+            step = int(step_str)
+            if step < 1:
+                print("Step must be at least 1.")
+                continue
+            if step >= total:
+                print(f"Step too large. Must be less than {total}.")
+                continue
+            break
+        except ValueError:
+            print("Invalid input. Enter an integer.")
+    
+    # Sample every Nth row using iloc with step
+    sampled = df.iloc[::step].reset_index(drop=True)
+    print(f"Sampled {len(sampled)} points (every {step} point(s)) from {total} total.")
+    if spec is not None:
+        spec["step"] = step
+    return sampled
+
+
+# Figure of the last line/scatter plot, kept so a re-run can update it in place:
+# {"fig", "x_col", "y_cols", "plot_type", "settings", "artists": {y_col: (artist, ax)},
+#  "axes": [(ax, has_fixed_y_range)]}
+_LIVE_PLOT = None
+
+
+def plot_x_values(df: pd.DataFrame, x_col: str) -> pd.Series:
+    """X values as plotted: matplotlib date numbers for timestamp columns, otherwise numeric_column."""
+    import pandas as pd
+
+    if is_datetime(df[x_col]):
+        import matplotlib.dates as mdates
+        return pd.Series(mdates.date2num(df[x_col].to_numpy()), index=df.index)
+    return numeric_column(df, x_col)
+
+
+def plot_data(df: pd.DataFrame, x_col: str, y_cols: list, source: str = None, spec: dict = None):
+    """
+    Plot selected X and Y columns with multiple plot types (line/scatter/bar/histogram/spectrum).
+    Supports trend lines (linear/polynomial), dual Y-axis, and plot saving (PNG/PDF).
+    `source` is the CSV path when df is the whole, unmodified file (lets spectra be cached).
+    `spec` describes how df was made (file identity, range, filter, sampling); with it, saved
+    images go through the render cache and an identical request is not rendered again.
+    """
+    import pandas as pd
+    import numpy as np
+
+    print("=" * 30 + "\n" + f"Plotting X: {x_col}")
+    print(f"Plotting Y columns: {', '.join(y_cols)}" + "\n" + "=" * 30)
+
+    # User chooses plot visualization type
+    print("Plot types:")
+    print("1: Line plot")
+    print("2: Scatter plot")
+    print("3: Bar chart")
+    print("4: Histogram")
+    print("5: Spectrum (FFT / Welch PSD, X = time in seconds)")
+    
+    plot_choice = input("\nEnter plot type (1-5): ").strip() or "1"
+    plot_type = {"1": "line", "2": "scatter", "3": "bar", "4": "histogram", "5": "spectrum"}.get(plot_choice, "line")
+    if plot_type == "spectrum":
+        plot_spectrum(df, x_col, y_cols, source)
+        return
+
+    # Ask about axis scaling (logarithmic, semi-log, etc.)
+    print("\nAxis scaling:")
+    print("1: Linear (default)")
+    print("2: Log-log (both axes logarithmic)")
+    print("3: Semi-log X (X logarithmic, Y linear)")
+    print("4: Semi-log Y (X linear, Y logarithmic)")
+    scale_choice = input("Enter scale type (1-4): ").strip() or "1"
+    scale_type = {"1": "linear", "2": "loglog", "3": "semilogx", "4": "semilogy"}.get(scale_choice, "linear")
 
     # Ask about trend line (for line/scatter only)
     # Trend line choice: 0=None, 1=Linear, 2=Polynomial (keeps logic consistent below)
     trend_choice = None
     if plot_type in ["line", "scatter"]:
         trend_choice = input("Add trend line? (0=None, 1=Linear, 2=Polynomial): ").strip() or "0"
+
+    # Ask about waveform measurement annotations (line/scatter with time on X)
+    annotate_measurements = False
+    if plot_type in ["line", "scatter"]:
+        annotate_measurements = input("Annotate waveform measurements? (Y/N): ").strip().upper() == "Y"
     
     # Ask about dual Y-axis (for line/scatter plots with multiple series)
     dual_axis = False
@@ -650,318 +2246,1847 @@ def plot_data(df: pd.DataFrame, x_col: str, y_cols: list):
                 y_min_str = input(f"  Min value (blank for auto): ").strip()
                 y_max_str = input(f"  Max value (blank for auto): ").strip()
                 
-                y_min = None
-                y_max = None
-                try:
-                    if y_min_str:
-                        y_min = float(y_min_str)
-                    if y_max_str:
-                        y_max = float(y_max_str)
-                except ValueError:
-                    print(f"  Warning: Invalid range values, using auto-fit")
+                y_min = None
+                y_max = None
+                try:
+                    if y_min_str:
+                        y_min = float(y_min_str)
+                    if y_max_str:
+                        y_max = float(y_max_str)
+                except ValueError:
+                    print(f"  Warning: Invalid range values, using auto-fit")
+                
+                y_axis_ranges[y_col] = (y_min, y_max)
+    
+    # Ask about legend customization
+    print("=" * 50)
+    print("Legend:")
+    print("1: Default - upper left")
+    print("2: Custom position / label")
+    print("3: Custom labels")
+    print("4: Hide legend")
+    legend_choice = input("Enter choice (1-4): ").strip() or "1"
+    
+    # Ask for custom chart title
+    custom_title = input("\nEnter custom chart title: ").strip()
+    if not custom_title:
+        custom_title = "Laboratory Data Analysis"
+    
+    # Handle custom legend labels
+    custom_labels = {}
+    if legend_choice == "3":
+        print("\nEnter custom labels for each Y column (blank for original):")
+        for y_col in y_cols:
+            label = input(f"Label for '{y_col}': ").strip()
+            if label:
+                custom_labels[y_col] = label
+            else:
+                custom_labels[y_col] = y_col
+    else:
+        custom_labels = {y_col: y_col for y_col in y_cols}
+    
+    # Determine legend position (for later use)
+    legend_pos = "upper left"  # default
+    if legend_choice == "2":  # Custom position
+        positions = {
+            "1": "upper left", "2": "upper center", "3": "upper right",
+            "4": "center left", "5": "center", "6": "center right",
+            "7": "lower left", "8": "lower center", "9": "lower right",
+            "0": "upper left"
+        }
+        print("\nLegend positions:")
+        for k, v in positions.items():
+            print(f"{k}: {v}")
+        pos_choice = input("Enter position (0-9): ").strip() or "0"
+        legend_pos = positions.get(pos_choice, "upper left")
+
+    # Save format/name are asked before drawing, so a cached image can be reused
+    targets = ask_save(custom_title, plot_type)
+    settings = dict(x=x_col, y=y_cols, type=plot_type, scale=scale_type, trend=trend_choice,
+                    annotate=annotate_measurements, dual=dual_axis, right=right_axis_cols,
+                    ranges={c: list(r) for c, r in y_axis_ranges.items()}, legend=legend_choice,
+                    legend_pos=legend_pos, labels=custom_labels, title=custom_title)
+    cache_spec = dict(spec, **settings) if spec is not None and targets and RENDER_CACHE_MB > 0 else None
+    # Nothing to show in headless mode: cache hits for every file are the whole job
+    if HEADLESS and cache_spec and all_cached(targets, cache_spec):
+        save_renditions(None, targets, cache_spec)
+        return
+    
+    # Timestamp X (datetime64 after indexing) becomes matplotlib date numbers in one vectorized call
+    datetime_x = is_datetime(df[x_col])
+    if datetime_x:
+        import matplotlib.dates as mdates
+
+        if annotate_measurements:
+            print("Waveform measurements need a numeric time axis; skipped for timestamp X.")
+            annotate_measurements = False
+    # Convert X column to numeric using smart parsing; if X has no numeric values, treat as categorical
+    try:
+        x_parsed = plot_x_values(df, x_col)
+    except Exception as e:
+        raise ValueError(f"Could not convert X column to numeric: {e}")
+
+    categorical_x = False
+    x_labels = None
+    if x_parsed.dropna().empty:
+        # No numeric X values -> categorical axis (use string labels)
+        categorical_x = True
+        x_labels = df[x_col].astype(str).tolist()
+        x = pd.Series(range(len(x_labels)))
+    else:
+        x = x_parsed
+
+    # Create figure with main axis (matplotlib is imported here, after all prompts are answered)
+    plt = load_pyplot()
+    fig, ax1 = plt.subplots(figsize=(10, 6))
+    ax2 = None
+    
+    # Color palette for each Y series
+    colors = plt.cm.tab10(np.linspace(0, 1, len(y_cols)))
+    artists = {}  # y_col -> (Line2D / PathCollection, axis), for in-place updates on re-run
+
+    # Plot each Y column
+    for idx, y_col in enumerate(y_cols):
+        try:
+            # Convert Y to numeric using smart parsing; drop NaN values
+            y = numeric_column(df, y_col)
+        except Exception as e:
+            print(f"Skipping column {y_col}: could not convert to numeric. Error: {e}")
+            continue
+        
+        # Select axis: use ax2 (right) for columns in right_axis_cols, otherwise use ax1 (left)
+        current_ax = ax1
+        if dual_axis and y_col in right_axis_cols:
+            if ax2 is None:
+                ax2 = ax1.twinx()  # Create second Y-axis sharing same X-axis
+            current_ax = ax2
+
+        # Plot based on type
+        if plot_type == "line":
+            # Line plot
+            line, = current_ax.plot(x, y, marker="o", markersize=6, linestyle="-", linewidth=2.5,
+                                    label=custom_labels[y_col], color=colors[idx])
+            artists[y_col] = (line, current_ax)
+            
+            # Add trend line
+            if trend_choice == "1":
+                # Linear trend: align numeric x and y values and fit slope/intercept
+                valid_xy = pd.concat([x, y], axis=1).apply(pd.to_numeric, errors="coerce").dropna()
+                if len(valid_xy) > 1:
+                    xv = valid_xy.iloc[:, 0].values
+                    yv = valid_xy.iloc[:, 1].values
+                    slope, intercept = np.polyfit(xv, yv, 1)
+                    p = np.poly1d([slope, intercept])
+                    x_trend = np.linspace(xv.min(), xv.max(), 100)
+                    current_ax.plot(x_trend, p(x_trend), "--", linewidth=2, alpha=0.8,
+                                   color=colors[idx], label=f"{y_col} trend")
+                    txt = f"Slope: {slope:.3g}\nIntercept: {intercept:.3g}"
+                    y_offset = 0.95 - (idx * 0.08)
+                    current_ax.text(0.02, y_offset, txt, transform=current_ax.transAxes,
+                                    color=colors[idx], fontsize=10, fontweight='bold',
+                                    bbox=dict(facecolor='white', alpha=0.75, edgecolor=colors[idx], linewidth=1.5))
+            elif trend_choice == "2":
+                # Polynomial (degree 2) trend: align and fit using numeric X values
+                valid_xy = pd.concat([x, y], axis=1).apply(pd.to_numeric, errors="coerce").dropna()
+                if len(valid_xy) > 2:
+                    xv = valid_xy.iloc[:, 0].values
+                    yv = valid_xy.iloc[:, 1].values
+                    z = np.polyfit(xv, yv, 2)
+                    p = np.poly1d(z)
+                    x_trend = np.linspace(xv.min(), xv.max(), 100)
+                    current_ax.plot(x_trend, p(x_trend), "--", linewidth=2, alpha=0.8,
+                                   color=colors[idx], label=f"{y_col} poly fit")
+                
+        elif plot_type == "scatter":
+            # Scatter plot
+            points = current_ax.scatter(x, y, s=80, marker='x', color=colors[idx], label=custom_labels[y_col], alpha=1.0, linewidths=2)
+            artists[y_col] = (points, current_ax)
+            
+            if trend_choice == "1":
+                # Linear trend for scatter: align numeric x and y values and fit
+                valid_xy = pd.concat([x, y], axis=1).apply(pd.to_numeric, errors="coerce").dropna()
+                if len(valid_xy) > 1:
+                    xv = valid_xy.iloc[:, 0].values
+                    yv = valid_xy.iloc[:, 1].values
+                    slope, intercept = np.polyfit(xv, yv, 1)
+                    p = np.poly1d([slope, intercept])
+                    x_trend = np.linspace(xv.min(), xv.max(), 100)
+                    current_ax.plot(x_trend, p(x_trend), "--", linewidth=2, alpha=0.8,
+                                   color=colors[idx], label=f"{y_col} trend")
+                    txt = f"Slope: {slope:.3g}\nIntercept: {intercept:.3g}"
+                    y_offset = 0.95 - (idx * 0.08)
+                    current_ax.text(0.02, y_offset, txt, transform=current_ax.transAxes,
+                                    color=colors[idx], fontsize=10, fontweight='bold',
+                                    bbox=dict(facecolor='white', alpha=0.75, edgecolor=colors[idx], linewidth=1.5))
+            elif trend_choice == "2":
+                # Polynomial (degree 2) fit for scatter: use numeric X values
+                valid_xy = pd.concat([x, y], axis=1).apply(pd.to_numeric, errors="coerce").dropna()
+                if len(valid_xy) > 2:
+                    xv = valid_xy.iloc[:, 0].values
+                    yv = valid_xy.iloc[:, 1].values
+                    z = np.polyfit(xv, yv, 2)
+                    p = np.poly1d(z)
+                    x_trend = np.linspace(xv.min(), xv.max(), 100)
+                    current_ax.plot(x_trend, p(x_trend), "--", linewidth=2, alpha=0.8,
+                                   color=colors[idx], label=f"{y_col} poly fit")
                 
-                y_axis_ranges[y_col] = (y_min, y_max)
+        elif plot_type == "bar":
+            # Bar chart: support categorical X and numeric X, with value annotations
+            # Ensure Y is numeric
+            y_vals = pd.to_numeric(y, errors='coerce')
+            n = len(y_vals)
+            if categorical_x:
+                # Grouped bars: offset each series horizontally
+                base_pos = np.arange(n)
+                num_series = len(y_cols)
+                width = 0.8 / max(1, num_series)
+                # compute positions for this series
+                pos = base_pos - 0.4 + idx * width + width / 2
+                bars = current_ax.bar(pos, y_vals, width=width, label=custom_labels[y_col], alpha=0.85, color=colors[idx], edgecolor='black', linewidth=1.0)
+                # set xticks on main axis (ax1)
+                if current_ax is ax1:
+                    ax1.set_xticks(base_pos)
+                    ax1.set_xticklabels(x_labels, rotation=45, ha='right')
+                # annotate values above bars
+                for rect, val in zip(bars, y_vals):
+                    if not np.isnan(val):
+                        current_ax.text(rect.get_x() + rect.get_width()/2, rect.get_height(), f"{val:.3g}",
+                                        ha='center', va='bottom', fontsize=9, color='black')
+            else:
+                # Numeric X: plot using X values directly (timestamp bars are 80% of the sample spacing)
+                width = 0.8 * float(np.nanmedian(np.diff(x.to_numpy()))) if datetime_x and n > 1 else 0.8
+                bars = current_ax.bar(x, y_vals, width=width, label=custom_labels[y_col], alpha=0.75, color=colors[idx], edgecolor='black', linewidth=1.2)
+                if not datetime_x:
+                    current_ax.set_xticks(x)
+                # annotate values above bars
+                for rect, val in zip(bars, y_vals):
+                    if not np.isnan(val):
+                        current_ax.text(rect.get_x() + rect.get_width()/2, rect.get_height(), f"{val:.3g}",
+                                        ha='center', va='bottom', fontsize=9, color='black')
+            
+        elif plot_type == "histogram":
+            # Histogram: distribution of Y values (bins=20 intervals) with edge color
+            current_ax.hist(y.dropna(), bins=20, label=custom_labels[y_col], alpha=0.7, color=colors[idx], edgecolor='black', linewidth=1)
+
+        # Frequency, rise/fall, slew rate, overshoot box and edge markers
+        if annotate_measurements and not categorical_x:
+            annotate_waveform(current_ax, x, y, colors[idx], idx)
+
+    # Set axis labels and title with larger, bold fonts
+    ax1.set_xlabel(x_col, fontsize=12, fontweight='bold')
+    if not dual_axis:
+        # Single Y-axis: label lists all Y columns
+        ax1.set_ylabel(", ".join(y_cols), fontsize=12, fontweight='bold')
+    else:
+        # Dual Y-axis: left axis shows columns NOT in right_axis_cols, right axis shows right_axis_cols
+        left_cols = [c for c in y_cols if c not in right_axis_cols]
+        left_label = ", ".join(left_cols) if left_cols else ""
+        right_label = ", ".join(right_axis_cols) if right_axis_cols else ""
+        
+        if left_label:
+            # Use neutral color for left axis label to avoid confusion
+            ax1.set_ylabel(left_label, fontsize=12, fontweight='bold', color='black')
+            ax1.tick_params(axis='y', labelcolor='black', labelsize=10)
+        
+        if ax2 and right_label:
+            # Use neutral color for right axis label to avoid confusion
+            ax2.set_ylabel(right_label, fontsize=12, fontweight='bold', color='black')
+            ax2.tick_params(axis='y', labelcolor='black', labelsize=10)
+        
+        # Apply custom Y-axis ranges if specified (for all left/right columns)
+        for y_col in left_cols:
+            if y_col in y_axis_ranges:
+                y_min, y_max = y_axis_ranges[y_col]
+                if y_min is not None or y_max is not None:
+                    ax1.set_ylim(y_min, y_max)
+                    break  # Apply first valid range to left axis
+        
+        if ax2:
+            for y_col in right_axis_cols:
+                if y_col in y_axis_ranges:
+                    y_min, y_max = y_axis_ranges[y_col]
+                    if y_min is not None or y_max is not None:
+                        ax2.set_ylim(y_min, y_max)
+                        break  # Apply first valid range to right axis
     
-    # Ask about legend customization
-    print("=" * 50)
-    print("Legend:")
-    print("1: Default - upper left")
-    print("2: Custom position / label")
-    print("3: Custom labels")
-    print("4: Hide legend")
-    legend_choice = input("Enter choice (1-4): ").strip() or "1"
+    # Timestamp X: date ticks chosen for the visible span
+    if datetime_x:
+        locator = mdates.AutoDateLocator()
+        ax1.xaxis.set_major_locator(locator)
+        ax1.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+
+    # If X is categorical, apply labels for all plot types
+    if 'categorical_x' in locals() and categorical_x and x_labels:
+        ax1.set_xticks(np.arange(len(x_labels)))
+        ax1.set_xticklabels(x_labels, rotation=45, ha='right')
+
+    # Apply axis scaling (logarithmic, semi-log, etc.)
+    if scale_type == "loglog":
+        ax1.set_xscale('log')
+        ax1.set_yscale('log')
+        if ax2:
+            ax2.set_yscale('log')
+    elif scale_type == "semilogx":
+        ax1.set_xscale('log')
+    elif scale_type == "semilogy":
+        ax1.set_yscale('log')
+        if ax2:
+            ax2.set_yscale('log')
+
+    # Improve title and styling
+    ax1.set_title(custom_title, fontsize=14, fontweight='bold', pad=20)
+    ax1.grid(True, alpha=0.4, linestyle='--', linewidth=0.7)  # Enhanced grid: dashed lines, better visibility
+    ax1.tick_params(axis='x', labelsize=10)
     
-    # Ask for custom chart title
-    custom_title = input("\nEnter custom chart title: ").strip()
-    if not custom_title:
-        custom_title = "Laboratory Data Analysis"
+    # Enhanced legend with better positioning and frame
+    if legend_choice != "4":  # "4" means hide legend
+        legend1 = ax1.legend(loc=legend_pos, fontsize=10, framealpha=0.95, edgecolor='black', fancybox=True, shadow=True)
+        if ax2:
+            ax2.legend(loc='upper right', fontsize=10, framealpha=0.95, edgecolor='black', fancybox=True, shadow=True)
     
-    # Handle custom legend labels
-    custom_labels = {}
-    if legend_choice == "3":
-        print("\nEnter custom labels for each Y column (blank for original):")
-        for y_col in y_cols:
-            label = input(f"Label for '{y_col}': ").strip()
-            if label:
-                custom_labels[y_col] = label
+    # Add light background color for readability
+    ax1.set_facecolor('#f8f9fa')
+    fig.patch.set_facecolor('white')
+    
+    plt.tight_layout()  # Auto-adjust spacing to avoid label cutoff
+
+    # Plain line/scatter figures (no fits or annotations derived from the data) can be updated
+    # in place by a re-run; the previous kept figure is released
+    global _LIVE_PLOT
+    if _LIVE_PLOT is not None and HEADLESS:
+        plt.close(_LIVE_PLOT["fig"])
+    _LIVE_PLOT = None
+    keep = (plot_type in ("line", "scatter") and trend_choice == "0" and not annotate_measurements
+            and not categorical_x and len(artists) == len(y_cols))
+    if keep:
+        left_fixed = any(any(v is not None for v in y_axis_ranges.get(c, ()))
+                         for c in y_cols if c not in right_axis_cols)
+        right_fixed = any(any(v is not None for v in y_axis_ranges.get(c, ())) for c in right_axis_cols)
+        _LIVE_PLOT = {"fig": fig, "x_col": x_col, "y_cols": list(y_cols), "plot_type": plot_type,
+                      "settings": settings, "artists": artists,
+                      "axes": [(ax1, left_fixed)] + ([(ax2, right_fixed)] if ax2 else [])}
+
+    save_and_show(plt, fig, custom_title, plot_type, targets=targets, cache_spec=cache_spec, keep=keep)
+
+
+def update_plot(df: pd.DataFrame, x_col: str, y_cols: list, spec: dict = None) -> bool:
+    """
+    Re-run with the same plot settings: put the new rows into the figure kept from the last
+    plot_data call (set_data / set_offsets, autoscale, redraw) instead of building a new one.
+    Returns False (nothing done) when there is no such figure, it was closed, or the columns differ.
+    """
+    import numpy as np
+
+    live = _LIVE_PLOT
+    if live is None or live["x_col"] != x_col or live["y_cols"] != list(y_cols):
+        return False
+    plt = load_pyplot()
+    fig = live["fig"]
+    if not HEADLESS and not plt.fignum_exists(fig.number):
+        return False
+    x = plot_x_values(df, x_col).to_numpy(dtype=float)
+    if not np.isfinite(x).any():
+        return False
+
+    points = {}
+    for col, (artist, ax) in live["artists"].items():
+        y = numeric_column(df, col).to_numpy(dtype=float)
+        if live["plot_type"] == "line":
+            artist.set_data(x, y)
+        else:
+            xy = np.column_stack([x, y])
+            artist.set_offsets(xy)
+            points.setdefault(ax, []).append(xy[np.isfinite(xy).all(axis=1)])
+    for ax, fixed in live["axes"]:
+        ax.relim()
+        for xy in points.get(ax, []):  # older matplotlib leaves scatter points out of relim()
+            ax.update_datalim(xy)
+        ax.autoscale_view(scaley=not fixed)  # user-set Y ranges stay as they were
+    print(f"Updated the open figure in place ({len(df)} rows).")
+
+    settings = live["settings"]
+    targets = ask_save(settings["title"], live["plot_type"])
+    cache_spec = dict(spec, **settings) if spec is not None and targets and RENDER_CACHE_MB > 0 else None
+    save_and_show(plt, fig, settings["title"], live["plot_type"], targets=targets, cache_spec=cache_spec,
+                  keep=True)
+    return True
+
+
+# Save renditions by file-name ending: PNG resolution in DPI, None for vector formats, "thumb"
+# for a THUMB_WIDTH px wide preview. Raster renditions are scaled from one render at the top DPI.
+RENDITIONS = {".png": 300, "_150dpi.png": 150, "_thumb.png": "thumb", ".pdf": None, ".svg": None}
+SAVE_CHOICES = {"1": [".png"], "2": [".pdf"], "3": [".svg"], "4": list(RENDITIONS)}
+THUMB_WIDTH = 320
+
+# Saving runs in a worker process (the figure is pickled), so the window opens right away
+_EXPORT_POOL = None
+_PENDING_EXPORTS = []
+
+
+def ask_save(custom_title: str, plot_type: str) -> list:
+    """
+    Ask whether to save the plot (PNG/PDF/SVG, or all renditions, into "Saved Graphs") and under
+    which name. Returns the full paths of the files to write ([] if the plot is not saved).
+    """
+    # User chooses whether to save plot to disk
+    print("=" * 37)
+    save_choice = input("Save plot? (0=none, 1=PNG, 2=PDF, 3=SVG, 4=all: PNG 300+150 dpi, PDF, SVG, thumbnail;"
+                        " e.g. 1,2): ").strip() or "1" # default - PNG
+    print("=" * 15 + " Enjoy " + "=" * 15)
+    suffixes = [sfx for c in save_choice.replace(" ", "").split(",") for sfx in SAVE_CHOICES.get(c, [])]
+    if not suffixes: # if user chose not to save
+        return []
+    script_dir = os.path.dirname(os.path.abspath(__file__)) # script directory
+    # Create "Saved Graphs" folder if it doesn't exist
+    saved_graphs_dir = os.path.join(script_dir, "Saved Graphs")
+    os.makedirs(saved_graphs_dir, exist_ok=True)
+    
+    # Determine prefix based on plot type
+    prefix_map = {"line": "Lin.", "scatter": "Sc.", "bar": "Bar.", "histogram": "Hist.", "spectrum": "Spec.", "delay": "Delay.",
+                  "envelope": "Env.", "bode": "Bode."}
+    prefix = prefix_map.get(plot_type, "")
+    
+    # Ask user for custom filename (default: use chart title)
+    default_name = custom_title.replace(" ", ".").replace("/", "-").replace("\\", "-")
+    user_filename = input(f"\nEnter filename (blank for '{default_name}'): ").strip()
+    if not user_filename:
+        user_filename = default_name
+    
+    # Remove extension if user added it (we'll add the correct ones)
+    user_filename = user_filename.replace(".png", "").replace(".pdf", "").replace(".svg", "")
+    
+    # Generate final filenames with prefix and timestamp to avoid overwriting
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    base = os.path.join(saved_graphs_dir, f"{prefix}{user_filename}_{timestamp}")
+    return [base + sfx for sfx in dict.fromkeys(suffixes)]
+
+
+def rendition_of(path: str) -> str:
+    """The RENDITIONS ending of a save path ('_thumb.png' rather than '.png')."""
+    return max((sfx for sfx in RENDITIONS if path.endswith(sfx)), key=len)
+
+
+def rendition_key(cache_spec: dict, target: str) -> str:
+    return render_cache_key(dict(cache_spec, format=rendition_of(target)))
+
+
+def all_cached(targets: list, cache_spec: dict) -> bool:
+    """True if every target can be taken from the render cache."""
+    return bool(targets) and all(
+        os.path.isfile(render_cache_path(rendition_key(cache_spec, t), os.path.splitext(t)[1])) for t in targets)
+
+
+def save_renditions(fig, targets: list, cache_spec: dict = None):
+    """
+    Write the figure to every target path. With a `cache_spec` (the plot specification), targets
+    already in the render cache are copied into place, new renders go into the cache as well.
+    What is left is written by export_renditions, in the background. In interactive mode the
+    window still draws the figure; the cache only saves rendering the files.
+    """
+    jobs = []
+    hits = 0
+    for target in targets:
+        key = rendition_key(cache_spec, target) if cache_spec else None
+        if key and fetch_cached_render(key, target, announce=False):
+            print(f"Plot saved to: {target}")
+            hits += 1
+            continue
+        out = render_cache_path(key, os.path.splitext(target)[1]) if key else target
+        jobs.append((target, out, rendition_of(target), key))
+    if hits:
+        print(f"{hits} file(s) taken from the render cache - not rendered again.")
+    if jobs:
+        export_renditions(fig, jobs)
+
+
+def _write_renditions(fig, writes: list) -> list:
+    """
+    Write (path, rendition) pairs of `fig`: every raster rendition comes from a single Agg
+    render at the highest DPI asked for (scaled down with Pillow), vector formats are drawn
+    once each. Returns [(path, seconds)].
+    """
+    import time
+
+    done = []
+    raster = [(path, sfx) for path, sfx in writes if RENDITIONS[sfx] is not None]
+    if raster:
+        from PIL import Image
+
+        dpis = [RENDITIONS[sfx] for _, sfx in raster if RENDITIONS[sfx] != "thumb"]
+        top = max(dpis, default=RENDITIONS[".png"])
+        start = time.perf_counter()
+        png = io.BytesIO()
+        fig.savefig(png, format="png", dpi=top, bbox_inches='tight', facecolor='white')
+        image = None
+        for path, sfx in raster:
+            dpi = RENDITIONS[sfx]
+            if dpi == top:
+                with open(path, "wb") as fh:
+                    fh.write(png.getvalue())
+            else:
+                if image is None:
+                    image = Image.open(io.BytesIO(png.getvalue()))
+                    image.load()
+                scale = THUMB_WIDTH / image.width if dpi == "thumb" else dpi / top
+                size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+                image.resize(size, Image.LANCZOS).save(path, dpi=(round(top * scale),) * 2)
+            done.append((path, time.perf_counter() - start))
+            start = time.perf_counter()
+    for path, sfx in writes:
+        if RENDITIONS[sfx] is None:
+            start = time.perf_counter()
+            fig.savefig(path, bbox_inches='tight', facecolor='white')
+            done.append((path, time.perf_counter() - start))
+    return done
+
+
+def _export_worker(payload: bytes, writes: list) -> list:
+    """Worker-process side of export_renditions: unpickle the figure and write it with Agg."""
+    import pickle
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig = pickle.loads(payload)
+    try:
+        return _write_renditions(fig, writes)
+    finally:
+        plt.close(fig)
+
+
+def _report_export(jobs: list, result, started: float, background: bool):
+    """Print where each file went and how long it took; copy render-cache entries into place."""
+    import time
+
+    try:
+        done = result.result() if hasattr(result, "result") else result
+    except Exception as e:
+        print(f"\nSaving the plot failed: {e}")
+        return
+    took = dict(done)
+    lines = []
+    for target, out, _, key in jobs:
+        if key:
+            fetch_cached_render(key, target, announce=False)
+        lines.append(f"  {target}  ({took.get(out, 0.0):.2f} s)")
+    if any(key for *_, key in jobs):
+        prune_cache("renders", RENDER_CACHE_MB)
+    where = " in the background" if background else ""
+    print(f"\nPlot saved{where} ({time.perf_counter() - started:.2f} s):\n" + "\n".join(lines))
+
+
+def export_renditions(fig, jobs: list):
+    """
+    Write (target, path to write, rendition, cache key) jobs of `fig` in a worker process, so the
+    plot window opens while the files are written; a message with timings follows when done.
+    Figures that can't be pickled are written here instead.
+    """
+    global _EXPORT_POOL
+    import pickle
+    import time
+
+    started = time.perf_counter()
+    writes = [(out, sfx) for _, out, sfx, _ in jobs]
+    try:
+        payload = pickle.dumps(fig)
+        if _EXPORT_POOL is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # spawn: a fork of a process running a GUI event loop isn't safe
+            _EXPORT_POOL = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        future = _EXPORT_POOL.submit(_export_worker, payload, writes)
+    except Exception:
+        _report_export(jobs, _write_renditions(fig, writes), started, background=False)
+        return
+    _PENDING_EXPORTS.append(future)
+    future.add_done_callback(lambda f: _report_export(jobs, f, started, background=True))
+    print(f"Writing {len(jobs)} file(s) in the background...")
+
+
+def finish_exports():
+    """Wait for background saves still running (called before the program exits)."""
+    global _EXPORT_POOL
+    pending = [f for f in _PENDING_EXPORTS if not f.done()]
+    if pending:
+        print(f"Waiting for {len(pending)} plot save(s) to finish...")
+    if _EXPORT_POOL is not None:
+        _EXPORT_POOL.shutdown(wait=True)  # also waits for the completion messages
+        _EXPORT_POOL = None
+    _PENDING_EXPORTS.clear()
+
+
+def save_and_show(plt, fig, custom_title: str, plot_type: str, targets: list = None, cache_spec: dict = None,
+                  keep: bool = False):
+    """
+    Save the finished figure, then show it. Without `targets` the save prompts are asked here
+    ([] = already asked, not saved). The files are written in the background (save_renditions),
+    so the window appears at once. With a `cache_spec` images come from (or go into) the
+    render cache.
+    The window is shown without blocking, so the menu continues while it stays open;
+    `keep` holds on to the figure in headless mode too (for update_plot).
+    """
+    if targets is None:
+        targets = ask_save(custom_title, plot_type)
+    if targets:
+        save_renditions(fig, targets, cache_spec)
+    
+    if HEADLESS:
+        if not keep:
+            plt.close(fig)  # nothing to show; free the figure
+    else:
+        fig.canvas.draw_idle()
+        plt.show(block=False)  # Display plot in window
+        plt.pause(0.001)  # let the GUI draw it before the next prompt
+
+
+def wait_for_windows():
+    """
+    Plot windows are shown without blocking: before the program exits, keep them up until the
+    user closes them. Nothing to do headless or when no plot was made.
+    """
+    if not HEADLESS and "matplotlib.pyplot" in sys.modules:
+        plt = load_pyplot()
+        if plt.get_fignums():
+            print("Close the plot window(s) to exit.")
+            plt.show()
+
+
+# ---------------------------------------------------------------------------
+# Render cache (Cache/renders): saved images keyed by source file + full plot spec
+# ---------------------------------------------------------------------------
+
+def render_cache_key(spec: dict) -> str:
+    """Hash of the plot specification (which includes the source file identity)."""
+    import hashlib
+    import json
+
+    return hashlib.sha1(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def render_cache_path(cache_key: str, ext: str) -> str:
+    cache_dir = os.path.join(CACHE_DIR, "renders")
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, cache_key + ext)
+
+
+def fetch_cached_render(cache_key: str, target: str, announce: bool = True) -> bool:
+    """
+    Put a copy of the cached image for `cache_key` at `target`: a reflink where the filesystem
+    supports it (nothing is written), else a plain copy. Never a hard link, so editing the saved
+    file can't change the cache entry. Returns False if there is no cached image.
+    """
+    import shutil
+    from pathlib import Path
+    from Seperate import clone_file
+
+    cached = render_cache_path(cache_key, os.path.splitext(target)[1])
+    if not os.path.isfile(cached):
+        return False
+    if not clone_file(Path(cached), Path(target)):
+        shutil.copyfile(cached, target)
+    os.utime(cached)  # mark the cache entry (not the saved file) as recently used for LRU eviction
+    if announce:
+        print("Identical plot found in render cache - not rendered again.")
+    return True
+
+
+def prune_cache(name: str, limit_mb: float):
+    """Delete least recently used files until Cache/<name> is under limit_mb."""
+    cache_dir = os.path.join(CACHE_DIR, name)
+    entries = []
+    for name in os.listdir(cache_dir):
+        st = os.stat(os.path.join(cache_dir, name))
+        entries.append((st.st_mtime, st.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    limit = limit_mb * 1024 * 1024
+    for _, size, name in sorted(entries):
+        if total <= limit:
+            break
+        os.remove(os.path.join(cache_dir, name))
+        total -= size
+
+
+# ---------------------------------------------------------------------------
+# Export of the processed (plotted) data
+# ---------------------------------------------------------------------------
+
+EXPORT_FORMATS = {"1": "csv", "2": "parquet", "3": "npz"}
+EXPORT_CHUNK = 1 << 18  # rows formatted and written per block
+
+
+def ask_export(source: str) -> str:
+    """
+    Ask whether to write the plotted data (CSV / Parquet / .npz into "Saved Graphs").
+    With --export the format is already chosen and nothing is asked.
+    Returns the full path of the file to write, or None.
+    """
+    fmt = EXPORT_FORMAT
+    if fmt is None:
+        choice = input("Export plotted data? (0=none, 1=CSV, 2=Parquet, 3=NPZ): ").strip() or "0"
+        fmt = EXPORT_FORMATS.get(choice)
+        if fmt is None:
+            return None
+    saved_graphs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Saved Graphs")
+    os.makedirs(saved_graphs_dir, exist_ok=True)
+    default_name = os.path.splitext(strip_compression(os.path.basename(source)))[0].replace(" ", ".")
+    user_filename = default_name if EXPORT_FORMAT else \
+        input(f"Enter filename (blank for '{default_name}'): ").strip() or default_name
+    user_filename = user_filename[:-len(fmt) - 1] if user_filename.endswith("." + fmt) else user_filename
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return os.path.join(saved_graphs_dir, f"Data.{user_filename}_{timestamp}.{fmt}")
+
+
+def _csv_quote(field: str) -> str:
+    if "," in field or '"' in field or "\n" in field:
+        return '"' + field.replace('"', '""') + '"'
+    return field
+
+
+def _csv_text(values) -> list:
+    """One CSV field per value: shortest round-trip floats, ISO timestamps, empty for NaN/NaT."""
+    import numpy as np
+
+    if values.dtype.kind == "f":
+        text = list(map(repr, values.tolist()))
+        missing = np.flatnonzero(np.isnan(values))
+    elif values.dtype.kind == "M":
+        text = np.datetime_as_string(values, unit="auto").tolist()
+        missing = np.flatnonzero(np.isnat(values))
+    elif values.dtype.kind in "iub":
+        return list(map(str, values.tolist()))
+    else:
+        return ["" if v is None or v != v else _csv_quote(str(v)) for v in values.tolist()]
+    for i in missing:
+        text[i] = ""
+    return text
+
+
+def _write_csv_chunks(arrays: dict, path: str):
+    """Plain CSV writer: each block of rows is formatted column by column and written in one go."""
+    columns = list(arrays.values())
+    n = len(columns[0]) if columns else 0
+    with open(path, "w", encoding="utf-8", newline="", buffering=1 << 20) as f:
+        f.write(",".join(map(_csv_quote, arrays)) + "\n")
+        for start in range(0, n, EXPORT_CHUNK):
+            fields = [_csv_text(col[start:start + EXPORT_CHUNK]) for col in columns]
+            f.write("\n".join(map(",".join, zip(*fields))))
+            f.write("\n")
+
+
+def export_data(df: pd.DataFrame, columns: list, path: str) -> int:
+    """
+    Write `columns` of the processed DataFrame to `path` (.csv, .parquet or .npz, by extension),
+    taking each column's array directly (no row-wise DataFrame conversion). CSV and Parquet are
+    written in blocks of rows; pyarrow is used when installed (needed for Parquet).
+    Returns the number of rows written.
+    """
+    import numpy as np
+
+    arrays = {}
+    quantized = df.attrs.get("quantized", {})
+    for col in dict.fromkeys(columns):  # keep order, drop duplicates
+        values = numeric_column(df, col).to_numpy() if col in quantized else df[col].to_numpy()
+        arrays[str(col)] = values if values.dtype.kind in "fiubM" else values.astype(object)
+    fmt = os.path.splitext(path)[1][1:].lower()
+
+    if fmt == "npz":
+        # numpy keys become file names inside the archive; text columns are stored as str arrays
+        np.savez(path, **{name.replace("/", "_"): values.astype(str) if values.dtype == object else values
+                          for name, values in arrays.items()})
+        return len(df)
+
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        if fmt == "parquet":
+            raise ValueError(f"Writing .parquet files needs pyarrow (pip install pyarrow): {e}")
+        _write_csv_chunks(arrays, path)
+        return len(df)
+
+    try:
+        table = pa.table({name: pa.array(values, from_pandas=True) for name, values in arrays.items()})
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        if fmt == "parquet":
+            raise ValueError("Columns with mixed text/number values can't be written to Parquet")
+        _write_csv_chunks(arrays, path)  # mixed text/number column
+        return len(df)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, path, row_group_size=EXPORT_CHUNK * 4)
+    else:
+        import pyarrow.csv as pacsv
+        try:
+            options = pacsv.WriteOptions(quoting_style="needed")
+        except TypeError:  # older pyarrow quotes every text field
+            options = pacsv.WriteOptions()
+        with pacsv.CSVWriter(path, table.schema, write_options=options) as writer:
+            for batch in table.to_batches(max_chunksize=EXPORT_CHUNK):
+                writer.write_batch(batch)
+    return len(df)
+
+
+def offer_export(df: pd.DataFrame, x_col: str, y_cols: list, source: str):
+    """Ask for (or, with --export, always do) an export of the plotted X/Y columns."""
+    import time
+
+    path = ask_export(source)
+    if not path:
+        return
+    start = time.perf_counter()
+    try:
+        rows = export_data(df, [x_col] + list(y_cols), path)
+    except (OSError, ValueError) as e:
+        print(f"Export failed: {e}")
+        return
+    print(f"Data saved to: {path} ({rows} rows in {time.perf_counter() - start:.2f}s)")
+
+
+# ---------------------------------------------------------------------------
+# Spectral analysis (FFT / Welch PSD)
+# ---------------------------------------------------------------------------
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Cache")
+_SPECTRUM_CACHE = {}  # key -> (freqs, spectrum, fs); in-memory copy of Cache/spectra
+WINDOWS = {"1": "hann", "2": "hamming", "3": "blackman", "4": "rect"}
+
+
+def infer_sample_rate(x) -> float:
+    """Sample rate (1 / median X step) of an X column in seconds. Raises ValueError if X never increases."""
+    import numpy as np
+
+    x = np.asarray(x, dtype=float)
+    steps = np.diff(x[~np.isnan(x)])
+    steps = steps[steps > 0]
+    if steps.size == 0:
+        raise ValueError("X column is not increasing; cannot infer a sample rate.")
+    return 1.0 / float(np.median(steps))
+
+
+def _window(name: str, n: int):
+    import numpy as np
+
+    return {"hann": np.hanning, "hamming": np.hamming, "blackman": np.blackman}.get(name, np.ones)(n)
+
+
+def _fill_gaps(ys, prev=None):
+    """
+    Replace NaNs in each channel (row) by linear interpolation, so every channel keeps its own length.
+    `prev` is the (filled) sample of each channel just before ys when ys continues a stream;
+    leading NaNs are then interpolated from it instead of copying the first valid value.
+    """
+    import numpy as np
+
+    ys = np.array(ys, dtype=float)
+    if prev is not None:
+        ys = np.hstack([np.reshape(prev, (-1, 1)), np.atleast_2d(ys)])
+    idx = np.arange(ys.shape[-1])
+    for row in np.atleast_2d(ys):  # rows are views, so ys is filled in place
+        bad = np.isnan(row)
+        if bad.any() and not bad.all():
+            row[bad] = np.interp(idx[bad], idx[~bad], row[~bad])
+    return np.nan_to_num(ys if prev is None else ys[:, 1:])
+
+
+def _welch_sum(ys, nperseg: int, w, block: int = 4096):
+    """
+    Sum of windowed, mean-removed periodograms over all complete 50 %-overlap segments of ys
+    (channels x samples). Every block of segments for every channel goes through one 2-D rfft call.
+    Returns (power_sum, segments, samples_consumed); samples after `samples_consumed` start
+    the next, still incomplete, segment.
+    """
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    step = max(nperseg // 2, 1)
+    n = ys.shape[-1]
+    total = np.zeros((ys.shape[0], nperseg // 2 + 1))
+    if n < nperseg:
+        return total, 0, 0
+    n_seg = (n - nperseg) // step + 1
+    segs = sliding_window_view(ys, nperseg, axis=-1)[:, ::step][:, :n_seg]  # view, no copy
+    for start in range(0, n_seg, block):
+        part = segs[:, start:start + block]
+        part = (part - part.mean(axis=-1, keepdims=True)) * w
+        total += (np.abs(np.fft.rfft(part, axis=-1)) ** 2).sum(axis=1)
+    return total, n_seg, n_seg * step
+
+
+def _welch_finish(total, segments: int, fs: float, w, nperseg: int):
+    """Turn a periodogram sum into a one-sided PSD (Y units squared per Hz)."""
+    import numpy as np
+
+    psd = total / max(segments, 1) / (fs * float((w ** 2).sum()))
+    if nperseg % 2 == 0:
+        psd[:, 1:-1] *= 2
+    else:
+        psd[:, 1:] *= 2
+    return np.fft.rfftfreq(nperseg, 1.0 / fs), psd
+
+
+def compute_spectrum(ys, fs: float, method: str = "welch", nperseg: int = 1024, window: str = "hann"):
+    """
+    Spectra of several channels at once; ys is channels x samples (NaNs are interpolated over).
+    method 'fft':   single-sided amplitude spectrum of the whole record (Y units).
+    method 'welch': PSD averaged over 50 % overlapping windowed segments (Y units squared per Hz).
+    Returns (freqs, spectra) with spectra shaped channels x frequencies.
+    """
+    import numpy as np
+
+    ys = _fill_gaps(np.atleast_2d(ys))
+    n = ys.shape[-1]
+    if method == "fft":
+        w = _window(window, n)
+        spec = np.abs(np.fft.rfft((ys - ys.mean(axis=-1, keepdims=True)) * w, axis=-1)) * 2 / w.sum()
+        return np.fft.rfftfreq(n, 1.0 / fs), spec
+    nperseg = min(nperseg, n)
+    w = _window(window, nperseg)
+    total, segments, _ = _welch_sum(ys, nperseg, w)
+    return _welch_finish(total, segments, fs, w, nperseg)
+
+
+def welch_from_file(filepath: str, x_col: str, y_cols: list, nperseg: int = 1024, window: str = "hann",
+                    chunk_rows: int = 500_000):
+    """
+    Welch PSD of whole-file columns, streaming the CSV in chunks so memory stays constant.
+    Samples that don't complete a segment are carried into the next chunk, and so is a gap
+    (NaNs) at the end of a chunk until the next valid value arrives, so segments and gap filling
+    match compute_spectrum on the fully loaded columns. Only a gap longer than chunk_rows is
+    filled differently: it is held back no longer and continues the last valid value.
+    The sample rate is the median of the per-chunk rates (the in-memory path takes the median
+    step of the whole column); a warning is printed if the chunks disagree by more than 1 %.
+    Returns (freqs, spectra, fs).
+    """
+    import numpy as np
+
+    w = _window(window, nperseg)
+    rates = []
+    last_x = None
+    prev = None      # last filled sample of each channel
+    pending = None   # raw samples from the end of the last chunk, waiting for the next valid value
+    tail = None      # filled samples not yet in a complete segment
+    total = None
+    segments = 0
+
+    def feed(ys):
+        nonlocal tail, total, segments
+        buf = ys if tail is None else np.hstack([tail, ys])
+        part, n_seg, used = _welch_sum(buf, nperseg, w)
+        total = part if total is None else total + part
+        segments += n_seg
+        tail = buf[:, used:]
+
+    for chunk in read_chunks(filepath, columns=list(dict.fromkeys([x_col] + y_cols)), chunksize=chunk_rows):
+        x = np.asarray(numeric_column(chunk, x_col).to_numpy(), dtype=float)
+        x = x[~np.isnan(x)]
+        try:
+            rates.append(infer_sample_rate(x if last_x is None else np.concatenate([[last_x], x])))
+        except ValueError:
+            pass
+        if x.size:
+            last_x = x[-1]
+        raw = np.vstack([numeric_column(chunk, c).to_numpy() for c in y_cols]).astype(float)
+        buf = raw if pending is None else np.hstack([pending, raw])
+        valid = ~np.isnan(buf)
+        ends = np.where(valid.any(axis=1), buf.shape[-1] - np.argmax(valid[:, ::-1], axis=1), 0)
+        cut = max(int(ends.min()), buf.shape[-1] - chunk_rows)  # everything before has its next valid value
+        if cut > 0:
+            filled = _fill_gaps(buf, prev)[:, :cut]
+            prev = filled[:, -1]
+            feed(filled)
+        pending = buf[:, cut:]
+    if pending is not None and pending.shape[-1]:
+        feed(_fill_gaps(pending, prev))
+    if not rates:
+        raise ValueError("X column is not increasing; cannot infer a sample rate.")
+    if segments == 0:
+        raise ValueError(f"Not enough samples for one segment of {nperseg}.")
+    fs = float(np.median(rates))
+    if max(rates) > 1.01 * min(rates):
+        print(f"Sample rate varies along the file ({min(rates):.6g} to {max(rates):.6g} Hz); using {fs:.6g} Hz.")
+    freqs, psd = _welch_finish(total, segments, fs, w, nperseg)
+    return freqs, psd, fs
+
+
+def file_spectra(filepath: str, x_col: str, y_cols: list, method: str, nperseg: int, window: str, df=None):
+    """
+    Spectra of whole-file columns, cached per (file path/size/mtime, column, settings) in memory
+    and in Cache/spectra (least recently used files dropped above SPECTRUM_CACHE_MB). Only uncached
+    columns are computed: from `df` (the whole loaded file) if given, otherwise by streaming the
+    file (Welch only).
+    Returns (freqs, {col: spectrum}, fs).
+    """
+    import hashlib
+    import numpy as np
+
+    st = os.stat(filepath)
+    ident = (os.path.abspath(filepath), st.st_size, st.st_mtime_ns, x_col, method, nperseg, window)
+    cache_dir = os.path.join(CACHE_DIR, "spectra")
+    result, freqs, fs, missing = {}, None, None, []
+    for col in y_cols:
+        key = ident + (col,)
+        hit = _SPECTRUM_CACHE.get(key)
+        disk = os.path.join(cache_dir, hashlib.sha1(repr(key).encode()).hexdigest() + ".npz")
+        if hit is None and SPECTRUM_CACHE_MB > 0 and os.path.isfile(disk):
+            try:
+                with np.load(disk) as data:
+                    hit = (data["freqs"], data["spectrum"], float(data["fs"]))
+                _SPECTRUM_CACHE[key] = hit
+                os.utime(disk)  # recently used, for the LRU size cap
+            except Exception:
+                hit = None
+        if hit is None:
+            missing.append((col, key, disk))
+        else:
+            freqs, result[col], fs = hit
+
+    if missing:
+        cols = [col for col, _, _ in missing]
+        if df is not None:
+            fs = infer_sample_rate(numeric_column(df, x_col).to_numpy())
+            ys = np.vstack([numeric_column(df, c).to_numpy() for c in cols])
+            freqs, spectra = compute_spectrum(ys, fs, method, nperseg, window)
+        elif method == "welch":
+            freqs, spectra, fs = welch_from_file(filepath, x_col, cols, nperseg, window)
+        else:
+            raise ValueError("A whole-record FFT needs the file loaded; use Welch for streamed files.")
+        for (col, key, disk), spectrum in zip(missing, spectra):
+            _SPECTRUM_CACHE[key] = (freqs, spectrum, fs)
+            result[col] = spectrum
+        if SPECTRUM_CACHE_MB > 0:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                for (col, key, disk), spectrum in zip(missing, spectra):
+                    np.savez(disk, freqs=freqs, spectrum=spectrum, fs=fs)
+                prune_cache("spectra", SPECTRUM_CACHE_MB)
+            except OSError:
+                pass  # cache is optional
+    return freqs, result, fs
+
+
+def plot_spectrum(df, x_col: str, y_cols: list, source: str = None):
+    """
+    Spectrum plot of the selected Y columns against frequency (X column must be time in seconds).
+    `source` is the file path when df is the whole, unmodified file (results are then cached per
+    file and column); with df=None the file is streamed in chunks instead of loaded (Welch only).
+    """
+    import numpy as np
+
+    print("\nSpectrum method:")
+    print("1: Welch PSD (averaged segments, default)")
+    print("2: FFT amplitude (whole record)")
+    method = "fft" if (input("Enter method (1-2): ").strip() or "1") == "2" and df is not None else "welch"
+    nperseg = 1024
+    if method == "welch":
+        seg_str = input("Segment length in samples (blank for 1024): ").strip()
+        try:
+            nperseg = max(8, int(seg_str)) if seg_str else 1024
+        except ValueError:
+            print("  Invalid length, using 1024.")
+    win_choice = input("Window (1=Hann, 2=Hamming, 3=Blackman, 4=None): ").strip() or "1"
+    window = WINDOWS.get(win_choice, "hann")
+    custom_title = input("\nEnter custom chart title: ").strip() or "Spectrum"
+
+    if source is not None:
+        freqs, spectra, fs = file_spectra(source, x_col, y_cols, method, nperseg, window, df=df)
+        spectra = [spectra[c] for c in y_cols]
+    else:
+        fs = infer_sample_rate(numeric_column(df, x_col).to_numpy())
+        ys = np.vstack([numeric_column(df, c).to_numpy() for c in y_cols])
+        freqs, spectra = compute_spectrum(ys, fs, method, nperseg, window)
+    print(f"Sample rate: {fs:.6g} Hz, resolution: {freqs[1] - freqs[0]:.6g} Hz")
+
+    plt = load_pyplot()
+    fig, ax = plt.subplots(figsize=(10, 6))
+    colors = plt.cm.tab10(np.linspace(0, 1, len(y_cols)))
+    for idx, (col, spectrum) in enumerate(zip(y_cols, spectra)):
+        peak = int(np.argmax(spectrum[1:])) + 1 if len(spectrum) > 1 else 0
+        ax.semilogy(freqs[1:], spectrum[1:], linewidth=1.5, color=colors[idx],
+                    label=f"{col} (peak {freqs[peak]:.4g} Hz)")
+    ax.set_xlabel("Frequency (Hz)", fontsize=12, fontweight='bold')
+    ax.set_ylabel("PSD (units²/Hz)" if method == "welch" else "Amplitude", fontsize=12, fontweight='bold')
+    ax.set_title(custom_title, fontsize=14, fontweight='bold', pad=20)
+    ax.grid(True, which="both", alpha=0.4, linestyle='--', linewidth=0.7)
+    ax.legend(loc="upper right", fontsize=10, framealpha=0.95, edgecolor='black', fancybox=True, shadow=True)
+    ax.set_facecolor('#f8f9fa')
+    plt.tight_layout()
+    save_and_show(plt, fig, custom_title, "spectrum")
+
+
+# ---------------------------------------------------------------------------
+# Out-of-core line plots (per-pixel envelopes of a streamed file)
+# ---------------------------------------------------------------------------
+
+# Envelope columns: about 4 per pixel of the ~8 in wide axes saved at 300 dpi; with antialiased
+# lines that matches plotting every sample to within ~1% of pixels (1 per pixel differs ~10%)
+ENVELOPE_WIDTH = 10_000
+
+
+class EnvelopeAccumulator:
+    """
+    Count / min / max / first / last of each series per pixel column of a fixed X range,
+    fed chunk by chunk with add() (rows in file order). Memory is O(width), whatever the
+    number of samples. lines() turns it into a polyline that draws the same as every sample
+    would at that width: within a pixel column only the vertical extent and the entry/exit
+    values are visible (the M4 reduction).
+    """
+
+    def __init__(self, x0: float, x1: float, width: int, series: int):
+        import numpy as np
+
+        self.x0, self.x1, self.width = x0, x1, width
+        self.scale = width / (x1 - x0) if x1 > x0 else 0.0
+        self.count = np.zeros((series, width), dtype=np.int64)
+        self.min = np.full((series, width), np.inf)
+        self.max = np.full((series, width), -np.inf)
+        self.first = np.full((series, width), np.nan)
+        self.last = np.full((series, width), np.nan)
+
+    def add(self, x, ys):
+        """Add one chunk: x (n,) and ys (series, n); NaN samples and X outside the range are skipped."""
+        import numpy as np
+
+        inside = np.isfinite(x) & (x >= self.x0) & (x <= self.x1)
+        # skipped rows (NaN/inf or outside the range X) get bin 0 so the int cast never sees them
+        bins = np.minimum(((np.where(inside, x, self.x0) - self.x0) * self.scale).astype(np.int64, copy=False),
+                          self.width - 1)
+        for k, y in enumerate(ys):
+            keep = inside & ~np.isnan(y)
+            b, v = bins[keep], y[keep]
+            if not b.size:
+                continue
+            if np.any(b[1:] < b[:-1]):  # X not increasing: group by column, keeping row order
+                order = np.argsort(b, kind="stable")
+                b, v = b[order], v[order]
+            starts = np.flatnonzero(np.r_[True, b[1:] != b[:-1]])
+            ends = np.r_[starts[1:], b.size]
+            cols = b[starts]
+            new = self.count[k, cols] == 0
+            self.first[k, cols[new]] = v[starts[new]]
+            self.last[k, cols] = v[ends - 1]
+            self.min[k, cols] = np.minimum(self.min[k, cols], np.minimum.reduceat(v, starts))
+            self.max[k, cols] = np.maximum(self.max[k, cols], np.maximum.reduceat(v, starts))
+            self.count[k, cols] += ends - starts
+
+    def lines(self, k: int):
+        """(x, y) polyline of series k: first, min, max, last at the centre of every filled column."""
+        import numpy as np
+
+        cols = np.flatnonzero(self.count[k])
+        x = np.repeat(self.x0 + (cols + 0.5) / self.scale, 4) if self.scale else np.full(4 * cols.size, self.x0)
+        y = np.column_stack([self.first[k, cols], self.min[k, cols], self.max[k, cols], self.last[k, cols]])
+        return x, y.ravel()
+
+
+def _stream_x_converter(sample: pd.Series, x_col: str):
+    """Function chunk -> X as floats (matplotlib date numbers for timestamps), and whether X is a date."""
+    fmt = infer_datetime_format(sample, x_col) if infer_column_kind(sample) in ("datetime", "float") else None
+    if fmt:
+        import matplotlib.dates as mdates
+        return (lambda chunk: mdates.date2num(datetime_column(chunk[x_col], fmt).to_numpy())), fmt
+    return (lambda chunk: numeric_column(chunk, x_col).to_numpy(dtype=float)), None
+
+
+def envelope_from_file(filepath: str, x_col: str, y_cols: list, width: int = ENVELOPE_WIDTH,
+                       x_range: tuple = None, chunk_rows: int = 500_000):
+    """
+    Stream the file in chunks and reduce each Y column to a per-pixel-column envelope.
+    Without `x_range` the X column alone is read once first to find its extent.
+    Returns (EnvelopeAccumulator, rows read, timestamp format of X or None).
+    """
+    import numpy as np
+
+    fmt_name = file_format(filepath)
+    columns = list(dict.fromkeys([x_col] + y_cols))
+    first = next(read_chunks(filepath, columns=[x_col], chunksize=SCHEMA_SAMPLE * 4, fmt=fmt_name), None)
+    if first is None or first.empty:
+        raise ValueError("The file has no data rows.")
+    to_x, x_fmt = _stream_x_converter(first[x_col], x_col)
+
+    lo, hi = x_range if x_range else (None, None)
+    if lo is None or hi is None:
+        found_lo, found_hi = np.inf, -np.inf
+        for chunk in read_chunks(filepath, columns=[x_col], chunksize=chunk_rows, fmt=fmt_name):
+            x = to_x(chunk)
+            x = x[np.isfinite(x)]
+            if x.size:
+                found_lo, found_hi = min(found_lo, x.min()), max(found_hi, x.max())
+        if not np.isfinite(found_lo):
+            raise ValueError(f"No numeric values in X column {x_col}.")
+        lo = found_lo if lo is None else lo
+        hi = found_hi if hi is None else hi
+
+    env = EnvelopeAccumulator(lo, hi, width, len(y_cols))
+    rows = 0
+    for chunk in read_chunks(filepath, columns=columns, chunksize=chunk_rows, fmt=fmt_name):
+        x = to_x(chunk)
+        env.add(x, np.vstack([numeric_column(chunk, c).to_numpy(dtype=float) for c in y_cols]))
+        rows += len(chunk)
+        print(f"\r  {rows:,} rows read", end="", flush=True)
+    print()
+    return env, rows, x_fmt
+
+
+def plot_envelope(filepath: str, x_col: str, y_cols: list):
+    """
+    Line plot of a file too large to load: the file is streamed and every Y column is drawn
+    from its per-pixel envelope (X should increase with the row number, e.g. time).
+    """
+    import numpy as np
+
+    print("\nX range (blank = whole file; dates for timestamp columns)")
+    bounds = []
+    for side in ("from", "to"):
+        text = input(f"  X {side}: ").strip()
+        bounds.append(text or None)
+    width_str = input(f"Envelope width in pixel columns (blank for {ENVELOPE_WIDTH}): ").strip()
+    try:
+        width = max(10, int(width_str)) if width_str else ENVELOPE_WIDTH
+    except ValueError:
+        print(f"  Invalid width, using {ENVELOPE_WIDTH}.")
+        width = ENVELOPE_WIDTH
+    custom_title = input("\nEnter custom chart title: ").strip() or "Laboratory Data Analysis"
+    targets = ask_save(custom_title, "envelope")
+
+    x_range = None
+    if any(bounds):
+        head = next(read_chunks(filepath, columns=[x_col], chunksize=SCHEMA_SAMPLE * 4))
+        fmt = _stream_x_converter(head[x_col], x_col)[1]
+        if fmt:
+            import matplotlib.dates as mdates
+            x_range = tuple(None if b is None else float(mdates.date2num(parse_timestamp(b, fmt).to_datetime64()))
+                            for b in bounds)
+        else:
+            x_range = tuple(None if b is None else float(b) for b in bounds)
+
+    env, rows, x_fmt = envelope_from_file(filepath, x_col, y_cols, width, x_range)
+    print(f"Envelope of {rows:,} rows in {width} pixel columns.")
+
+    plt = load_pyplot()
+    fig, ax = plt.subplots(figsize=(10, 6))
+    colors = plt.cm.tab10(np.linspace(0, 1, len(y_cols)))
+    for idx, col in enumerate(y_cols):
+        x, y = env.lines(idx)
+        ax.plot(x, y, linewidth=1.0, color=colors[idx], label=col)
+    ax.set_xlim(env.x0, env.x1)
+    if x_fmt:
+        import matplotlib.dates as mdates
+        locator = mdates.AutoDateLocator()
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+    ax.set_xlabel(x_col, fontsize=12, fontweight='bold')
+    ax.set_ylabel(", ".join(y_cols), fontsize=12, fontweight='bold')
+    ax.set_title(custom_title, fontsize=14, fontweight='bold', pad=20)
+    ax.grid(True, alpha=0.4, linestyle='--', linewidth=0.7)
+    ax.legend(loc="upper left", fontsize=10, framealpha=0.95, edgecolor='black', fancybox=True, shadow=True)
+    ax.set_facecolor('#f8f9fa')
+    plt.tight_layout()
+    save_and_show(plt, fig, custom_title, "envelope", targets=targets)
+
+
+# ---------------------------------------------------------------------------
+# Live tail of a growing CSV
+# ---------------------------------------------------------------------------
+
+class TailBuffer:
+    """
+    Bounded storage for a growing series: the newest `capacity` rows at full resolution in a
+    ring buffer, older rows kept as a decimated history (every `stride`-th row, stride doubles
+    whenever the history fills). Memory and per-frame cost stay constant however long the run.
+    """
+
+    def __init__(self, columns: int, capacity: int):
+        import numpy as np
+
+        self.capacity = capacity
+        self.ring = np.empty((capacity, columns))
+        self.count = 0            # rows ever appended
+        self.history = np.empty((0, columns))
+        self.stride = 1
+        self._evicted = 0         # rows moved out of the ring so far
+
+    def append(self, rows):
+        import numpy as np
+
+        if len(rows) > self.capacity:
+            # Larger blocks go in ring-sized pieces, so their leading rows reach the history too
+            for start in range(0, len(rows), self.capacity):
+                self.append(rows[start:start + self.capacity])
+            return
+        n = len(rows)
+        if n == 0:
+            return
+        # Rows about to be overwritten go to the decimated history first
+        overflow = min(n, self.count + n - self.capacity)
+        if overflow > 0:
+            old = self._ordered()[:overflow]
+            keep = (self._evicted + np.arange(len(old))) % self.stride == 0
+            self._evicted += len(old)
+            self.history = np.vstack([self.history, old[keep]])
+            if len(self.history) > self.capacity:
+                self.history = self.history[::2]
+                self.stride *= 2
+        pos = (self.count + np.arange(n)) % self.capacity
+        self.ring[pos] = rows
+        self.count += n
+
+    def _ordered(self):
+        import numpy as np
+
+        if self.count <= self.capacity:
+            return self.ring[:self.count]
+        start = self.count % self.capacity
+        return np.vstack([self.ring[start:], self.ring[:start]])
+
+    def data(self):
+        """All kept rows, oldest first (decimated history followed by the full-resolution ring)."""
+        import numpy as np
+
+        return np.vstack([self.history, self._ordered()])
+
+
+def _merge_stats(stats: dict, col: str, values):
+    """Update running count/mean/M2/min/max of a column with a new block of values (Chan et al.)."""
+    import numpy as np
+
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return
+    n_b, mean_b = values.size, float(values.mean())
+    m2_b = float(((values - mean_b) ** 2).sum())
+    st = stats.setdefault(col, {"n": 0, "mean": 0.0, "m2": 0.0, "min": float("inf"), "max": float("-inf")})
+    n_a = st["n"]
+    n = n_a + n_b
+    delta = mean_b - st["mean"]
+    st["mean"] += delta * n_b / n
+    st["m2"] += m2_b + delta ** 2 * n_a * n_b / n
+    st["n"] = n
+    st["min"] = min(st["min"], float(values.min()))
+    st["max"] = max(st["max"], float(values.max()))
+
+
+WATCH_BLOCK = 1 << 26  # bytes parsed per block in watch mode (bounds memory on the first catch-up)
+
+
+def watch_csv(filepath: str, refresh_hz: float = 4.0, capacity: int = 200_000):
+    """
+    Live plot of a CSV that an instrument is still writing. Only bytes appended since the last
+    refresh are parsed (complete lines only), statistics are updated incrementally, and the plot
+    artists are updated in place with blitting. If the file shrinks it is re-read from the start.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if is_columnar(filepath) or is_compressed(filepath):
+        raise ValueError("Watch mode follows a CSV that is being written; typed and compressed files are complete already.")
+    head = peek_csv(filepath)
+    delim = sniff_delimiter(filepath)
+    columns = list(head.columns)
+    x_col, y_cols = choose_axes(head)
+    cols = [x_col] + y_cols
+    buf = TailBuffer(len(cols), capacity)
+    stats = {}
+    state = {"offset": None}
+
+    def read_new():
+        """Parse complete lines appended since the last call; returns the number of new rows."""
+        size = os.path.getsize(filepath)
+        if state["offset"] is not None and size < state["offset"]:
+            print("\nFile shrank (rewritten?) - reading it again from the start.")
+            state["offset"] = None
+            buf.__init__(len(cols), capacity)
+            stats.clear()
+        added = 0
+        with open(filepath, "rb") as fh:
+            if state["offset"] is None:
+                fh.readline()  # header
+                state["offset"] = fh.tell()
+            while True:
+                fh.seek(state["offset"])
+                data = fh.read(WATCH_BLOCK)
+                cut = data.rfind(b"\n") + 1  # a partially written last line waits for the next refresh
+                if cut == 0:
+                    return added
+                state["offset"] += cut
+                new = pd.read_csv(io.BytesIO(data[:cut]), sep=delim, header=None, names=columns)
+                block = np.column_stack([numeric_column(new, c).to_numpy() for c in cols])
+                for i, col in enumerate(y_cols, start=1):
+                    _merge_stats(stats, col, block[:, i])
+                buf.append(block)
+                added += len(block)
+
+    def stats_text():
+        lines = [f"Rows: {buf.count}"]
+        for col in y_cols:
+            st = stats.get(col)
+            if st:
+                std = (st["m2"] / (st["n"] - 1)) ** 0.5 if st["n"] > 1 else 0.0
+                lines.append(f"{col}: min {st['min']:.4g}  max {st['max']:.4g}  mean {st['mean']:.4g}  std {std:.4g}")
+        return "\n".join(lines)
+
+    read_new()
+    print(f"\nWatching {filepath} ({refresh_hz:g} updates/s, Ctrl+C to stop)")
+
+    if HEADLESS:
+        import time
+        try:
+            while True:
+                if read_new():
+                    print(stats_text().replace("\n", " | "))
+                time.sleep(1.0 / refresh_hz)
+        except KeyboardInterrupt:
+            print("\nStopped.")
+        return
+
+    plt = load_pyplot()
+    from matplotlib.animation import FuncAnimation
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    colors = plt.cm.tab10(np.linspace(0, 1, len(y_cols)))
+    lines = [ax.plot([], [], linewidth=1.5, color=colors[i], label=col, animated=True)[0]
+             for i, col in enumerate(y_cols)]
+    text = ax.text(0.02, 0.02, "", transform=ax.transAxes, fontsize=9, family="monospace", animated=True,
+                   bbox=dict(facecolor='white', alpha=0.8, edgecolor='black'))
+    ax.set_xlabel(x_col, fontsize=12, fontweight='bold')
+    ax.set_ylabel(", ".join(y_cols), fontsize=12, fontweight='bold')
+    ax.set_title(f"Live: {os.path.basename(filepath)}", fontsize=14, fontweight='bold', pad=20)
+    ax.grid(True, alpha=0.4, linestyle='--', linewidth=0.7)
+    ax.legend(loc="upper left", fontsize=10)
+
+    def update(_frame):
+        read_new()
+        data = buf.data()
+        for i, line in enumerate(lines, start=1):
+            line.set_data(data[:, 0], data[:, i])
+        text.set_text(stats_text())
+        if len(data):
+            # Blitting only redraws the artists; rescale (full redraw) only when data leaves the view
+            x0, x1 = ax.get_xlim()
+            y0, y1 = ax.get_ylim()
+            xs, ys = data[:, 0], data[:, 1:]
+            if (np.nanmin(xs) < x0 or np.nanmax(xs) > x1 or np.nanmin(ys) < y0 or np.nanmax(ys) > y1):
+                ax.relim()
+                ax.autoscale_view()
+                span = np.nanmax(xs) - np.nanmin(xs)
+                ax.set_xlim(np.nanmin(xs), np.nanmax(xs) + 0.1 * span if span > 0 else np.nanmax(xs) + 1)
+                fig.canvas.draw_idle()
+        return lines + [text]
+
+    anim = FuncAnimation(fig, update, interval=1000.0 / refresh_hz, blit=True, cache_frame_data=False)
+    plt.show()
+    return anim
+
+
+# ---------------------------------------------------------------------------
+# Multi-file overlay
+# ---------------------------------------------------------------------------
+
+def load_csv_files(filepaths: list) -> list:
+    """Load and index several CSV files in parallel. Returns [(indexed_df, numeric_cols), ...] in order."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=min(len(filepaths), os.cpu_count() or 1)) as pool:
+        return list(pool.map(_load_and_index, filepaths))
+
+
+def first_crossing(x, y, level: float, rising: bool = True):
+    """
+    X position of the first crossing of `level` (linearly interpolated), or None.
+    Found with a sign-change mask, no Python loop over samples.
+    """
+    import numpy as np
+
+    above = y >= level
+    if rising:
+        edges = np.flatnonzero(~above[:-1] & above[1:])
+    else:
+        edges = np.flatnonzero(above[:-1] & ~above[1:])
+    if edges.size == 0:
+        return None
+    i = edges[0]
+    dy = y[i + 1] - y[i]
+    frac = (level - y[i]) / dy if dy != 0 else 0.0
+    return x[i] + frac * (x[i + 1] - x[i])
+
+
+def resample_to_grid(x, y, grid, method: str = "linear"):
+    """
+    Resample samples (x, y) onto `grid` in one vectorized call.
+    method: 'linear' (np.interp) or 'nearest' (np.searchsorted). Grid points outside
+    the data's X range become NaN, so series with different spans line up cleanly.
+    """
+    import numpy as np
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    ok = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[ok], y[ok]
+    if x.size == 0:
+        return np.full(len(grid), np.nan)
+    if np.any(np.diff(x) < 0):
+        order = np.argsort(x, kind="stable")
+        x, y = x[order], y[order]
+
+    if method == "nearest":
+        idx = np.clip(np.searchsorted(x, grid), 1, max(1, x.size - 1))
+        left = x[idx - 1]
+        right = x[np.minimum(idx, x.size - 1)]
+        idx = np.where(np.abs(grid - left) <= np.abs(right - grid), idx - 1, np.minimum(idx, x.size - 1))
+        out = y[idx]
+    else:
+        out = np.interp(grid, x, y)
+    out = np.asarray(out, dtype=float)
+    out[(grid < x[0]) | (grid > x[-1])] = np.nan
+    return out
+
+
+def overlay_files(folder_path: str):
+    """
+    Overlay the same column(s) from several files on one plot.
+    Files are loaded in parallel, X axes optionally shifted (manual offset or trigger alignment),
+    all series resampled onto one shared X grid, plotted together and exported as one CSV.
+    """
+    import numpy as np
+    import pandas as pd
+
+    filepaths = choose_csv_file(folder_path, multiple=True)
+    names = [os.path.basename(p) for p in filepaths]
+    print(f"\nLoading {len(filepaths)} files in parallel...")
+    try:
+        loaded = load_csv_files(filepaths)
+    except Exception as e:
+        print(f"Loading failed: {e}")
+        return
+    frames = [df for df, _ in loaded]
+
+    # Columns are chosen from the first file; other files use the same name, or the same position
+    x_col, y_cols = choose_axes(frames[0])
+    x_idx = list(frames[0].columns).index(x_col)
+    y_idx = [list(frames[0].columns).index(c) for c in y_cols]
+
+    def column_for(df, name, idx):
+        if name in df.columns:
+            return name
+        if idx < len(df.columns):
+            return df.columns[idx]
+        return None
+
+    # X alignment
+    print("\n" + "=" * 50)
+    print("X alignment:")
+    print("1: None (default)")
+    print("2: Manual time offset per file")
+    print("3: Trigger (shift so each file's first level crossing is at X = 0)")
+    align_choice = input("Enter choice (1-3): ").strip() or "1"
+
+    series = []  # (label, x, y)
+    offsets = []
+    trigger = None
+    if align_choice == "3":
+        level_str = input(f"Trigger level (on {y_cols[0]}): ").strip()
+        edge = input("Edge? (1=rising, 2=falling): ").strip() or "1"
+        try:
+            trigger = (float(level_str), edge != "2")
+        except ValueError:
+            print("Invalid level, no alignment applied.")
+
+    for df, name in zip(frames, names):
+        xc = column_for(df, x_col, x_idx)
+        x = numeric_column(df, xc).to_numpy() if xc is not None else None
+        if x is None or np.isnan(x).all():
+            print(f"  {name}: no numeric X column '{x_col}', skipped")
+            offsets.append(None)
+            continue
+        offset = 0.0
+        if align_choice == "2":
+            off_str = input(f"  Offset to add to X of {name} (blank for 0): ").strip()
+            try:
+                offset = float(off_str) if off_str else 0.0
+            except ValueError:
+                print("  Invalid offset, using 0.")
+        elif trigger is not None:
+            tc = column_for(df, y_cols[0], y_idx[0])
+            t = first_crossing(x, numeric_column(df, tc).to_numpy(), *trigger) if tc is not None else None
+            if t is None:
+                print(f"  {name}: trigger level never crossed, not shifted")
             else:
-                custom_labels[y_col] = y_col
+                offset = -t
+        offsets.append(offset)
+        for ycol, yi in zip(y_cols, y_idx):
+            yc = column_for(df, ycol, yi)
+            if yc is None:
+                print(f"  {name}: no column matching '{ycol}', skipped")
+                continue
+            series.append((f"{name}: {yc}", x + offset, numeric_column(df, yc).to_numpy()))
+
+    if not series:
+        print("Nothing to overlay.")
+        return
+
+    # Shared grid: overlap of all X spans, as dense as the finest-sampled file in it
+    lo = max(np.nanmin(x) for _, x, _ in series)
+    hi = min(np.nanmax(x) for _, x, _ in series)
+    if not lo < hi:
+        print("X ranges don't overlap; using the union of all ranges instead.")
+        lo = min(np.nanmin(x) for _, x, _ in series)
+        hi = max(np.nanmax(x) for _, x, _ in series)
+    points = max(int(np.count_nonzero((x >= lo) & (x <= hi))) for _, x, _ in series)
+    grid = np.linspace(lo, hi, max(points, 2))
+
+    method_choice = input("Resampling? (1=Linear interpolation, 2=Nearest sample): ").strip() or "1"
+    method = "nearest" if method_choice == "2" else "linear"
+    combined = pd.DataFrame({x_col: grid})
+    for label, x, y in series:
+        combined[label] = resample_to_grid(x, y, grid, method)
+    print(f"Resampled {len(series)} series onto {len(grid)} points ({method}) between {lo:.6g} and {hi:.6g}.")
+
+    custom_title = input("\nEnter custom chart title: ").strip() or "Overlay"
+
+    plt = load_pyplot()
+    fig, ax = plt.subplots(figsize=(10, 6))
+    colors = plt.cm.tab10(np.linspace(0, 1, max(len(series), 1)))
+    for idx, (label, _, _) in enumerate(series):
+        ax.plot(grid, combined[label].to_numpy(), linewidth=1.5, label=label, color=colors[idx])
+    ax.set_xlabel(x_col + (" (aligned)" if any(offsets) else ""), fontsize=12, fontweight='bold')
+    ax.set_ylabel(", ".join(y_cols), fontsize=12, fontweight='bold')
+    ax.set_title(custom_title, fontsize=14, fontweight='bold', pad=20)
+    ax.grid(True, alpha=0.4, linestyle='--', linewidth=0.7)
+    ax.legend(loc="upper left", fontsize=10, framealpha=0.95, edgecolor='black', fancybox=True, shadow=True)
+    ax.set_facecolor('#f8f9fa')
+    plt.tight_layout()
+
+    print("=" * 37)
+    save_choice = input("Save overlay? (0=none, 1=PNG + CSV, 2=PDF + CSV): ").strip() or "1"
+    if save_choice in ["1", "2"]:
+        saved_graphs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Saved Graphs")
+        os.makedirs(saved_graphs_dir, exist_ok=True)
+        base_name = custom_title.replace(" ", ".").replace("/", "-").replace("\\", "-")
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        base = os.path.join(saved_graphs_dir, f"Overlay.{base_name}_{timestamp}")
+        ext = ".png" if save_choice == "1" else ".pdf"
+        plt.savefig(base + ext, dpi=300, bbox_inches='tight', facecolor='white')
+        combined.to_csv(base + ".csv", index=False)
+        print(f"Plot saved to: {base + ext}")
+        print(f"Combined data saved to: {base + '.csv'}")
+
+    if HEADLESS:
+        plt.close(fig)
     else:
-        custom_labels = {y_col: y_col for y_col in y_cols}
-    
-    # Determine legend position (for later use)
-    legend_pos = "upper left"  # default
-    if legend_choice == "2":  # Custom position
-        positions = {
-            "1": "upper left", "2": "upper center", "3": "upper right",
-            "4": "center left", "5": "center", "6": "center right",
-            "7": "lower left", "8": "lower center", "9": "lower right",
-            "0": "upper left"
-        }
-        print("\nLegend positions:")
-        for k, v in positions.items():
-            print(f"{k}: {v}")
-        pos_choice = input("Enter position (0-9): ").strip() or "0"
-        legend_pos = positions.get(pos_choice, "upper left")
-    
-    # Convert X column to numeric using smart parsing; if X has no numeric values, treat as categorical
+        plt.show()
+
+
+# ---------------------------------------------------------------------------
+# Frequency response (Bode) of a batch of sweep files
+# ---------------------------------------------------------------------------
+
+BODE_COLUMNS = {"freq": ("freq", "hz"), "mag": ("mag", "db", "gain"), "phase": ("phase", "deg")}
+
+
+def find_bode_columns(df: pd.DataFrame) -> dict:
+    """{'freq', 'mag', 'phase'} -> column name, matched by name (e.g. 'Frequency(Hz)'); missing keys if not found."""
+    found = {}
+    for key, words in BODE_COLUMNS.items():
+        for col in df.columns:
+            if col not in found.values() and any(w in str(col).lower() for w in words):
+                found[key] = col
+                break
+    return found
+
+
+def _log_crossing(f, y, level: float, rising: bool = False):
+    """Frequency of the first crossing of `level`, interpolated on a log-frequency axis (or None)."""
+    import numpy as np
+
+    logf = first_crossing(np.log10(f), y, level, rising)
+    return None if logf is None else float(10 ** logf)
+
+
+def bode_metrics(f, mag_db, phase_deg) -> dict:
+    """
+    Sweep figures of merit (f sorted ascending, NaN-free):
+    low-frequency gain, -3 dB bandwidth (first point 3 dB below the lowest-frequency gain),
+    unity-gain crossover (first falling 0 dB crossing), the unwrapped phase there and the
+    phase margin 180 - lag, the lag being measured from the low-frequency phase rounded to a
+    multiple of 180° (0° for non-inverting stages, ±180° for inverting ones and integrators).
+    Values that don't occur are None.
+    """
+    import numpy as np
+
+    gain0 = float(mag_db[0])
+    phase_ref = 180.0 * round(float(phase_deg[0]) / 180.0)
+    f3db = _log_crossing(f, mag_db, gain0 - 3.0)
+    fc = _log_crossing(f, mag_db, 0.0) if gain0 > 0 else None
+    phase_fc = margin = None
+    if fc is not None:
+        phase_fc = float(np.interp(np.log10(fc), np.log10(f), phase_deg))
+        margin = 180.0 - (phase_ref - phase_fc)
+    return {"gain_db": gain0, "f_3db": f3db, "f_unity": fc, "phase_ref": phase_ref, "phase_unity": phase_fc,
+            "phase_margin": margin}
+
+
+def bode_sweep(df: pd.DataFrame, cols: dict):
+    """(f, magnitude dB, unwrapped phase deg) of one sweep, sorted by frequency, invalid rows dropped."""
+    import numpy as np
+
+    f, mag, phase = (numeric_column(df, cols[k]).to_numpy(dtype=float) for k in ("freq", "mag", "phase"))
+    keep = np.isfinite(f) & np.isfinite(mag) & np.isfinite(phase) & (f > 0)
+    order = np.argsort(f[keep], kind="stable")
+    f, mag, phase = f[keep][order], mag[keep][order], phase[keep][order]
+    return f, mag, np.unwrap(phase, period=360.0)
+
+
+def format_bode_row(name: str, m: dict) -> list:
+    def fmt(value, unit=""):
+        return "-" if value is None else f"{value:.4g}{unit}"
+    return [name, fmt(m["gain_db"], " dB"), fmt(m["f_3db"], " Hz"), fmt(m["f_unity"], " Hz"),
+            fmt(m["phase_ref"], "°"), fmt(m["phase_unity"], "°"), fmt(m["phase_margin"], "°")]
+
+
+def bode_files(folder_path: str):
+    """
+    Frequency-response mode: load many sweep files (Frequency, Magnitude dB, Phase deg) in
+    parallel, unwrap phase, find -3 dB bandwidth, unity-gain crossover and phase margin,
+    overlay all sweeps on Bode magnitude/phase panels and print (and save) a summary table.
+    """
+    import numpy as np
+    import pandas as pd
+
+    filepaths = choose_csv_file(folder_path, multiple=True, purpose="analyse", min_files=1)
+    names = [os.path.basename(p) for p in filepaths]
+    print(f"\nLoading {len(filepaths)} files in parallel...")
     try:
-        x_parsed = df[x_col].apply(parse_numeric_string)
+        loaded = load_csv_files(filepaths)
     except Exception as e:
-        raise ValueError(f"Could not convert X column to numeric: {e}")
-
-    categorical_x = False
-    x_labels = None
-    if x_parsed.dropna().empty:
-        # No numeric X values -> categorical axis (use string labels)
-        categorical_x = True
-        x_labels = df[x_col].astype(str).tolist()
-        x = pd.Series(range(len(x_labels)))
-    else:
-        x = x_parsed
+        print(f"Loading failed: {e}")
+        return
 
-    # Create figure with main axis
-    fig, ax1 = plt.subplots(figsize=(10, 6))
-    ax2 = None
-    
-    # Color palette for each Y series
-    colors = plt.cm.tab10(np.linspace(0, 1, len(y_cols)))
+    cols = find_bode_columns(loaded[0][0])
+    if len(cols) < 3:
+        print("Frequency / magnitude / phase columns not recognised; choose them by number.")
+        frame = loaded[0][0]
+        for i, col in enumerate(frame.columns):
+            print(f"{i}: {col}")
+        try:
+            picks = [int(input(f"Column for {what}: ").strip())
+                     for what in ("frequency (Hz)", "magnitude (dB)", "phase (degrees)")]
+            cols = dict(zip(("freq", "mag", "phase"), (frame.columns[i] for i in picks)))
+        except (ValueError, IndexError):
+            print("Invalid column number.")
+            return
+    print(f"Using {cols['freq']}, {cols['mag']}, {cols['phase']}")
+    positions = {k: list(loaded[0][0].columns).index(c) for k, c in cols.items()}
 
-    # Plot each Y column
-    for idx, y_col in enumerate(y_cols):
+    sweeps, rows = [], []
+    for (df, _), name in zip(loaded, names):
+        # Same column names as the first file, otherwise the same positions
+        file_cols = {k: c if c in df.columns else df.columns[positions[k]] for k, c in cols.items()}
         try:
-            # Convert Y to numeric using smart parsing; drop NaN values
-            y = df[y_col].apply(parse_numeric_string)
-        except Exception as e:
-            print(f"Skipping column {y_col}: could not convert to numeric. Error: {e}")
+            f, mag, phase = bode_sweep(df, file_cols)
+        except (IndexError, KeyError):
+            print(f"  {name}: columns not found, skipped")
             continue
-        
-        # Select axis: use ax2 (right) for columns in right_axis_cols, otherwise use ax1 (left)
-        current_ax = ax1
-        if dual_axis and y_col in right_axis_cols:
-            if ax2 is None:
-                ax2 = ax1.twinx()  # Create second Y-axis sharing same X-axis
-            current_ax = ax2
+        if f.size < 2:
+            print(f"  {name}: fewer than 2 valid points, skipped")
+            continue
+        metrics = bode_metrics(f, mag, phase)
+        sweeps.append((name, f, mag, phase, metrics))
+        rows.append(format_bode_row(name, metrics))
+    if not sweeps:
+        print("No usable sweeps.")
+        return
 
-        # Plot based on type
-        if plot_type == "line":
-            # Line plot
-            current_ax.plot(x, y, marker="o", markersize=6, linestyle="-", linewidth=2.5, 
-                           label=custom_labels[y_col], color=colors[idx])
-            
-            # Add trend line
-            if trend_choice == "1":
-                # Linear trend: align numeric x and y values and fit slope/intercept
-                valid_xy = pd.concat([x, y], axis=1).apply(pd.to_numeric, errors="coerce").dropna()
-                if len(valid_xy) > 1:
-                    xv = valid_xy.iloc[:, 0].values
-                    yv = valid_xy.iloc[:, 1].values
-                    slope, intercept = np.polyfit(xv, yv, 1)
-                    p = np.poly1d([slope, intercept])
-                    x_trend = np.linspace(xv.min(), xv.max(), 100)
-                    current_ax.plot(x_trend, p(x_trend), "--", linewidth=2, alpha=0.8,
-                                   color=colors[idx], label=f"{y_col} trend")
-                    txt = f"Slope: {slope:.3g}\nIntercept: {intercept:.3g}"
-                    y_offset = 0.95 - (idx * 0.08)
-                    current_ax.text(0.02, y_offset, txt, transform=current_ax.transAxes,
-                                    color=colors[idx], fontsize=10, fontweight='bold',
-                                    bbox=dict(facecolor='white', alpha=0.75, edgecolor=colors[idx], linewidth=1.5))
-            elif trend_choice == "2":
-                # Polynomial (degree 2) trend: align and fit using numeric X values
-                valid_xy = pd.concat([x, y], axis=1).apply(pd.to_numeric, errors="coerce").dropna()
-                if len(valid_xy) > 2:
-                    xv = valid_xy.iloc[:, 0].values
-                    yv = valid_xy.iloc[:, 1].values
-                    z = np.polyfit(xv, yv, 2)
-                    p = np.poly1d(z)
-                    x_trend = np.linspace(xv.min(), xv.max(), 100)
-                    current_ax.plot(x_trend, p(x_trend), "--", linewidth=2, alpha=0.8,
-                                   color=colors[idx], label=f"{y_col} poly fit")
-                
-        elif plot_type == "scatter":
-            # Scatter plot
-            current_ax.scatter(x, y, s=80, marker='x', color=colors[idx], label=custom_labels[y_col], alpha=1.0, linewidths=2)
-            
-            if trend_choice == "1":
-                # Linear trend for scatter: align numeric x and y values and fit
-                valid_xy = pd.concat([x, y], axis=1).apply(pd.to_numeric, errors="coerce").dropna()
-                if len(valid_xy) > 1:
-                    xv = valid_xy.iloc[:, 0].values
-                    yv = valid_xy.iloc[:, 1].values
-                    slope, intercept = np.polyfit(xv, yv, 1)
-                    p = np.poly1d([slope, intercept])
-                    x_trend = np.linspace(xv.min(), xv.max(), 100)
-                    current_ax.plot(x_trend, p(x_trend), "--", linewidth=2, alpha=0.8,
-                                   color=colors[idx], label=f"{y_col} trend")
-                    txt = f"Slope: {slope:.3g}\nIntercept: {intercept:.3g}"
-                    y_offset = 0.95 - (idx * 0.08)
-                    current_ax.text(0.02, y_offset, txt, transform=current_ax.transAxes,
-                                    color=colors[idx], fontsize=10, fontweight='bold',
-                                    bbox=dict(facecolor='white', alpha=0.75, edgecolor=colors[idx], linewidth=1.5))
-            elif trend_choice == "2":
-                # Polynomial (degree 2) fit for scatter: use numeric X values
-                valid_xy = pd.concat([x, y], axis=1).apply(pd.to_numeric, errors="coerce").dropna()
-                if len(valid_xy) > 2:
-                    xv = valid_xy.iloc[:, 0].values
-                    yv = valid_xy.iloc[:, 1].values
-                    z = np.polyfit(xv, yv, 2)
-                    p = np.poly1d(z)
-                    x_trend = np.linspace(xv.min(), xv.max(), 100)
-                    current_ax.plot(x_trend, p(x_trend), "--", linewidth=2, alpha=0.8,
-                                   color=colors[idx], label=f"{y_col} poly fit")
-                
-        elif plot_type == "bar":
-            # Bar chart: support categorical X and numeric X, with value annotations
-            # Ensure Y is numeric
-            y_vals = pd.to_numeric(y, errors='coerce')
-            n = len(y_vals)
-            if categorical_x:
-                # Grouped bars: offset each series horizontally
-                base_pos = np.arange(n)
-                num_series = len(y_cols)
-                width = 0.8 / max(1, num_series)
-                # compute positions for this series
-                pos = base_pos - 0.4 + idx * width + width / 2
-                bars = current_ax.bar(pos, y_vals, width=width, label=custom_labels[y_col], alpha=0.85, color=colors[idx], edgecolor='black', linewidth=1.0)
-                # set xticks on main axis (ax1)
-                if current_ax is ax1:
-                    ax1.set_xticks(base_pos)
-                    ax1.set_xticklabels(x_labels, rotation=45, ha='right')
-                # annotate values above bars
-                for rect, val in zip(bars, y_vals):
-                    if not np.isnan(val):
-                        current_ax.text(rect.get_x() + rect.get_width()/2, rect.get_height(), f"{val:.3g}",
-                                        ha='center', va='bottom', fontsize=9, color='black')
-            else:
-                # Numeric X: plot using X values directly
-                bars = current_ax.bar(x, y_vals, label=custom_labels[y_col], alpha=0.75, color=colors[idx], edgecolor='black', linewidth=1.2)
-                current_ax.set_xticks(x)
-                # annotate values above bars
-                for rect, val in zip(bars, y_vals):
-                    if not np.isnan(val):
-                        current_ax.text(rect.get_x() + rect.get_width()/2, rect.get_height(), f"{val:.3g}",
-                                        ha='center', va='bottom', fontsize=9, color='black')
-            
-        elif plot_type == "histogram":
-            # Histogram: distribution of Y values (bins=20 intervals) with edge color
-            current_ax.hist(y.dropna(), bins=20, label=custom_labels[y_col], alpha=0.7, color=colors[idx], edgecolor='black', linewidth=1)
+    headers = ["File", "Gain(LF)", "f -3dB", "f unity", "Phase(LF)", "Phase @ unity", "Phase margin"]
+    widths = [max(len(h), *(len(r[i]) for r in rows)) for i, h in enumerate(headers)]
+    print("\n" + "  ".join(h.ljust(w) for h, w in zip(headers, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in rows:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
 
-    # Set axis labels and title with larger, bold fonts
-    ax1.set_xlabel(x_col, fontsize=12, fontweight='bold')
-    if not dual_axis:
-        # Single Y-axis: label lists all Y columns
-        ax1.set_ylabel(", ".join(y_cols), fontsize=12, fontweight='bold')
-    else:
-        # Dual Y-axis: left axis shows columns NOT in right_axis_cols, right axis shows right_axis_cols
-        left_cols = [c for c in y_cols if c not in right_axis_cols]
-        left_label = ", ".join(left_cols) if left_cols else ""
-        right_label = ", ".join(right_axis_cols) if right_axis_cols else ""
-        
-        if left_label:
-            # Use neutral color for left axis label to avoid confusion
-            ax1.set_ylabel(left_label, fontsize=12, fontweight='bold', color='black')
-            ax1.tick_params(axis='y', labelcolor='black', labelsize=10)
-        
-        if ax2 and right_label:
-            # Use neutral color for right axis label to avoid confusion
-            ax2.set_ylabel(right_label, fontsize=12, fontweight='bold', color='black')
-            ax2.tick_params(axis='y', labelcolor='black', labelsize=10)
-        
-        # Apply custom Y-axis ranges if specified (for all left/right columns)
-        for y_col in left_cols:
-            if y_col in y_axis_ranges:
-                y_min, y_max = y_axis_ranges[y_col]
-                if y_min is not None or y_max is not None:
-                    ax1.set_ylim(y_min, y_max)
-                    break  # Apply first valid range to left axis
-        
-        if ax2:
-            for y_col in right_axis_cols:
-                if y_col in y_axis_ranges:
-                    y_min, y_max = y_axis_ranges[y_col]
-                    if y_min is not None or y_max is not None:
-                        ax2.set_ylim(y_min, y_max)
-                        break  # Apply first valid range to right axis
-    
-    # If X is categorical, apply labels for all plot types
-    if 'categorical_x' in locals() and categorical_x and x_labels:
-        ax1.set_xticks(np.arange(len(x_labels)))
-        ax1.set_xticklabels(x_labels, rotation=45, ha='right')
+    custom_title = input("\nEnter custom chart title: ").strip() or "Frequency Response"
+    targets = ask_save(custom_title, "bode")
 
-    # Apply axis scaling (logarithmic, semi-log, etc.)
-    if scale_type == "loglog":
-        ax1.set_xscale('log')
-        ax1.set_yscale('log')
-        if ax2:
-            ax2.set_yscale('log')
-    elif scale_type == "semilogx":
-        ax1.set_xscale('log')
-    elif scale_type == "semilogy":
-        ax1.set_yscale('log')
-        if ax2:
-            ax2.set_yscale('log')
+    plt = load_pyplot()
+    fig, (ax_mag, ax_ph) = plt.subplots(2, 1, figsize=(10, 8), sharex=True)
+    cmap = plt.cm.tab10 if len(sweeps) <= 10 else plt.cm.viridis
+    colors = cmap(np.linspace(0, 1, len(sweeps))) if len(sweeps) > 1 else cmap([0.0])
+    size = 7 if len(sweeps) <= 10 else 3
+    for (name, f, mag, phase, m), color in zip(sweeps, colors):
+        ax_mag.semilogx(f, mag, linewidth=1.5, color=color, label=name)
+        ax_ph.semilogx(f, phase, linewidth=1.5, color=color)
+        if m["f_3db"] is not None:
+            ax_mag.plot(m["f_3db"], m["gain_db"] - 3.0, "v", color=color, markersize=size)
+        if m["f_unity"] is not None:
+            ax_mag.plot(m["f_unity"], 0.0, "o", color=color, markersize=size)
+            ax_ph.plot(m["f_unity"], m["phase_unity"], "o", color=color, markersize=size)
+    ax_mag.axhline(0.0, color="gray", linewidth=0.8, linestyle=":")
+    ax_mag.set_ylabel("Magnitude (dB)", fontsize=12, fontweight='bold')
+    ax_ph.set_ylabel("Phase (deg, unwrapped)", fontsize=12, fontweight='bold')
+    ax_ph.set_xlabel("Frequency (Hz)", fontsize=12, fontweight='bold')
+    ax_mag.set_title(custom_title, fontsize=14, fontweight='bold', pad=20)
+    for ax in (ax_mag, ax_ph):
+        ax.grid(True, which="both", alpha=0.4, linestyle='--', linewidth=0.7)
+        ax.set_facecolor('#f8f9fa')
+    if len(sweeps) <= 10:  # a legend for hundreds of sweeps would cover the plot
+        ax_mag.legend(loc="lower left", fontsize=9, framealpha=0.95, edgecolor='black', fancybox=True, shadow=True)
+    plt.tight_layout()
 
-    # Improve title and styling
-    ax1.set_title(custom_title, fontsize=14, fontweight='bold', pad=20)
-    ax1.grid(True, alpha=0.4, linestyle='--', linewidth=0.7)  # Enhanced grid: dashed lines, better visibility
-    ax1.tick_params(axis='x', labelsize=10)
-    
-    # Enhanced legend with better positioning and frame
-    if legend_choice != "4":  # "4" means hide legend
-        legend1 = ax1.legend(loc=legend_pos, fontsize=10, framealpha=0.95, edgecolor='black', fancybox=True, shadow=True)
-        if ax2:
-            ax2.legend(loc='upper right', fontsize=10, framealpha=0.95, edgecolor='black', fancybox=True, shadow=True)
-    
-    # Add light background color for readability
-    ax1.set_facecolor('#f8f9fa')
-    fig.patch.set_facecolor('white')
-    
-    plt.tight_layout()  # Auto-adjust spacing to avoid label cutoff
-    
-    # User chooses whether to save plot to disk
-    print("=" * 37)
-    save_choice = input("Save plot? (0=none, 1=PNG, 2=PDF): ").strip() or "1" # default - no save
-    print("=" * 15 + " Enjoy " + "=" * 15)
-    if save_choice in ["1", "2"]: # if user chose to save
-        script_dir = os.path.dirname(os.path.abspath(__file__)) # script directory
-        # Create "Saved Graphs" folder if it doesn't exist
-        saved_graphs_dir = os.path.join(script_dir, "Saved Graphs")
-        os.makedirs(saved_graphs_dir, exist_ok=True)
-        
-        ext = ".png" if save_choice == "1" else ".pdf" # determine file extension
-        
-        # Determine prefix based on plot type
-        prefix_map = {"line": "Lin.", "scatter": "Sc.", "bar": "Bar.", "histogram": "Hist."}
-        prefix = prefix_map.get(plot_type, "")
-        
-        # Ask user for custom filename (default: use chart title)
-        default_name = custom_title.replace(" ", ".").replace("/", "-").replace("\\", "-")
-        user_filename = input(f"\nEnter filename (blank for '{default_name}'): ").strip()
-        if not user_filename:
-            user_filename = default_name
-        
-        # Remove extension if user added it (we'll add the correct one)
-        user_filename = user_filename.replace(".png", "").replace(".pdf", "")
-        
-        # Generate final filename with prefix and timestamp to avoid overwriting
-        timestamp = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
-        filename = os.path.join(saved_graphs_dir, f"{prefix}{user_filename}_{timestamp}{ext}")
-        plt.savefig(filename, dpi=300, bbox_inches='tight', facecolor='white')  # Higher DPI for quality
-        print(f"Plot saved to: {filename}") # inform user of saved file
-    
-    plt.show()  # Display plot in window
+    if targets:
+        table = pd.DataFrame([dict(file=name, **m) for name, _, _, _, m in sweeps])
+        table_path = targets[0][:-len(rendition_of(targets[0]))] + ".csv"
+        table.to_csv(table_path, index=False)
+        print(f"Summary table saved to: {table_path}")
+    save_and_show(plt, fig, custom_title, "bode", targets=targets)
 
 
 def main():
     """
     Main workflow: load CSV, compute statistics, filter data, and generate plots.
     """
+    global HEADLESS, PREFETCH, PREFETCH_NEXT, USE_CATALOG, RENDER_CACHE_MB, SPECTRUM_CACHE_MB, EXPORT_FORMAT, QUANTIZE
+    args = parse_args()
+    HEADLESS = args.headless
+    PREFETCH = args.prefetch
+    PREFETCH_NEXT = args.prefetch_next
+    USE_CATALOG = args.catalog
+    RENDER_CACHE_MB = args.render_cache_mb
+    SPECTRUM_CACHE_MB = args.spectrum_cache_mb
+    EXPORT_FORMAT = args.export
+    QUANTIZE = args.quantize
+
+    if args.watch:
+        try:
+            watch_csv(args.watch, refresh_hz=args.refresh)
+        except Exception as e:
+            print(f"\nError in watch mode: {e}")
+        return
+
+    if args.envelope:
+        # Streamed line plot: constant memory, however large the file
+        try:
+            head = peek_csv(args.envelope)
+            x_col, y_cols = choose_axes(head)
+            plot_envelope(args.envelope, x_col, y_cols)
+        except Exception as e:
+            print(f"\nError in envelope plot: {e}")
+        wait_for_windows()
+        return
+
+    if args.spectrum:
+        # Streamed Welch spectrum: the file is read in chunks, never loaded whole
+        try:
+            head = peek_csv(args.spectrum)
+            x_col, y_cols = choose_axes(head)
+            plot_spectrum(None, x_col, y_cols, source=args.spectrum)
+        except Exception as e:
+            print(f"\nError in spectrum: {e}")
+        wait_for_windows()
+        return
+
     # Folder where this script lives
     script_dir = os.path.dirname(os.path.abspath(__file__))
     separated_dir = os.path.join(script_dir, "Seperated")
     
     # If Seperated folder exists and has CSV files, use it as default; otherwise use script directory
-    if os.path.isdir(separated_dir) and any(f.lower().endswith('.csv') for f in os.listdir(separated_dir)):
+    if os.path.isdir(separated_dir) and list_csv_files(separated_dir):
         default_dir = separated_dir
         print("\n"*8 + "=" * 120)
         print(f"Default folder: {separated_dir}")
@@ -978,6 +4103,22 @@ def main():
     if folder_path == "":
         folder_path = default_dir
 
+    if args.overlay:
+        try:
+            overlay_files(folder_path)
+        except Exception as e:
+            print(f"\nError in overlay: {e}")
+        wait_for_windows()
+        return
+
+    if args.bode:
+        try:
+            bode_files(folder_path)
+        except Exception as e:
+            print(f"\nError in frequency response: {e}")
+        wait_for_windows()
+        return
+
     # Store last settings for re-run functionality
     last_settings = None
 
@@ -989,10 +4130,13 @@ def main():
                 print(f"\nError selecting file: {e}")
                 return
 
-            # Try to load the CSV; if it fails, check heuristics and offer to run fix_csv.py
+            # Start loading the whole file in the background; meanwhile only the
+            # header and first rows are read for the preview and the prompts below.
+            # If it fails, check heuristics and offer to run fix_csv.py
             loaded = False
             try:
-                df = load_csv(filepath)
+                pending = prefetch_csv(filepath)
+                head = peek_csv(filepath)
                 loaded = True
             except Exception as e:
                 print(f"\nInitial load failed: {e}")
@@ -1009,38 +4153,63 @@ def main():
                 else:
                     return
 
-            # If we reach here, df is loaded
+            if PREFETCH_NEXT:
+                next_file = next_csv_file(filepath)
+                if next_file:
+                    prefetch_csv(next_file)
+
+            # If we reach here, the file is readable
             print(f"\nFile selected: {filepath}")
             print("\n" + "=" * 80)
-            print(df.head())
+            print(head)
             print("=" * 80)
             break
 
         # Show summary statistics
-        # Identify columns that can be parsed as numeric (not just pure numeric types)
-        numeric_cols = []
-        for col in df.columns:
-            # Check if at least one value in the column can be parsed as numeric
-            if df[col].apply(parse_numeric_string).notna().any():
-                numeric_cols.append(col)
-        
-        if numeric_cols:
-            show_summary_stats(df, numeric_cols)
-        
-        # Choose axes and plot
-        x_col, y_cols = choose_axes(df)
+        # The menu is answered while the file loads; if the preview shows no numeric
+        # column, wait for the full parse before deciding whether to offer statistics.
+        head_numeric = any(numeric_column(head, col).notna().any() for col in head.columns)
+        stats_choice = ask_stats_choice() if head_numeric else None
+
+        # Statistics skipped: the axes prompt only needs column names, so ask it while loading continues
+        if stats_choice == "":
+            x_col, y_cols = choose_axes(head)
+
+        try:
+            df, numeric_cols = pending.result()  # blocks only if the background load isn't done yet
+        except Exception as e:
+            print(f"\nLoading failed: {e}")
+            continue
+        print(f"Loaded {len(df)} rows.")
+
+        if stats_choice != "":
+            if numeric_cols:
+                show_summary_stats(df, numeric_cols, stats_choice)
+
+            # Choose axes and plot
+            x_col, y_cols = choose_axes(head)
+
+        # Every choice from here on is recorded in spec (key of the render cache)
+        spec = {"file": file_identity(filepath)}
 
         # Optionally select a contiguous row range to analyze
-        df = pick_row_range(df)
+        df_full = df
+        df = pick_row_range(df, spec)
 
         # Filter data by points of interest
-        df_filtered = filter_data(df, x_col, y_cols)
+        df_filtered = filter_data(df, x_col, y_cols, spec)
+
+        # Optional smoothing / envelopes, added as extra Y columns
+        df_filtered, plot_cols = condition_signals(df_filtered, x_col, y_cols, spec)
 
         # Sample data points (plot every Nth point for large datasets)
-        df_sampled = sample_data_points(df_filtered)
+        df_sampled = sample_data_points(df_filtered, spec)
 
-        # Plot the data
-        plot_data(df_sampled, x_col, y_cols)
+        # Plot the data (the file path is passed on only if the whole file is plotted)
+        plot_data(df_sampled, x_col, plot_cols, source=filepath if df_sampled is df_full else None, spec=spec)
+
+        # Optionally write the plotted data (after range / filter / conditioning / sampling)
+        offer_export(df_sampled, x_col, plot_cols, filepath)
 
         # Store settings for re-run
         last_settings = {
@@ -1053,7 +4222,9 @@ def main():
         print("1: Create new plot (different data/axes)")
         print("2: Re-run last plot with same settings")
         print("3: Exit")
-        choice = input("\nEnter choice (1-3): ").strip()
+        print("4: Overlay column(s) from several files")
+        print("5: Frequency response (Bode) of sweep files")
+        choice = input("\nEnter choice (1-5): ").strip()
 
         if choice == "2" and last_settings:
             print("\nRe-running with last settings")
@@ -1061,20 +4232,43 @@ def main():
             x_col = last_settings['x_col']
             y_cols = last_settings['y_cols']
             try:
-                df = load_csv(filepath)
-                df = pick_row_range(df)
-                df_filtered = filter_data(df, x_col, y_cols)
-                df_sampled = sample_data_points(df_filtered)
-                plot_data(df_sampled, x_col, y_cols)
+                df_full, _ = prefetch_csv(filepath).result()  # reuses the loaded file unless it changed on disk
+                spec = {"file": file_identity(filepath)}
+                df = pick_row_range(df_full, spec)
+                df_filtered = filter_data(df, x_col, y_cols, spec)
+                df_filtered, plot_cols = condition_signals(df_filtered, x_col, y_cols, spec)
+                df_sampled = sample_data_points(df_filtered, spec)
+                # Same columns as the open figure: only the data changes, so update it in place
+                if not update_plot(df_sampled, x_col, plot_cols, spec):
+                    plot_data(df_sampled, x_col, plot_cols, source=filepath if df_sampled is df_full else None, spec=spec)
+                offer_export(df_sampled, x_col, plot_cols, filepath)
             except Exception as e:
                 print(f"Error in re-run: {e}")
         elif choice == "1":
             print("\nStarting new plot session...\n")
             continue
+        elif choice == "4":
+            try:
+                overlay_files(folder_path)
+            except Exception as e:
+                print(f"Error in overlay: {e}")
+            print("\nStarting new plot session...\n")
+            continue
+        elif choice == "5":
+            try:
+                bode_files(folder_path)
+            except Exception as e:
+                print(f"Error in frequency response: {e}")
+            print("\nStarting new plot session...\n")
+            continue
         else:
             print("\nDone.")
+            wait_for_windows()
             break
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        finish_exports()
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+GraphServer.py
+
+Long-running local server that keeps parsed CSV columns in memory, so repeated requests
+for the same "Seperated" files skip interpreter start, pandas/matplotlib import and parsing.
+
+#! Run in terminal:
+
+#! python GraphServer.py serve                      (Unix socket only your user can open)
+#! python GraphServer.py serve --tcp                (localhost HTTP on port 8765)
+#! python GraphServer.py serve --root /data/captures
+#! python GraphServer.py stats  [File] --cols "CH1(V),CH2(V)"
+#! python GraphServer.py series [File] --x "Time(S)" --y "CH1(V)" --points 2000
+#! python GraphServer.py png    [File] --x "Time(S)" --y "CH1(V)" -o plot.png
+
+The client commands talk to a running server and fall back to doing the work in-process
+when no server is reachable (or with --local), so they always work.
+
+HTTP endpoints (GET, query parameters as in the client options):
+  /health, /columns?file=, /stats?file=&cols=, /series?file=&x=&y=&points=, /png?file=&x=&y=
+Only files inside the --root folder (default: this folder) are served, and only requests whose
+Host header is localhost / 127.0.0.1 are answered (no access from web pages via DNS rebinding).
+
+Features:
+- Files are loaded and indexed once with Graph.py's loader, keyed by (path, size, mtime),
+  so edited files are picked up automatically; the least recently used files are dropped
+- Series are min/max decimated per bucket, so peaks survive the reduction
+- PNGs are rendered in a process pool, the event loop only handles requests
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import signal
+import socket
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from urllib.parse import parse_qs, quote, urlencode, urlsplit
+
+import Graph
+
+DEFAULT_PORT = 8765
+DEFAULT_ROOT = os.path.dirname(os.path.abspath(__file__))
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "[::1]"}
+DEFAULT_POINTS = 2000
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Warm local server (and client) for Graph.py analysis.")
+    p.add_argument("command", choices=["serve", "stats", "series", "png", "columns"],
+                   help="serve = start the server; other commands are client requests")
+    p.add_argument("file", nargs="?", help="CSV file for client requests")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"localhost TCP port (default {DEFAULT_PORT})")
+    p.add_argument("--socket", metavar="PATH",
+                   help="Unix socket path (default: graph-server-<uid>.sock in $XDG_RUNTIME_DIR or the temp folder)")
+    p.add_argument("--tcp", action="store_true", help="Use localhost TCP on --port instead of the Unix socket")
+    p.add_argument("--root", default=DEFAULT_ROOT,
+                   help="Only serve files inside this folder (serve; default: the Graph.py folder)")
+    p.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                   help="Render processes for PNG requests (serve)")
+    p.add_argument("--max-files", type=int, default=8, help="Parsed files kept in memory (serve)")
+    p.add_argument("--quantize", action="store_true",
+                   help="Keep columns on a fixed step (ADC levels) as int8/int16 codes (serve, --local)")
+    p.add_argument("--cols", default="", help="Comma-separated columns for stats (default: all numeric)")
+    p.add_argument("--x", help="X column (name or index)")
+    p.add_argument("--y", default="", help="Comma-separated Y column(s) (names or indices)")
+    p.add_argument("--points", type=int, default=DEFAULT_POINTS, help="Max points per series after decimation")
+    p.add_argument("--title", default="", help="Plot title for png")
+    p.add_argument("-o", "--output", help="Output file for png (default: Saved Graphs/Srv.<file>.png)")
+    p.add_argument("--local", action="store_true", help="Don't contact a server, work in-process")
+    return p.parse_args()
+
+
+# ---------------------------------------------------------------------------
+# Warm data store and request handlers (shared by server and in-process fallback)
+# ---------------------------------------------------------------------------
+
+def default_socket_path() -> str | None:
+    """Per-user Unix socket path, or None where Unix sockets are not available (then TCP is used)."""
+    if not hasattr(socket, "AF_UNIX") or not hasattr(os, "getuid"):
+        return None
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(base, f"graph-server-{os.getuid()}.sock")
+
+
+def inside_root(filepath: str, root: str) -> str:
+    """Real path of `filepath` (symlinks resolved). PermissionError if it lies outside `root`."""
+    real, base = os.path.realpath(filepath), os.path.realpath(root)
+    if os.path.commonpath([real, base]) != base:
+        raise PermissionError(f"File is outside the served folder: {filepath}")
+    return real
+
+
+class WarmStore:
+    """
+    Parsed files keyed by (abspath, size, mtime_ns); concurrent requests for one file share a single load.
+    With `root`, only files inside that folder can be loaded.
+    """
+
+    def __init__(self, max_files: int = 8, root: str | None = None):
+        self.max_files = max_files
+        self.root = root
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, filepath: str):
+        if self.root:
+            filepath = inside_root(filepath, self.root)
+        st = os.stat(filepath)
+        key = (os.path.abspath(filepath), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            future = self._files.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._files[key] = future
+                # Older versions of the same file are useless once it changed
+                for old in [k for k in self._files if k[0] == key[0] and k != key]:
+                    del self._files[old]
+                while len(self._files) > self.max_files:
+                    self._files.popitem(last=False)
+            else:
+                self._files.move_to_end(key)
+        if owner:
+            try:
+                future.set_result(Graph.index_numeric_columns(Graph.load_csv(filepath, verbose=False),
+                                                              source=filepath))
+            except Exception as e:
+                future.set_exception(e)
+                with self._lock:
+                    self._files.pop(key, None)
+        return future.result()
+
+    def __len__(self):
+        return len(self._files)
+
+
+def resolve_columns(df, names: str) -> list:
+    """Column names from a comma list of names or 0-based indices. KeyError on unknown columns."""
+    cols = []
+    for name in [n.strip() for n in names.split(",") if n.strip()]:
+        if name in df.columns:
+            cols.append(name)
+        elif name.isdigit() and int(name) < len(df.columns):
+            cols.append(df.columns[int(name)])
+        else:
+            raise KeyError(f"Unknown column: {name}")
+    return cols
+
+
+def decimate(x, y, points: int, missing=None):
+    """
+    Reduce (x, y) to about `points` samples by keeping the min and max of each bucket
+    (in original order), plus the last sample. NaNs never win a bucket.
+    `y` may be the int codes of a quantized column, with `missing` the code of missing values
+    (the lowest code, so it only has to be kept out of the minimum).
+    """
+    import numpy as np
+
+    n = len(y)
+    if n <= points:
+        return x, y
+    buckets = max(points // 2, 1)
+    k = n // buckets
+    m = buckets * k
+    yb = y[:m].reshape(buckets, k)
+    if missing is None:
+        lo = np.argmin(np.where(np.isnan(yb), np.inf, yb), axis=1)
+        hi = np.argmax(np.where(np.isnan(yb), -np.inf, yb), axis=1)
+    else:
+        lo = np.argmin(np.where(yb == missing, np.iinfo(yb.dtype).max, yb), axis=1)
+        hi = np.argmax(yb, axis=1)
+    idx = (np.sort(np.stack([lo, hi], axis=1), axis=1) + (np.arange(buckets) * k)[:, None]).ravel()
+    idx = np.unique(np.append(idx, n - 1))
+    return x[idx], y[idx]
+
+
+def _json_floats(values) -> list:
+    import numpy as np
+
+    values = np.asarray(values, dtype=float)
+    return [None if v != v else v for v in values.tolist()] if np.isnan(values).any() else values.tolist()
+
+
+def handle(store: WarmStore, endpoint: str, params: dict):
+    """
+    Answer one request. Returns ("json", dict) or ("render", kwargs for render_png);
+    rendering is left to the caller so the server can run it in its process pool.
+    """
+    import numpy as np
+
+    if endpoint == "health":
+        return "json", {"ok": True, "files": len(store), "pid": os.getpid()}
+    filepath = params.get("file", "")
+    if not filepath:
+        raise ValueError("Missing 'file' parameter")
+    df, numeric_cols = store.get(filepath)
+
+    if endpoint == "columns":
+        return "json", {"columns": list(map(str, df.columns)), "numeric": list(map(str, numeric_cols))}
+
+    if endpoint == "stats":
+        cols = resolve_columns(df, params["cols"]) if params.get("cols") else numeric_cols
+        out = {}
+        for col in cols:
+            summary = Graph.quantized_summary(df, col)  # from the code histogram, no float copy
+            if summary is not None:
+                out[str(col)] = ({"count": summary["count"], "min": summary["min"], "max": summary["max"],
+                                  "mean": summary["mean"], "std": summary["std"] if summary["count"] > 1 else 0.0}
+                                 if summary["count"] else {"count": 0})
+                continue
+            v = df[col].to_numpy(dtype=float) if col in numeric_cols else np.array([np.nan])
+            valid = v[~np.isnan(v)]
+            out[str(col)] = ({"count": int(valid.size), "min": float(valid.min()), "max": float(valid.max()),
+                              "mean": float(valid.mean()),
+                              "std": float(valid.std(ddof=1)) if valid.size > 1 else 0.0}
+                             if valid.size else {"count": 0})
+        return "json", {"file": filepath, "rows": len(df), "stats": out}
+
+    if endpoint in ("series", "png"):
+        x_col = resolve_columns(df, params.get("x", ""))
+        y_cols = resolve_columns(df, params.get("y", ""))
+        if len(x_col) != 1 or not y_cols:
+            raise ValueError("Need one 'x' column and at least one 'y' column")
+        x_col = x_col[0]
+        points = int(params.get("points", DEFAULT_POINTS))
+        if x_col in numeric_cols or Graph.is_datetime(df[x_col]):
+            x = Graph.numeric_column(df, x_col).to_numpy(dtype=float)  # timestamps as epoch seconds
+        else:
+            x = np.arange(len(df), dtype=float)
+        series = {}
+        quantized = df.attrs.get("quantized", {})
+        for col in y_cols:
+            q = quantized.get(col)
+            if q:  # buckets are reduced on the codes, only the kept points are decoded
+                xs, codes = decimate(x, df[col].to_numpy(), points, missing=np.iinfo(q["dtype"]).min)
+                ys = Graph.decode_codes(codes, q)
+            else:
+                xs, ys = decimate(x, df[col].to_numpy(dtype=float), points)
+            series[str(col)] = (xs, ys)
+        if endpoint == "png":
+            return "render", {"series": series, "x_label": str(x_col),
+                              "title": params.get("title") or os.path.basename(filepath)}
+        return "json", {"file": filepath, "rows": len(df), "x": str(x_col),
+                        "series": {c: {"x": _json_floats(xs), "y": _json_floats(ys)}
+                                   for c, (xs, ys) in series.items()}}
+
+    raise KeyError(f"Unknown endpoint: {endpoint}")
+
+
+def render_png(series: dict, x_label: str, title: str, width: float = 10, height: float = 6, dpi: int = 100) -> bytes:
+    """Render decimated series as a PNG (runs in a worker process). Returns the PNG bytes."""
+    import io
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(width, height))
+    for col, (xs, ys) in series.items():
+        ax.plot(xs, ys, linewidth=1.5, label=col)
+    ax.set_xlabel(x_label, fontsize=12, fontweight='bold')
+    ax.set_title(title, fontsize=14, fontweight='bold', pad=20)
+    ax.grid(True, alpha=0.4, linestyle='--', linewidth=0.7)
+    if series:
+        ax.legend(loc="best", fontsize=10)
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=dpi)
+    plt.close(fig)
+    return buf.getvalue()
+
+
+# ---------------------------------------------------------------------------
+# Server
+# ---------------------------------------------------------------------------
+
+def _local_host(host: str) -> bool:
+    """True if a Host header names this machine (localhost / 127.0.0.1 / [::1], any port)."""
+    name = host.strip().lower()
+    if name.startswith("["):
+        name = name[:name.find("]") + 1]
+    elif ":" in name:
+        name = name.rpartition(":")[0]
+    return name in LOCAL_HOSTS
+
+
+async def _respond(writer, status: int, body: bytes, content_type: str):
+    reason = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 500: "Internal Server Error"}[status]
+    writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+                 f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+    await writer.drain()
+    writer.close()
+
+
+async def _serve_connection(reader, writer, store: WarmStore, pool: ProcessPoolExecutor):
+    loop = asyncio.get_running_loop()
+    try:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if len(request_line) < 2 or request_line[0] != "GET":
+            await _respond(writer, 400, b'{"error": "GET only"}', "application/json")
+            return
+        if not _local_host(headers.get("host", "")):
+            # Browsers send the page's own host name: this blocks DNS-rebinding pages
+            await _respond(writer, 403, b'{"error": "Host not allowed"}', "application/json")
+            return
+        url = urlsplit(request_line[1])
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        kind, result = await loop.run_in_executor(None, handle, store, url.path.strip("/"), params)
+        if kind == "render":
+            png = await loop.run_in_executor(pool, render_png, result["series"], result["x_label"], result["title"])
+            await _respond(writer, 200, png, "image/png")
+        else:
+            await _respond(writer, 200, json.dumps(result).encode(), "application/json")
+    except (KeyError, ValueError, FileNotFoundError, PermissionError) as e:
+        status = (403 if isinstance(e, PermissionError) else
+                  404 if isinstance(e, (KeyError, FileNotFoundError)) else 400)
+        await _respond(writer, status, json.dumps({"error": str(e).strip("'\"")}).encode(), "application/json")
+    except Exception as e:
+        await _respond(writer, 500, json.dumps({"error": str(e)}).encode(), "application/json")
+
+
+async def serve(port: int, socket_path: str | None, workers: int, max_files: int, root: str = DEFAULT_ROOT):
+    store = WarmStore(max_files, root=root)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Start the render workers now, so the first PNG request doesn't pay for it
+        await asyncio.get_running_loop().run_in_executor(pool, render_png, {}, "", "")
+
+        def on_connect(r, w):
+            return _serve_connection(r, w, store, pool)
+
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            old_umask = os.umask(0o177)  # socket is created with mode 0600: other users can't connect
+            try:
+                server = await asyncio.start_unix_server(on_connect, path=socket_path)
+            finally:
+                os.umask(old_umask)
+            os.chmod(socket_path, 0o600)
+            where = socket_path
+        else:
+            server = await asyncio.start_server(on_connect, host="127.0.0.1", port=port)
+            where = f"http://127.0.0.1:{port}"
+        print(f"Graph server listening on {where}, serving {os.path.realpath(root)} "
+              f"({workers} render workers, Ctrl+C to stop)")
+        stop = asyncio.Event()
+        if sys.platform != "win32":
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        try:
+            async with server:
+                await stop.wait()
+            print("Server stopped.")
+        finally:
+            if socket_path and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+# ---------------------------------------------------------------------------
+# Client
+# ---------------------------------------------------------------------------
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self._path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._path)
+
+
+def request(endpoint: str, params: dict, port: int = DEFAULT_PORT, socket_path: str | None = None,
+            local: bool = False, timeout: float = 60.0):
+    """
+    Run a request on the server, or in-process if no server is running (connection refused or
+    no socket file). Returns parsed JSON (dict) or PNG bytes. Raises RuntimeError with the
+    server's error message, or when the server does not answer within `timeout` seconds.
+    """
+    if not local:
+        conn = (_UnixHTTPConnection(socket_path, timeout) if socket_path
+                else http.client.HTTPConnection("127.0.0.1", port, timeout=timeout))
+        try:
+            conn.request("GET", f"/{endpoint}?{urlencode(params, quote_via=quote)}")
+            resp = conn.getresponse()
+            body = resp.read()
+        except (ConnectionRefusedError, FileNotFoundError):
+            print("(Graph server not running - working in-process)", file=sys.stderr)
+        except socket.timeout:
+            raise RuntimeError(f"Graph server did not answer within {timeout:g} s")
+        except OSError as e:
+            raise RuntimeError(f"Could not talk to the graph server: {e}")
+        else:
+            if resp.status != 200:
+                raise RuntimeError(json.loads(body).get("error", f"HTTP {resp.status}"))
+            return body if resp.getheader("Content-Type") == "image/png" else json.loads(body)
+        finally:
+            conn.close()
+
+    try:
+        kind, result = handle(WarmStore(1), endpoint, params)
+    except (KeyError, ValueError, FileNotFoundError) as e:
+        raise RuntimeError(str(e).strip("'\""))
+    return render_png(**result) if kind == "render" else result
+
+
+def main():
+    args = parse_args()
+    Graph.QUANTIZE = args.quantize
+    socket_path = None if args.tcp else args.socket or default_socket_path()
+
+    if args.command == "serve":
+        if not os.path.isdir(args.root):
+            print(f"Data folder not found: {args.root}")
+            sys.exit(2)
+        try:
+            asyncio.run(serve(args.port, socket_path, args.workers, args.max_files, args.root))
+        except KeyboardInterrupt:
+            print("\nServer stopped.")
+        return
+
+    if not args.file:
+        print("A CSV file is required for client commands.")
+        sys.exit(2)
+    params = {"file": os.path.abspath(args.file)}
+    if args.command == "stats" and args.cols:
+        params["cols"] = args.cols
+    if args.command in ("series", "png"):
+        params.update({"x": args.x or "", "y": args.y, "points": args.points})
+        if args.title:
+            params["title"] = args.title
+
+    try:
+        result = request(args.command, params, args.port, socket_path, args.local)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if args.command == "png":
+        out = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), "Saved Graphs",
+                                          f"Srv.{os.path.splitext(os.path.basename(args.file))[0]}.png")
+        os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+        with open(out, "wb") as fh:
+            fh.write(result)
+        print(f"Plot saved to: {out}")
+    elif args.command == "stats":
+        print(f"\n{os.path.basename(args.file)}: {result['rows']} rows")
+        for col, st in result["stats"].items():
+            if st["count"]:
+                print(f"  {col:<20} n={st['count']:<8} min={st['min']:<12.6g} max={st['max']:<12.6g} "
+                      f"mean={st['mean']:<12.6g} std={st['std']:.6g}")
+            else:
+                print(f"  {col:<20} no numeric values")
+    else:
+        print(json.dumps(result, indent=None if args.command == "series" else 2))
+
+
+if __name__ == "__main__":
+    main()
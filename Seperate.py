@@ -18,26 +18,53 @@ Usage examples:
   python fix_csv.py Data.ex3.csv
   python fix_csv.py Data.ex3.csv -o Data.ex3_comma.csv --method pandas
   python fix_csv.py Data.ex3.csv --inplace --force
+  python fix_csv.py Data.ex3.csv --columnar parquet --no-csv
+  python fix_csv.py Dump.txt --incremental
+  python fix_csv.py Dump.txt.zst --compress zst
 
 Features:
-- Makes a backup by default (input.bak)
+- Makes a backup by default (BackUps/input.bak): a reflink or hard link where the filesystem
+  allows (no data written), otherwise a copy; optionally compressed (--backup-compress)
 - Can replace literal "\\t" sequences with real tabs
 - Two conversion methods: "regex" (fast, simple) and "pandas" (robust, handles quotes)
+- Detects the layout (comma, whitespace, literal tabs, fixed-width, wrapped token stream)
+  from the first lines only, so even multi-GB dumps are classified instantly
+- Optional typed Parquet/Feather output (numbers, percentages, unit suffixes parsed once here,
+  so Graph.py loads the columns without any text parsing)
+- Incremental mode for dumps that keep growing: only the bytes appended since the last run are
+  converted and appended to the output (checkpoint kept next to it); the result is the same as a
+  full conversion, and a truncated or rewritten source triggers a full rebuild
+- Reads .gz/.xz/.zst dumps directly (decompressed while reading, multi-frame zstd in parallel)
+  and can write the output CSV compressed (--compress)
 - Preview output (first 5 lines / rows)
 - Optional inplace replace of the original file (with confirmation)
 """
 from __future__ import annotations
 import argparse
+import hashlib
+import json
+import os
 import shutil
 from pathlib import Path
 import sys
 import re
-from io import StringIO
+from io import StringIO, TextIOWrapper
 
-try:
-    import pandas as pd
-except Exception:
-    pd = None
+# pandas is imported on first use by load_pandas(); the default regex and grouping
+# conversions never touch it, so they start without paying for the import.
+pd = None
+
+
+def load_pandas():
+    """Import pandas on first use. Returns the module, or None if it isn't installed."""
+    global pd
+    if pd is None:
+        try:
+            import pandas
+            pd = pandas
+        except Exception:
+            pd = None
+    return pd
 
 
 def parse_args():
@@ -47,6 +74,8 @@ def parse_args():
     p.add_argument("--method", choices=["regex", "pandas"], default="regex",
                    help="Conversion method: regex (fast) or pandas (robust)")
     p.add_argument("--no-backup", dest="backup", action="store_false", help="Don't create a .bak backup")
+    p.add_argument("--backup-compress", choices=COMPRESSIONS,
+                   help="Store the backup compressed (e.g. input.bak.zst) instead of linking/copying it")
     p.add_argument("--replace-literal-tabs", action="store_true",
                    help="Replace literal \\t sequences (two characters) with real tabs before parsing")
     p.add_argument("--group-by-header", action="store_true",
@@ -56,34 +85,321 @@ def parse_args():
     p.add_argument("--inplace", action="store_true", help="Replace the original file with the converted CSV (asks before overwriting)")
     p.add_argument("--force", action="store_true", help="When used with --inplace, don't ask for confirmation")
     p.add_argument("--preview-rows", type=int, default=5, help="Number of rows/lines to show as preview")
+    p.add_argument("--columnar", choices=["parquet", "feather"],
+                   help="Also write a typed columnar file (needs pandas + pyarrow) next to the CSV")
+    p.add_argument("--no-csv", action="store_true",
+                   help="With --columnar, write only the columnar file")
+    p.add_argument("--detect-only", action="store_true",
+                   help="Only print the detected layout (reads just the head of the file) and exit")
+    p.add_argument("--compress", choices=COMPRESSIONS,
+                   help="Write the output CSV compressed (zst needs zstandard; it is written as independent "
+                        "frames that Graph.py decompresses in parallel)")
+    p.add_argument("--incremental", action="store_true",
+                   help="Convert only what was appended since the last run and append it to the output "
+                        "(checkpoint kept next to it); rebuilds fully if the source was truncated or rewritten")
     return p.parse_args()
 
 
-def backup_file(path: Path):
-    # Create a BackUps folder next to the input file and store backups there
+COMPRESSIONS = ("gz", "xz", "zst")
+ZSTD_FRAME_BYTES = 4 << 20  # text per zstd frame written by --compress zst (frames compress/decompress in parallel)
+
+
+def compression_of(path: Path) -> str | None:
+    ext = path.suffix.lower()[1:]
+    return ext if ext in COMPRESSIONS else None
+
+
+def plain_path(path: Path) -> Path:
+    """The path without its compression extension ('dump.txt.gz' -> 'dump.txt')."""
+    return path.with_suffix("") if compression_of(path) else path
+
+
+def open_input(path: Path):
+    """Binary stream of the input, decompressed while it is read for .gz/.xz/.zst (ValueError if unreadable)."""
+    if compression_of(path) is None:
+        return path.open("rb")
+    from Graph import open_compressed
+    return open_compressed(str(path))
+
+
+def csv_bytes(text: str) -> bytes:
+    # Same bytes as write_text() produces (platform line endings)
+    return text.replace("\n", os.linesep).encode("utf-8")
+
+
+def write_compressed(path: Path, data, kind: str = None):
+    """
+    Write data (bytes, or a binary file read block by block) compressed as `kind`, by default
+    the path's extension. zst blocks become independent frames compressed on worker threads.
+    """
+    kind = kind or compression_of(path)
+    if isinstance(data, (bytes, bytearray)):
+        view = memoryview(data)
+        blocks = (view[i:i + ZSTD_FRAME_BYTES] for i in range(0, len(view), ZSTD_FRAME_BYTES))
+    else:
+        blocks = iter(lambda: data.read(ZSTD_FRAME_BYTES), b"")
+    if kind in ("gz", "xz"):
+        import gzip
+        import lzma
+        with (gzip.open(path, "wb") if kind == "gz" else lzma.open(path, "wb")) as fh:
+            for block in blocks:
+                fh.write(block)
+        return
+    try:
+        import zstandard
+    except ImportError as e:
+        raise RuntimeError(f"zst output needs zstandard. Install with: pip install zstandard ({e})")
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+
+    def frame(block):
+        return zstandard.ZstdCompressor(level=3, write_checksum=True).compress(block)
+
+    workers = os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool, path.open("wb") as fh:
+        pending = deque()  # bounded, so a large file isn't read into memory ahead of the writer
+        for block in blocks:
+            pending.append(pool.submit(frame, block))
+            if len(pending) >= 2 * workers:
+                fh.write(pending.popleft().result())
+        while pending:
+            fh.write(pending.popleft().result())
+
+
+FICLONE = 0x40049409  # Linux ioctl: share the source's data blocks copy-on-write (Btrfs, XFS, ...)
+
+
+def clone_file(src: Path, dst: Path) -> bool:
+    """Reflink dst to src's data where the filesystem supports it (nothing is written); False otherwise."""
+    try:
+        import fcntl
+    except ImportError:  # Windows
+        return False
+    try:
+        with src.open("rb") as s, dst.open("wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return True
+    except OSError:
+        dst.unlink(missing_ok=True)
+        return False
+
+
+def hard_link(src: Path, dst: Path) -> bool:
+    try:
+        os.link(src, dst)
+        return True
+    except OSError:  # other filesystem, FAT, no permission
+        return False
+
+
+def fsync_path(path: Path, directory: bool = False):
+    """Flush a file (or, on POSIX, a directory entry) to disk."""
+    if directory and os.name == "nt":
+        return
+    fd = os.open(path, os.O_RDONLY if directory else os.O_RDWR)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def replace_atomically(src: Path, dst: Path):
+    """
+    Replace dst with a copy of src so that dst is always either the old or the new file: a
+    reflink of src (nothing written again, Btrfs/XFS) or else a copy goes to a temp file next to
+    dst, is fsynced and renamed over dst with os.replace. Never a hard link: src and dst stay
+    separate files, so later writes to src can't touch dst. dst keeps its permission bits.
+    Returns how the data got there ("reflink" or "copy").
+    """
+    tmp = dst.with_name(f".{dst.name}.tmp")
+    tmp.unlink(missing_ok=True)  # left over from an interrupted run
+    try:
+        if clone_file(src, tmp):
+            method = "reflink"
+        else:
+            shutil.copyfile(src, tmp)
+            method = "copy"
+        shutil.copymode(dst, tmp)
+        fsync_path(tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    fsync_path(dst.parent, directory=True)
+    return method
+
+
+def backup_file(path: Path, compress: str = None, link: bool = False):
+    """
+    Back up path into a BackUps folder next to it: compressed if `compress` is given, otherwise
+    a reflink, a hard link (only with link=True, i.e. when path is about to be replaced by
+    os.replace - a hard link shares later in-place edits of the original) or a copy.
+    The backup appears under its final name only once complete.
+    """
     backups_dir = path.parent / "BackUps"
     backups_dir.mkdir(parents=True, exist_ok=True)
 
-    bak = backups_dir / (path.name + ".bak")
+    bak = backups_dir / (path.name + ".bak" + (f".{compress}" if compress else ""))
     if bak.exists():
         print(f"Backup already exists: {bak}")
         return bak
 
-    shutil.copy2(path, bak)
-    print(f"Backup created: {bak}")
+    tmp = bak.with_name(f".{bak.name}.tmp")
+    tmp.unlink(missing_ok=True)  # left over from an interrupted run
+    try:
+        if compress:
+            with path.open("rb") as src:
+                write_compressed(tmp, src, compress)
+            shutil.copystat(path, tmp)
+            how = f"{compress}-compressed"
+        elif clone_file(path, tmp):
+            shutil.copystat(path, tmp)
+            how = "reflink"
+        elif link and hard_link(path, tmp):
+            how = "hard link"
+        else:
+            shutil.copy2(path, tmp)
+            how = "copy"
+        fsync_path(tmp)
+        os.replace(tmp, bak)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    print(f"Backup created ({how}): {bak}")
     return bak
 
 
+DETECT_BYTES = 256 * 1024  # head sample used for layout detection
+DETECT_LINES = 500
+
+
+def detect_format(path: Path, sample_bytes: int = DETECT_BYTES, max_lines: int = DETECT_LINES) -> dict:
+    """
+    Classify the file layout from a bounded head sample (the bulk of the file is never read).
+    Returns a dict with:
+      layout      "comma", "whitespace", "literal-tabs", "fixed-width" or "token-stream"
+      confidence  0..1, share of sampled data lines consistent with that layout
+      header      header tokens (None if the first line doesn't look like a header)
+      columns     column count
+      bounds      [(start, end), ...] character spans of the columns (fixed-width only)
+      blank_cells True if some fixed-width rows have empty cells (whitespace splitting would shift them)
+      lines       number of sampled lines
+    """
+    with open_input(path) as fh:
+        head = fh.read(sample_bytes)
+        at_eof = not fh.read(1)
+    text = head.decode("utf-8", errors="replace")
+    if not at_eof and "\n" in text:
+        text = text[:text.rindex("\n")]  # drop the partial last line
+    lines = [ln.rstrip("\r") for ln in text.split("\n") if ln.strip()][:max_lines]
+    info = {"layout": "whitespace", "confidence": 0.0, "header": None, "columns": 0, "bounds": None,
+            "blank_cells": False, "lines": len(lines)}
+    if not lines:
+        return info
+
+    literal_tabs = any("\\t" in ln for ln in lines)
+    if literal_tabs:
+        lines = [ln.replace("\\t", "\t") for ln in lines]
+
+    first = lines[0].strip()
+    has_header = bool(re.search(r"[A-Za-z]", first))
+    data = lines[1:] if has_header else lines
+    if has_header:
+        info["header"] = [t.strip() for t in (first.split(",") if "," in first else first.split()) if t.strip()]
+    if not data:
+        info.update(columns=len(info["header"] or []), confidence=0.5)
+        return info
+
+    def modal(counts):
+        return max(set(counts), key=counts.count)
+
+    if literal_tabs:
+        counts = [len(ln.split()) for ln in data]
+        columns = len(info["header"]) if has_header else modal(counts)
+        info.update(layout="literal-tabs", columns=columns,
+                    confidence=sum(c == columns for c in counts) / len(data))
+        return info
+
+    with_commas = sum("," in ln for ln in data)
+    if with_commas >= 0.9 * len(data):
+        counts = [ln.count(",") + 1 for ln in data]
+        columns = modal(counts)
+        info.update(layout="comma", columns=columns, confidence=sum(c == columns for c in counts) / len(data))
+        return info
+
+    counts = [len(ln.split()) for ln in data]
+    columns = len(info["header"]) if has_header else modal(counts)
+    match = sum(c == columns for c in counts) / len(data)
+
+    # Fixed-width: character columns that are blank on every data line split the fields
+    width = max(len(ln) for ln in data)
+    blank = [True] * width
+    for ln in data:
+        for i, ch in enumerate(ln):
+            if ch != " " and blank[i]:
+                blank[i] = False
+    bounds, start = [], None
+    for i, is_blank in enumerate(blank + [True]):
+        if not is_blank and start is None:
+            start = i
+        elif is_blank and start is not None:
+            bounds.append((start, i))
+            start = None
+    padded = any("  " in ln.strip() for ln in data) and all("\t" not in ln for ln in data)
+    if padded and len(bounds) == columns:
+        # Share of rows where every span holds one value (or is empty)
+        clean = sum(all(" " not in ln[a:b].strip() for a, b in bounds) for ln in data) / len(data)
+        if clean >= 0.9:
+            info.update(layout="fixed-width", columns=columns, bounds=bounds, confidence=clean,
+                        blank_cells=match < 1.0)
+            return info
+
+    if match >= 0.9:
+        info.update(layout="whitespace", columns=columns, confidence=match)
+    else:
+        # Rows wrapped across lines: only the token total has to work out
+        info.update(layout="token-stream", columns=columns, confidence=1.0 - match)
+    return info
+
+
+def describe_format(info: dict) -> str:
+    header = f", header: {', '.join(info['header'])}" if info["header"] else ", no header"
+    return (f"Detected layout: {info['layout']} ({info['columns']} columns{header}), "
+            f"confidence {info['confidence']:.2f} from {info['lines']} sampled lines")
+
+
+def regex_line(ln: str) -> str:
+    # Commas and runs of spaces/tabs both separate fields; empty comma fields are kept.
+    # Keeping quoted fields intact is hard without a real parser; this is a best-effort
+    if "," in ln:
+        return ", ".join(tok for piece in ln.split(",") for tok in (piece.split() or [""]))
+    return ", ".join(ln.split())
+
+
 def convert_regex(raw: str) -> str:
-    # First, collapse any combination of spaces/tabs into a single comma
-    # But keep quoted fields intact is hard with simple regex; this is a best-effort
-    # Replace runs of whitespace with a single comma
-    out = re.sub(r"\s+", ", ", raw)
-    return out
+    out = [regex_line(ln) for ln in raw.splitlines() if ln.strip()]
+    return "\n".join(out) + "\n"
+
+
+def fixed_width_line(ln: str, bounds: list) -> str:
+    return ", ".join(ln[a:b].strip() for a, b in bounds)
+
+
+def convert_fixed_width(raw: str, bounds: list) -> str:
+    """Cut every line at the detected column spans; blank cells become empty fields."""
+    out = [fixed_width_line(ln, bounds) for ln in raw.splitlines() if ln.strip()]
+    return "\n".join(out) + "\n"
+
+
+def split_header(line: str) -> list:
+    """Header tokens of a grouped dump: comma-separated if the line has commas, else whitespace."""
+    if "," in line:
+        return [t.strip() for t in line.split(", ") if t.strip()]
+    return re.split(r"\s+", line.strip())
 
 
 def convert_pandas(raw: str) -> tuple[str, object]:
-    if pd is None:
+    if load_pandas() is None:
         raise RuntimeError("pandas is required for the 'pandas' method. Install with: pip install pandas")
     sio = StringIO(raw)
     # Try inference first
@@ -99,12 +415,228 @@ def convert_pandas(raw: str) -> tuple[str, object]:
         raise RuntimeError(f"pandas parsing failed: {e}")
 
 
+NUMBER_PATTERN = r"^[\$€£¥₹]?\s*([+-]?(?:\d[\d,]*\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)\s*(%|[A-Za-z°µ]+)?$"
+MISSING = {"", "-", "–", "—", "na", "n/a", "nan"}
+
+
+def infer_types(df):
+    """
+    Turn text columns whose every non-missing value is a number (optionally with thousands
+    separators, currency, '%' or a unit suffix like 'V'/'kHz') into floats - integers when all
+    values are whole. Percentages become fractions, as in Graph.py. Other columns stay text.
+    """
+    for col in df.columns:
+        series = df[col]
+        if not (series.dtype == object or pd.api.types.is_string_dtype(series)):
+            continue
+        text = series.astype("string").str.strip()
+        present = series.notna() & ~text.str.lower().isin(MISSING)
+        if not present.any():
+            continue
+        parts = text.str.extract(NUMBER_PATTERN)
+        values = pd.to_numeric(parts[0].str.replace(",", "", regex=False), errors="coerce").astype(float)
+        if values[present].isna().any():
+            continue
+        percent = parts[1].fillna("").eq("%").to_numpy(dtype=bool)
+        values = values.where(~percent, values / 100).where(present)
+        if values.notna().all() and (values % 1 == 0).all():
+            values = values.astype("int64")
+        df[col] = values
+    return df
+
+
+def write_columnar(csv_text: str, path: Path, fmt: str, df=None) -> Path:
+    """Write the converted data as a typed Parquet/Feather file (header = column names)."""
+    if load_pandas() is None:
+        raise RuntimeError("pandas is required for --columnar. Install with: pip install pandas pyarrow")
+    if df is None:
+        df = pd.read_csv(StringIO(csv_text), skipinitialspace=True, dtype=str, keep_default_na=False)
+    df = infer_types(df.copy())
+    df.columns = [str(c).strip() for c in df.columns]
+    try:
+        if fmt == "parquet":
+            df.to_parquet(path, index=False)
+        else:
+            df.reset_index(drop=True).to_feather(path)
+    except ImportError as e:
+        raise RuntimeError(f"{fmt} output needs pyarrow. Install with: pip install pyarrow ({e})")
+    return path
+
+
+def write_csv(out: Path, text: str, args, kind: str):
+    """Write the converted CSV (skipped with --columnar --no-csv)."""
+    if args.no_csv:
+        return
+    if compression_of(out):
+        try:
+            write_compressed(out, csv_bytes(text))
+        except RuntimeError as e:
+            print(f"Compressed output failed: {e}")
+            sys.exit(1)
+    else:
+        out.write_text(text, encoding='utf-8')
+    print(f"Written {kind} to: {out}")
+
+
+def preview_lines(text: str, rows: int):
+    for line in text.splitlines()[:rows]:
+        print(line)
+
+
+def write_columnar_output(out_text: str, out: Path, args, df=None):
+    try:
+        path = write_columnar(out_text, plain_path(out).with_suffix("." + args.columnar), args.columnar, df)
+    except RuntimeError as e:
+        print(f"Columnar output failed: {e}")
+        sys.exit(1)
+    print(f"Written typed {args.columnar} file to: {path}")
+
+
+# --- Incremental conversion ---------------------------------------------------------------
+# The checkpoint records how far the source has been converted (always the end of a complete
+# line), the tokens of an unfinished row when grouping, and where the output's committed part
+# ends. Whatever was converted from past that point (the unterminated last line, the padded
+# last row) is "pending": it sits at the end of the output so the file always equals a full
+# conversion, and is cut off and redone on the next run.
+CHECKPOINT_SUFFIX = ".checkpoint"
+CHECKPOINT_HASH_BYTES = 64 * 1024  # hashed at the start and at the end of the converted part
+
+
+def checkpoint_path(out: Path) -> Path:
+    return out.with_name(out.name + CHECKPOINT_SUFFIX)
+
+
+def source_hashes(path: Path, offset: int) -> list:
+    """SHA-1 of the first and of the last CHECKPOINT_HASH_BYTES before offset (spots a rewritten source)."""
+    with path.open("rb") as fh:
+        head = hashlib.sha1(fh.read(min(offset, CHECKPOINT_HASH_BYTES))).hexdigest()
+        start = max(0, offset - CHECKPOINT_HASH_BYTES)
+        fh.seek(start)
+        edge = hashlib.sha1(fh.read(offset - start)).hexdigest()
+    return [head, edge]
+
+
+def load_checkpoint(inp: Path, out: Path, settings: dict):
+    """Return (checkpoint, None) if the output can be extended, else (None, reason for a full rebuild)."""
+    try:
+        state = json.loads(checkpoint_path(out).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None, "no checkpoint"
+    if state.get("settings") != settings:
+        return None, "options or detected layout changed"
+    try:
+        st = out.stat()
+    except OSError:
+        return None, "output missing"
+    if [st.st_size, st.st_mtime_ns] != [state["output_size"], state["output_mtime_ns"]]:
+        return None, "output was modified"
+    if inp.stat().st_size < state["offset"]:
+        return None, "source was truncated"
+    if source_hashes(inp, state["offset"]) != state["hashes"]:
+        return None, "source was rewritten"
+    return state, None
+
+
+def convert_incremental(inp: Path, out: Path, args, info: dict, mode: str | None) -> bool:
+    """
+    Convert only the part of inp added since the last run and append it to out.
+    mode is "regex", "fixed" or "group" (as chosen in main), None for the pandas method.
+    Returns False when the normal full conversion should run instead (no checkpoint is kept).
+    """
+    if mode is None:
+        print("--incremental works with the regex, fixed-width and grouping conversions; "
+              "doing a full pandas conversion")
+        return False
+    settings = {
+        "source": str(inp.resolve()),
+        "mode": mode,
+        "literal_tabs": bool(args.replace_literal_tabs or info["layout"] == "literal-tabs"),
+        "group_size": args.group_size,
+        "header": info["header"] if mode == "fixed" else None,
+        "bounds": [list(b) for b in info["bounds"]] if mode == "fixed" else None,
+    }
+    state, reason = load_checkpoint(inp, out, settings)
+    offset = state["offset"] if state else 0
+    with inp.open("rb") as fh:
+        fh.seek(offset)
+        data = fh.read()
+    cut = data.rfind(b"\n") + 1  # complete lines end here; the rest is re-read next time
+    complete = data[:cut].decode("utf-8", errors="replace")
+    tail = data[cut:].decode("utf-8", errors="replace")
+    if settings["literal_tabs"]:
+        complete, tail = complete.replace("\\t", "\t"), tail.replace("\\t", "\t")
+    lines = complete.splitlines()
+
+    top, size = [], state["group"] if state else args.group_size
+    if state is None and mode != "regex":
+        if mode == "group" and size > 0:
+            header = [f"col{i+1}" for i in range(size)]
+        else:
+            first = next((i for i, ln in enumerate(lines) if ln.strip()), None)
+            if first is None:
+                return False  # header line not complete yet
+            header = info["header"] if mode == "fixed" else split_header(lines[first])
+            size = len(header)
+            lines = lines[first + 1:]
+        top = [", ".join(header)]
+
+    partial = state["partial"] if state else []
+    if mode == "group":
+        tokens = partial + re.findall(r"\S+", "\n".join(lines))
+        whole = len(tokens) - len(tokens) % size
+        rows = [", ".join(tokens[i:i + size]) for i in range(0, whole, size)]
+        partial = tokens[whole:]
+        rest = partial + re.findall(r"\S+", tail)
+        if state is None and not rows and not rest:
+            return False  # nothing to group; the full path reports it
+        rest += [""] * ((-len(rest)) % size)
+        pending = [", ".join(rest[i:i + size]) for i in range(0, len(rest), size)]
+    else:
+        bounds = info["bounds"]
+        convert = (lambda ln: fixed_width_line(ln, bounds)) if mode == "fixed" else regex_line
+        rows = [convert(ln) for ln in lines if ln.strip()]
+        pending = [convert(ln) for ln in tail.splitlines() if ln.strip()]
+
+    with out.open("r+b" if state else "wb") as fh:
+        if state:
+            fh.seek(state["committed"])
+            fh.truncate()
+        fh.write(csv_bytes("".join(ln + "\n" for ln in top + rows)))
+        committed = fh.tell()
+        fh.write(csv_bytes("".join(ln + "\n" for ln in pending)))
+
+    st = out.stat()
+    state = {"settings": settings, "offset": offset + cut, "hashes": source_hashes(inp, offset + cut),
+             "group": size, "partial": partial, "committed": committed,
+             "output_size": st.st_size, "output_mtime_ns": st.st_mtime_ns}
+    ck = checkpoint_path(out)
+    tmp = ck.with_name(ck.name + ".tmp")
+    tmp.write_text(json.dumps(state), encoding="utf-8")
+    os.replace(tmp, ck)
+
+    if offset:
+        print(f"Appended {len(rows)} rows ({cut:,} new bytes) to: {out}")
+    else:
+        print(f"Full conversion ({reason}), written to: {out}")
+    if pending:
+        print(f"{len(pending)} row(s) from an unfinished line/row written provisionally; redone on the next run")
+    preview_lines("\n".join(top + rows + pending), args.preview_rows)
+    return True
+
+
 def main():
     args = parse_args()
     inp = Path(args.input)
     if not inp.exists():
         print(f"Input file not found: {inp}")
         sys.exit(2)
+    if args.no_csv and (not args.columnar or args.inplace):
+        print("--no-csv needs --columnar and can't be combined with --inplace")
+        sys.exit(2)
+    if args.incremental and (args.inplace or args.no_csv or args.compress or compression_of(inp)):
+        print("--incremental appends to the converted CSV and can't be combined with --inplace, --no-csv, "
+              "--compress or a compressed input")
+        sys.exit(2)
 
     # Prepare output path. If no explicit output is given, place converted files
     # into a `Seperated` folder next to the input file.
@@ -113,45 +645,69 @@ def main():
     else:
         separated_dir = inp.parent / "Seperated"
         separated_dir.mkdir(parents=True, exist_ok=True)
-        out = separated_dir / (inp.stem + "_comma" + inp.suffix)
-
-    if args.backup:
-        backup_file(inp)
-
-    raw = inp.read_text(encoding='utf-8', errors='replace')
+        plain = plain_path(inp)
+        out = separated_dir / (plain.stem + "_comma" + plain.suffix)
+    if args.compress and compression_of(out) != args.compress:
+        out = out.with_name(out.name + "." + args.compress)
+    if args.inplace and compression_of(out) != compression_of(inp):
+        print(f"--inplace would replace {inp} with a file compressed differently ({out.name})")
+        sys.exit(2)
 
-    if args.replace_literal_tabs:
+    # Pick the conversion path from the head of the file, before the bulk data is read
+    try:
+        info = detect_format(inp)
+    except ValueError as e:
+        print(f"Can't read {inp}: {e}")
+        sys.exit(2)
+    print(describe_format(info))
+    if args.detect_only:
+        return
+
+    # Only after --detect-only: a backup may be a full copy of a large dump.
+    # With --inplace the backup is made right before the original is replaced.
+    if args.backup and not args.inplace:
+        try:
+            backup_file(inp, args.backup_compress)
+        except RuntimeError as e:
+            print(f"Backup failed: {e}")
+            sys.exit(1)
+    if info["confidence"] < 0.6:
+        print("Low confidence - check the preview, or force the layout with --group-by-header / --group-size")
+
+    # Token grouping is used when asked for, or when rows are wrapped across lines
+    # (header present and the data lines don't match its token count).
+    auto_group = (not args.group_by_header and args.group_size == 0
+                  and info["layout"] == "token-stream" and info["header"] is not None)
+    fixed_width = info["blank_cells"] and info["header"] is not None and args.method == "regex"
+    grouping = args.group_by_header or args.group_size > 0 or auto_group
+
+    if args.incremental:
+        mode = ("fixed" if fixed_width and not (args.group_by_header or args.group_size > 0)
+                else "group" if grouping else "regex" if args.method == "regex" else None)
+        if convert_incremental(inp, out, args, info, mode):
+            if args.columnar:
+                write_columnar_output(out.read_text(encoding="utf-8"), out, args)
+            print("Done.")
+            return
+
+    with TextIOWrapper(open_input(inp), encoding='utf-8', errors='replace') as fh:
+        raw = fh.read()
+
+    if args.replace_literal_tabs or info["layout"] == "literal-tabs":
         if "\\t" in raw:
             raw = raw.replace("\\t", "\t")
             print("Replaced literal \\t with actual tabs before parsing")
 
-    # Optional grouping mode: group tokens into rows based on header or provided size.
-    # If not explicitly requested, auto-detect header grouping when the first
-    # non-empty line looks like a header (non-numeric tokens) and subsequent
-    # data lines don't match the header token count.
-    auto_group = False
-    if not args.group_by_header and args.group_size == 0:
-        # detect header-like first line
-        lines_all = [ln for ln in raw.splitlines() if ln.strip() != ""]
-        if len(lines_all) >= 2:
-            first = lines_all[0].strip()
-            # header tokens (split on comma or whitespace)
-            hdr_tokens = [t.strip() for t in (first.split(",") if "," in first else re.split(r"\s+", first)) if t.strip()]
-            # If header tokens contain any non-numeric strings (letters), consider it a header
-            has_text = any(re.search(r"[A-Za-z]", t) for t in hdr_tokens)
-            if has_text:
-                # check token counts of next few lines
-                mismatch = 0
-                check_lines = lines_all[1: min(len(lines_all), 20)]
-                for ln in check_lines:
-                    tokens = re.findall(r"\S+", ln)
-                    if len(tokens) != len(hdr_tokens):
-                        mismatch += 1
-                # if there are mismatches, auto group
-                if mismatch > 0:
-                    auto_group = True
-
-    if args.group_by_header or args.group_size > 0 or auto_group:
+    if fixed_width and not (args.group_by_header or args.group_size > 0):
+        lines = raw.splitlines()
+        header = next(ln for ln in lines if ln.strip())
+        body = "\n".join(lines[lines.index(header) + 1:])
+        out_text = ", ".join(info["header"]) + "\n" + convert_fixed_width(body, info["bounds"])
+        write_csv(out, out_text, args, "converted file (fixed-width)")
+        preview_lines(out_text, args.preview_rows)
+        df = None
+
+    elif grouping:
         lines = [ln for ln in raw.splitlines() if ln.strip() != ""]
         if not lines:
             print("No content to group after stripping blank lines.")
@@ -163,12 +719,7 @@ def main():
             data_lines = lines
         else:
             # group by header: first non-empty line is header
-            header_line = lines[0]
-            # detect header separator
-            if "," in header_line:
-                header_tokens = [t.strip() for t in header_line.split(", ") if t.strip()]
-            else:
-                header_tokens = re.split(r"\s+", header_line.strip())
+            header_tokens = split_header(lines[0])
             group_size = len(header_tokens)
             data_lines = lines[1:]
 
@@ -190,20 +741,14 @@ def main():
 
         csv_lines = [", ".join(header_tokens)] + [", ".join(row) for row in rows]
         out_text = "\n".join(csv_lines) + "\n"
-        out.write_text(out_text, encoding="utf-8")
-        print(f"Written grouped CSV to: {out}")
+        write_csv(out, out_text, args, "grouped CSV")
 
-        # If pandas available, show a dataframe preview
-        if pd is not None:
-            df = pd.read_csv(StringIO(out_text))
-            print(df.head(args.preview_rows).to_string(index=False))
+        # With --method pandas (and pandas available), show a dataframe preview
+        df = None
+        if args.method == "pandas" and load_pandas() is not None:
+            print(pd.read_csv(StringIO(out_text)).head(args.preview_rows).to_string(index=False))
         else:
-            with out.open("r", encoding="utf-8") as fh:
-                for i in range(args.preview_rows):
-                    line = fh.readline()
-                    if not line:
-                        break
-                    print(line.rstrip("\n"))
+            preview_lines(out_text, args.preview_rows)
 
     else:
         if args.method == "regex":
@@ -211,33 +756,35 @@ def main():
             # Ensure newline termination
             if not out_text.endswith("\n"):
                 out_text += "\n"
-            out.write_text(out_text, encoding='utf-8')
-            print(f"Written converted file (regex) to: {out}")
+            write_csv(out, out_text, args, "converted file (regex)")
             # Print preview lines
-            with out.open('r', encoding='utf-8') as fh:
-                for i in range(args.preview_rows):
-                    line = fh.readline()
-                    if not line:
-                        break
-                    print(line.rstrip('\n'))
+            preview_lines(out_text, args.preview_rows)
             df = None
         else:
             # pandas method
-            csv_text, df = convert_pandas(raw)
-            out.write_text(csv_text, encoding='utf-8')
-            print(f"Written converted file (pandas) to: {out}")
+            out_text, df = convert_pandas(raw)
+            write_csv(out, out_text, args, "converted file (pandas)")
             # Show df preview
             print(df.head(args.preview_rows).to_string(index=False))
 
+    if args.columnar:
+        write_columnar_output(out_text, out, args, df)
+
     if args.inplace:
         if not args.force:
             ans = input(f"Overwrite original file {inp} with {out}? (Y/N): ").strip().lower()
             if ans not in ('y', 'yes'):
                 print("Mission aborted")
                 return
-        # Overwrite original
-        shutil.copy2(out, inp)
-        print(f"Original file {inp} replaced with converted CSV")
+        if args.backup:
+            try:
+                backup_file(inp, args.backup_compress, link=True)
+            except RuntimeError as e:
+                print(f"Backup failed, original kept: {e}")
+                sys.exit(1)
+        # Temp file + fsync + rename: a crash leaves either the original or the converted file
+        method = replace_atomically(out, inp)
+        print(f"Original file {inp} replaced with converted CSV ({method})")
 
     print("Done.")
 